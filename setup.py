@@ -48,6 +48,7 @@ setup(
     python_requires='>=3.8.0',
     install_requires=['matplotlib>=3.1.2', 'plotly>=4.5.0', 'seaborn>=0.10', 'h5py>=2.10',
                       'pandas>=0.25.3', 'numpy>=1.17.4', 'scipy>=1.3.3', 'scikit-learn>=0.22'],
+    extras_require={'arrow': ['pyarrow>=1.0'], 'zstd': ['zstandard>=0.13']},
 
     entry_points={
         'console_scripts': [
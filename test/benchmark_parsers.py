@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark of the parsers of the sequencing summary files on the files of the test_data directory.
+Usage: python test/benchmark_parsers.py [repeat] [file...]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parents[1]))
+
+from toulligqc import sequencing_summary_reader as ssr
+from toulligqc.sequencing_summary_extractor import SequencingSummaryExtractor as SSE
+from toulligqc.sequencing_summary_extractor import barcoding_summary_columns
+from toulligqc.sequencing_summary_extractor import barcoding_summary_datatypes
+from toulligqc.sequencing_summary_extractor import summary_columns
+from toulligqc.sequencing_summary_extractor import summary_datatypes
+from toulligqc.sequencing_summary_schema import get_datatypes
+
+path = Path(__file__).parents[1] / "test_data/sequencing_summary/"
+
+
+def _projection(filename):
+    """
+    Get the columns and types loaded by the extractor for a file
+    """
+    if SSE._is_barcode_file(filename):
+        return barcoding_summary_columns, barcoding_summary_datatypes
+    if SSE._is_sequencing_summary_with_barcodes(filename):
+        return summary_columns + ['barcode_arrangement'], dict(summary_datatypes, **get_datatypes(['barcode_arrangement']))
+    if SSE._is_sequencing_summary_file(filename):
+        return summary_columns + ['read_id'], dict(summary_datatypes, read_id=ssr.read_id_datatype)
+    return None
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    files = sys.argv[2:] if len(sys.argv) > 2 else sorted(str(f) for f in path.glob('*.txt'))
+    parsers = [p for p in ssr.parsers if ssr.is_parser_available(p)]
+
+    print("{:<60}{:>10}".format('file', 'lines') + ''.join("{:>12}".format(p) for p in parsers))
+    for f in files:
+        projection = _projection(f)
+        if projection is None:
+            continue
+        columns, datatypes = projection
+
+        times = [min(timeit.repeat(lambda: ssr.read_summary_file(f, columns, datatypes, p), number=1, repeat=repeat))
+                 for p in parsers]
+        lines = len(ssr.read_summary_file(f, columns, datatypes))
+        print("{:<60}{:>10}".format(Path(f).name, lines) + ''.join("{:>11.3f}s".format(t) for t in times))
+
+
+if __name__ == '__main__':
+    main()
@@ -70,4 +70,11 @@ missing_data_config = {
 "result_directory": path,
 "dpi": "100",
 "sequencing_summary_source": path + "/sequencing_summary_with_missing_data.txt"
-}
\ No newline at end of file
+}
+streaming_config = {
+"barcoding": "False",
+"result_directory": path,
+"dpi": "100",
+"chunk_size": "1000",
+"sequencing_summary_source": path + "/Albacore-2.3.1_basecall-1D-RNA_sequencing_summary.txt"
+}
@@ -1,6 +1,20 @@
 import sys, os, re
 sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../toulligqc")
 from toulligqc import sequencing_summary_extractor as sse
+from toulligqc import sequencing_summary_streaming_extractor as ssse
+from toulligqc import sequencing_summary_reader as ssr
+from toulligqc import sequencing_summary_common as ssc
+from toulligqc import sequencing_summary_aggregator as ssa
+from toulligqc import sequencing_summary_schema as sss
+from toulligqc import sequencing_summary_partial as ssp
+from toulligqc import plotly_graph_common as pgc
+from toulligqc import input_catalog as ic
+from toulligqc import toulligqc as tqc
+import bz2
+import gzip
+import shutil
+import subprocess
+import tempfile
 import unittest
 from unittest.mock import patch, Mock, MagicMock
 import config as cfg
@@ -62,12 +76,12 @@ class TestSequencingSummaryExtractorWholeConfig (unittest.TestCase):
         cls.expected_df.passes_filtering.replace({'True': True, 'False': False}, inplace=True)
         
         cls.expected_df = cls.expected_df.astype({
-            'channel': np.int16,
-            'start_time': np.float,
-            'passes_filtering': np.bool,
-            'sequence_length_template': np.int16,
-            'mean_qscore_template': np.float,
-            'barcode_arrangement': object
+            'channel': np.uint16,
+            'start_time': np.float64,
+            'passes_filtering': np.bool_,
+            'sequence_length_template': np.uint32,
+            'mean_qscore_template': np.float32,
+            'barcode_arrangement': 'category'
         })
 
 
@@ -312,15 +326,75 @@ class TestSequencingSummaryExtractorDirectory (unittest.TestCase):
 
         
     def test_check_conf_with_directory(self):
-        """ Test if _is_sequencing_summary_file method returns a FileNotFoundError catched by check_conf when passing a directory"""
-        
-        with self.assertRaises(FileNotFoundError) as context:
-            
-            #Call check_conf which calls internally is_sequencing_summary_file method
-            sse.SequencingSummaryExtractor(self.config).check_conf()
-            sse.SequencingSummaryExtractor(self.config)._is_sequencing_summary_file(self.config['sequencing_summary_source'])
-            self.assertTrue((False, "No such file or directory " + self.config.get('sequencing_summary_source')) in context.exception)
-    
+        """ Test that the sequencing summary files of a directory are found by check_conf """
+
+        extractor = sse.SequencingSummaryExtractor(self.config)
+        self.assertEqual((True, ""), extractor.check_conf())
+        self.assertEqual([self.config['sequencing_summary_source'] + "/sequencing_summary_small.txt",
+                          self.config['sequencing_summary_source'] + "/sequencing_summary_with_missing_data.txt"],
+                         extractor.sequencing_summary_files)
+
+    def test_is_sequencing_summary_file_with_directory(self):
+        """ Test if _is_sequencing_summary_file method returns a FileNotFoundError when passing a directory"""
+
+        with self.assertRaises(FileNotFoundError):
+            sse.SequencingSummaryExtractor._is_sequencing_summary_file(self.config['sequencing_summary_source'])
+
+    def test_load_sequencing_summary_data_nested_directories(self):
+        """ Test loading the shards of sequencing summary and barcoding files of nested directories """
+
+        expected = sse.SequencingSummaryExtractor(cfg.whole_config)._load_sequencing_summary_data()
+
+        with tempfile.TemporaryDirectory() as directory:
+            for f, shard in [("sequencing_summary_small.txt", "sequencing_summary_0.txt"),
+                             ("barcoding_summ_pass_small.txt", "pass/barcoding_summary_0.txt"),
+                             ("barcoding_summ_fail_small.txt", "fail/barcoding_summary_1.txt")]:
+                os.makedirs(os.path.dirname(os.path.join(directory, shard)), exist_ok=True)
+                shutil.copy(os.path.join(cfg.path, f), os.path.join(directory, shard))
+
+            config = dict(cfg.whole_config, sequencing_summary_source=directory)
+            actual = sse.SequencingSummaryExtractor(config)._load_sequencing_summary_data()
+
+        pd.testing.assert_frame_equal(expected, actual)
+
+    def test_load_sequencing_summary_with_barcodes_shards(self):
+        """ Test loading a directory of shards of sequencing summary files with barcode arrangements """
+
+        expected = sse.SequencingSummaryExtractor(cfg.whole_config)._load_sequencing_summary_data()
+
+        summary = pd.read_csv(os.path.join(cfg.path, "sequencing_summary_small.txt"), sep="\t", dtype=str)
+        barcodes = pd.concat([pd.read_csv(os.path.join(cfg.path, f), sep="\t", dtype=str,
+                                          usecols=['read_id', 'barcode_arrangement'])
+                              for f in ("barcoding_summ_pass_small.txt", "barcoding_summ_fail_small.txt")])
+        summary = summary.merge(barcodes, on='read_id', how='left')
+
+        with tempfile.TemporaryDirectory() as directory:
+            half = len(summary) // 2
+            for i, shard in enumerate((summary.iloc[:half], summary.iloc[half:])):
+                shard.to_csv(os.path.join(directory, "sequencing_summary_{}.txt".format(i)), sep="\t", index=False)
+
+            config = dict(cfg.whole_config, sequencing_summary_source=directory)
+            extractor = sse.SequencingSummaryExtractor(config)
+            self.assertEqual((True, ""), extractor.check_conf())
+            self.assertTrue(extractor.is_barcode)
+            actual = extractor._load_sequencing_summary_data()
+            # The categories of the barcoding files also include the barcodes of reads absent from the summary
+            pd.testing.assert_frame_equal(expected, actual, check_categorical=False)
+
+            extractor = sse.SequencingSummaryExtractor(dict(config, barcoding='False'))
+            actual = extractor._load_sequencing_summary_data()
+            pd.testing.assert_frame_equal(expected.drop(columns=['barcode_arrangement']), actual)
+
+            extractor.init()
+            self.assertEqual(len(summary), len(extractor.dataframe_1d))
+
+    def test_load_no_sequencing_summary_file(self):
+        """ Test that a source with only barcoding files is rejected with an explicit error """
+
+        config = dict(cfg.whole_config, sequencing_summary_source=cfg.only_barcoding_config[
+            'sequencing_summary_source'])
+        with self.assertRaises(FileNotFoundError):
+            sse.SequencingSummaryExtractor(config)._load_sequencing_summary_data()
 
 
 class TestSequencingSummaryExtractorNoFiles(unittest.TestCase):
@@ -352,3 +426,1144 @@ class TestSequencingSummaryExtractorNoFiles(unittest.TestCase):
             self.assertTrue("Sequencing summary file not found", str(context))
 
 
+
+
+class TestStreamingSequencingSummaryExtractor(unittest.TestCase):
+
+    """ Test StreamingSequencingSummaryExtractor class against SequencingSummaryExtractor """
+
+    @classmethod
+    def setUpClass(cls):
+
+        cls.config = cfg.streaming_config
+
+        cls.expected = {}
+        extractor = sse.SequencingSummaryExtractor(cls.config)
+        extractor.init()
+        extractor.extract(cls.expected)
+
+        cls.actual = {}
+        extractor = ssse.StreamingSequencingSummaryExtractor(cls.config)
+        extractor.init()
+        extractor.extract(cls.actual)
+
+    def test_extract_same_keys(self):
+        """
+        Test that the streaming extractor set the same keys in result_dict
+        """
+        self.assertEqual(sorted(self.expected.keys()), sorted(self.actual.keys()))
+
+    def test_extract_same_values(self):
+        """
+        Test that values are the same, except qscore quantiles that are computed with a 0.001 resolution
+        """
+        for key, value in self.expected.items():
+            if 'memory.usage' in key:
+                # The streaming extractor only keeps a chunk of reads in memory
+                continue
+            elif 'qscore' in key:
+                self.assertAlmostEqual(value, self.actual[key], places=3, msg=key)
+            elif isinstance(value, float):
+                self.assertAlmostEqual(value, self.actual[key], places=6, msg=key)
+            else:
+                self.assertEqual(value, self.actual[key], msg=key)
+
+
+class TestSequencingSummaryExtractorCache(unittest.TestCase):
+
+    """ Test SequencingSummaryExtractor class with a cache of parsed files """
+
+    def test_load_sequencing_summary_data_from_cache(self):
+        """
+        Test that the dataframe loaded from the cache is the same as the parsed one
+        """
+        with tempfile.TemporaryDirectory() as cache_directory:
+            config = dict(cfg.whole_config, cache_directory=cache_directory)
+
+            expected = sse.SequencingSummaryExtractor(config)._load_sequencing_summary_data()
+            self.assertEqual(3, len(os.listdir(cache_directory)))
+
+            actual = sse.SequencingSummaryExtractor(config)._load_sequencing_summary_data()
+            pd.testing.assert_frame_equal(expected, actual)
+
+
+class TestSequencingSummaryExtractorColumnStore(unittest.TestCase):
+
+    """ Test SequencingSummaryExtractor class with a column store """
+
+    def test_init_from_column_store(self):
+        """
+        Test that the dataframe mapped from the column store is the same as the parsed one
+        """
+        with tempfile.TemporaryDirectory() as store_directory:
+            config = dict(cfg.whole_config, column_store_directory=store_directory)
+
+            expected = sse.SequencingSummaryExtractor(config)
+            expected.init()
+            self.assertEqual(1, len(os.listdir(store_directory)))
+
+            actual = sse.SequencingSummaryExtractor(config)
+            actual.init()
+
+            self.assertIsInstance(actual.dataframe_1d['start_time'].values.base.base, np.memmap)
+            pd.testing.assert_frame_equal(expected.dataframe_1d, actual.dataframe_1d[expected.dataframe_1d.columns])
+
+
+class TestSequencingSummaryExtractorOutputs(unittest.TestCase):
+
+    """ Test SequencingSummaryExtractor class with a subset of the outputs """
+
+    def test_stats_only_columns(self):
+        """
+        Test that a run with only the counts, the yield and the N50 parses only the pass flags and the lengths
+        and gives the same statistics as a full run
+        """
+        config = dict(cfg.whole_config, outputs='counts,yield,n50')
+        extractor = sse.SequencingSummaryExtractor(config)
+        self.assertFalse(extractor.is_barcode)
+
+        extractor.init()
+        self.assertEqual(['passes_filtering', 'sequence_length'], sorted(extractor.dataframe_1d.columns))
+
+        result_dict = {}
+        extractor.extract(result_dict)
+        self.assertEqual([], extractor.graph_generation(result_dict))
+
+        expected = sse.SequencingSummaryExtractor(dict(cfg.whole_config, barcoding='False'))
+        expected.init()
+        expected_dict = {}
+        expected.extract(expected_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.'
+        for key in ('read.count', 'read.pass.count', 'read.fail.count', 'yield', 'n50', 'l50'):
+            self.assertEqual(expected_dict[prefix + key], result_dict[prefix + key])
+        self.assertNotIn(prefix + 'run.time', result_dict)
+
+    def test_length_only_outputs(self):
+        """
+        Test that the yield and N50 outputs, that do not parse the pass flags, give the same values as a full run
+        """
+        expected = sse.SequencingSummaryExtractor(dict(cfg.whole_config, barcoding='False'))
+        expected.init()
+        expected_dict = {}
+        expected.extract(expected_dict)
+        prefix = expected.get_report_data_file_id() + '.'
+
+        for outputs, keys in (('yield', ('yield',)),
+                              ('n50', ('n50', 'l50', 'n90', 'l90')),
+                              ('yield,channels', ('yield', 'channel.occupancy.statistics.mean'))):
+            extractor = sse.SequencingSummaryExtractor(dict(cfg.whole_config, outputs=outputs))
+            extractor.init()
+            self.assertNotIn('passes_filtering', extractor.dataframe_1d.columns, msg=outputs)
+
+            result_dict = {}
+            extractor.extract(result_dict)
+            for key in keys:
+                self.assertEqual(expected_dict[prefix + key], result_dict[prefix + key], msg=outputs)
+
+    def test_each_output(self):
+        """
+        Test that each output computed on its own gives the same values as a full run
+        """
+        # The extractors add the unclassified and other barcodes to the barcode selection of the configuration
+        expected = sse.SequencingSummaryExtractor(dict(cfg.whole_config, barcode_selection=['barcode07', 'barcode12']))
+        expected.init()
+        expected_dict = {}
+        expected.extract(expected_dict)
+
+        for output in sse.output_columns:
+            extractor = sse.SequencingSummaryExtractor(dict(cfg.whole_config, outputs=output,
+                                                            barcode_selection=['barcode07', 'barcode12']))
+            self.assertEqual((True, ""), extractor.check_conf(), msg=output)
+            extractor.init()
+            result_dict = {}
+            extractor.extract(result_dict)
+            self.assertLess(0, len(result_dict), msg=output)
+
+            for key, value in result_dict.items():
+                if '.memory.usage.' in key or key.endswith('.duration'):
+                    continue
+                if isinstance(value, pd.DataFrame):
+                    pd.testing.assert_frame_equal(expected_dict[key], value, obj=key)
+                elif isinstance(value, pd.Series):
+                    pd.testing.assert_series_equal(expected_dict[key], value, obj=key)
+                else:
+                    self.assertEqual(expected_dict[key], value, msg=output + ': ' + key)
+
+    def test_unknown_output(self):
+        """
+        Test that check_conf fails on an unknown output
+        """
+        extractor = sse.SequencingSummaryExtractor(dict(cfg.whole_config, outputs='counts,foo'))
+        self.assertFalse(extractor.check_conf()[0])
+
+    def test_streaming_outputs(self):
+        """
+        Test that the streaming extractor, that computes all the outputs from all the reads, rejects outputs and
+        preview configurations
+        """
+        extractor = ssse.StreamingSequencingSummaryExtractor(dict(cfg.streaming_config, outputs='counts'))
+        self.assertFalse(extractor.check_conf()[0])
+        extractor = ssse.StreamingSequencingSummaryExtractor(dict(cfg.streaming_config, preview='100'))
+        self.assertFalse(extractor.check_conf()[0])
+        self.assertEqual((True, ""), ssse.StreamingSequencingSummaryExtractor(cfg.streaming_config).check_conf())
+
+    def test_incompatible_options(self):
+        """
+        Test that the command line options that would be ignored with other options are rejected
+        """
+        source = cfg.streaming_config['sequencing_summary_source']
+        for options in ({'outputs': 'counts', 'chunk_size': '100'},
+                        {'outputs': 'counts', 'follow': '1'},
+                        {'outputs': 'counts', 'partial_output': 'shard.npz'},
+                        {'preview': '100', 'chunk_size': '100'},
+                        {'follow': '1', 'partial_output': 'shard.npz'}):
+            with self.assertRaises(SystemExit, msg=str(options)) as context:
+                tqc._check_conf(dict(options, sequencing_summary_source=source))
+            self.assertIn('cannot be used with', str(context.exception.code))
+
+
+class TestByteRanges(unittest.TestCase):
+
+    """ Test the parsing of a summary file by byte ranges """
+
+    def test_byte_ranges(self):
+        """
+        Test that the byte ranges cover all the lines of the file after the header and start at line beginnings
+        """
+        filename = cfg.only_seq_summary_config['sequencing_summary_source']
+        ranges = ssr.byte_ranges(filename, 4)
+        self.assertEqual(4, len(ranges))
+
+        with open(filename, 'rb') as f:
+            data = f.read()
+        self.assertEqual(data.index(b'\n') + 1, ranges[0][0])
+        self.assertEqual(len(data), ranges[-1][1])
+        for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, next_start)
+            self.assertEqual(b'\n', data[next_start - 1:next_start])
+
+    @patch.object(ssr, 'byte_range_min_size', 0)
+    def test_read_summary_file_by_ranges(self):
+        """
+        Test that parsing a file by byte ranges in several processes gives the same dataframe as a sequential parsing
+        """
+        filename = cfg.only_seq_summary_config['sequencing_summary_source']
+        columns = sse.summary_columns + ['read_id']
+        datatypes = dict(sse.summary_datatypes, read_id=ssr.read_id_datatype)
+
+        expected = ssr.read_summary_file(filename, columns, datatypes)
+        actual = ssr.read_summary_file(filename, columns, datatypes, threads=3)
+        pd.testing.assert_frame_equal(expected, actual)
+
+
+class TestArrowParser(unittest.TestCase):
+
+    """ Test the Arrow parser against the Pandas parser """
+
+    def test_read_summary_file_arrow(self):
+        """
+        Test that the Arrow parser gives the same dataframes as the Pandas parser, with the same types,
+        for the columns loaded by the extractor from the summary files of the test data
+        """
+        if not ssr.is_parser_available('arrow'):
+            self.skipTest("The arrow parser requires the pyarrow package")
+
+        projections = {
+            ic.sequencing_summary_type: (sse.summary_columns + ['read_id'],
+                                         dict(sse.summary_datatypes, read_id=ssr.read_id_datatype)),
+            ic.sequencing_summary_with_barcodes_type: (sse.summary_columns + ['barcode_arrangement'],
+                                                       dict(sse.summary_datatypes,
+                                                            **sss.get_datatypes(['barcode_arrangement']))),
+            ic.barcoding_summary_type: (sse.barcoding_summary_columns, sse.barcoding_summary_datatypes)}
+
+        catalog = ic.InputCatalog()
+        files = [f for f in sorted(os.listdir(cfg.path)) if catalog.get_type(os.path.join(cfg.path, f)) in projections]
+        self.assertGreater(len(files), 0)
+        for f in files:
+            filename = os.path.join(cfg.path, f)
+            columns, datatypes = projections[catalog.get_type(filename)]
+            expected = ssr.read_summary_file(filename, columns, datatypes, 'pandas')
+            actual = ssr.read_summary_file(filename, columns, datatypes, 'arrow')
+            pd.testing.assert_series_equal(expected.dtypes, actual.dtypes, obj=f)
+            # The default float parser of Pandas may differ in the last bit from the correctly rounded values of
+            # Arrow for 64-bit values with 17 significant digits, the other columns are the same.
+            # The index of a file without read is an empty RangeIndex with Arrow and an empty object index with Pandas
+            pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=1e-15, atol=0,
+                                          check_index_type=len(expected) > 0, obj=f)
+
+
+class TestInputCatalog(unittest.TestCase):
+
+    """ Test the catalog of the input files of a run """
+
+    def test_get(self):
+        """
+        Test the description of a file and that it is kept for the next queries
+        """
+        filename = cfg.only_seq_summary_config['sequencing_summary_source']
+        catalog = ic.InputCatalog()
+        description = catalog.get(filename)
+
+        self.assertEqual(filename, description.path)
+        self.assertEqual(ic.sequencing_summary_type, description.type)
+        self.assertIsNone(description.compression)
+        self.assertEqual(ssr.read_header(filename).rstrip('\r\n'), description.header)
+        self.assertEqual(os.path.getsize(filename), description.size)
+        self.assertIs(description, catalog.get(filename))
+        self.assertEqual([description], catalog.files())
+
+        self.assertRaises(FileNotFoundError, catalog.get, os.path.join(cfg.path, 'missing_file.txt'))
+
+    def test_get_type(self):
+        """
+        Test the types of the files of the test data
+        """
+        catalog = ic.InputCatalog()
+        expected = {
+            'Albacore-2.3.1_basecall-1D-RNA_sequencing_summary.txt': ic.sequencing_summary_type,
+            'Guppy-basecall-1D-DNA_sequencing_summary.txt': ic.sequencing_summary_type,
+            'barcoding_summ_pass_small.txt': ic.barcoding_summary_type,
+            'barcoding_summ_fail_small.txt': ic.barcoding_summary_type,
+            'random_file.txt': None,
+            'sequencing_telemetry.js': None}
+        for f, file_type in expected.items():
+            self.assertEqual(file_type, catalog.get_type(os.path.join(cfg.path, f)), msg=f)
+
+        self.assertTrue(catalog.is_barcode_file(os.path.join(cfg.path, 'barcoding_summ_pass_small.txt')))
+        self.assertTrue(catalog.is_sequencing_summary_file(os.path.join(cfg.path, 'sequencing_summary_small.txt')))
+
+    def test_file_type(self):
+        """
+        Test the classification of the files from their header
+        """
+        self.assertEqual(ic.sequencing_summary_type, ic._file_type('filename\tread_id\tchannel\n'))
+        self.assertEqual(ic.sequencing_summary_with_barcodes_type,
+                         ic._file_type('filename\tread_id\tbarcode_arrangement\n'))
+        self.assertEqual(ic.sequencing_summary_1dsqr_type, ic._file_type('filename1\tfilename2\tread_id1\n'))
+        self.assertEqual(ic.barcoding_summary_type, ic._file_type('read_id\tbarcode_arrangement\n'))
+        self.assertIsNone(ic._file_type('read_id\tchannel\n'))
+        self.assertIsNone(ic._file_type(''))
+
+    def test_line_count(self):
+        """
+        Test that the number of lines is exact for the files smaller than the sample and estimated for the others
+        """
+        filename = os.path.join(cfg.path, 'Guppy-basecall-1D-DNA_sequencing_summary.txt')
+        with open(filename, 'rb') as f:
+            data = f.read()
+        line_count = len(data.splitlines()) - 1
+
+        with patch.object(ic, 'sample_size', len(data)):
+            self.assertEqual(line_count, ic.InputCatalog().get(filename).line_count)
+        self.assertEqual(0, ic.InputCatalog().get(os.path.join(cfg.path,
+                                                               'sequencing_summary_with_missing_data.txt')).line_count)
+
+        with patch.object(ic, 'sample_size', len(data) // 10):
+            self.assertAlmostEqual(line_count, ic.InputCatalog().get(filename).line_count, delta=line_count * 0.05)
+
+        with tempfile.TemporaryDirectory() as directory:
+            compressed_file = os.path.join(directory, 'sequencing_summary.txt.gz')
+            with gzip.open(compressed_file, 'wb') as f:
+                f.write(data)
+            description = ic.InputCatalog().get(compressed_file)
+            self.assertEqual('gzip', description.compression)
+            self.assertEqual(ic.sequencing_summary_type, description.type)
+            self.assertEqual(line_count, description.line_count)
+
+            # The sample of a large compressed file ends with truncated data
+            with patch.object(ic, 'sample_size', os.path.getsize(compressed_file) // 2):
+                description = ic.InputCatalog().get(compressed_file)
+            self.assertEqual(ic.sequencing_summary_type, description.type)
+            self.assertAlmostEqual(line_count, description.line_count, delta=line_count * 0.05)
+
+
+class TestCompressedFiles(unittest.TestCase):
+
+    """ Test the reading of compressed summary files """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.filename = cfg.only_seq_summary_config['sequencing_summary_source']
+        cls.directory = tempfile.mkdtemp()
+        with open(cls.filename, 'rb') as f:
+            cls.data = f.read()
+
+        cls.compressed_files = {}
+        for compression, module in (('gzip', gzip), ('bzip2', bz2)):
+            cls.compressed_files[compression] = os.path.join(cls.directory, 'summary.' + compression)
+            with module.open(cls.compressed_files[compression], 'wb') as f:
+                f.write(cls.data)
+
+        if shutil.which('zstd') is not None:
+            cls.compressed_files['zstd'] = os.path.join(cls.directory, 'summary.zst')
+            subprocess.run(['zstd', '-q', '-o', cls.compressed_files['zstd'], cls.filename], check=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def _truncated_file(self, compression):
+        """
+        Write the first half of a compressed file
+        """
+        with open(self.compressed_files[compression], 'rb') as f:
+            data = f.read()
+        truncated_file = os.path.join(self.directory, 'truncated.' + compression)
+        with open(truncated_file, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        return truncated_file
+
+    def test_get_compression(self):
+        """
+        Test that the compression format is detected from the magic bytes
+        """
+        self.assertIsNone(ssr.get_compression(self.filename))
+        for compression, f in self.compressed_files.items():
+            self.assertEqual(compression, ssr.get_compression(f))
+
+    def test_open_summary_file(self):
+        """
+        Test that the compressed files are decompressed in the process and in a separate process
+        """
+        for compression, f in self.compressed_files.items():
+            for parallel in (False, True):
+                with ssr.open_summary_file(f, parallel) as compressed:
+                    self.assertEqual(self.data, compressed.read(), msg=compression)
+
+    def test_read_compressed_files(self):
+        """
+        Test that the compressed files are parsed like the uncompressed file, at once and by chunks
+        """
+        expected = ssr.read_summary_file(self.filename, sse.summary_columns, sse.summary_datatypes)
+        for compression, f in self.compressed_files.items():
+            actual = ssr.read_summary_file(f, sse.summary_columns, sse.summary_datatypes)
+            pd.testing.assert_frame_equal(expected, actual)
+
+            actual = ssr.concat_dataframes(list(ssr.read_summary_file_chunks(f, sse.summary_columns,
+                                                                              sse.summary_datatypes, 1000)))
+            pd.testing.assert_frame_equal(expected, actual.reset_index(drop=True))
+
+    @patch.dict(ssr.decompression_commands, {'gzip': [['gzip', '-d', '-c']]})
+    def test_decompression_process(self):
+        """
+        Test that a gzip file is decompressed by an external tool
+        """
+        if shutil.which('gzip') is None:
+            self.skipTest("The gzip tool is not installed")
+
+        with ssr.open_summary_file(self.compressed_files['gzip'], parallel=True) as f:
+            self.assertIsInstance(f.raw, ssr._DecompressionProcess)
+            self.assertEqual(self.data, f.read())
+
+        with ssr.open_summary_file(self._truncated_file('gzip'), parallel=True) as f:
+            with self.assertRaises(IOError):
+                f.read()
+
+    def test_truncated_files(self):
+        """
+        Test that truncated compressed files raise an IOError, at once and by chunks
+        """
+        for compression in self.compressed_files:
+            truncated_file = self._truncated_file(compression)
+            with self.assertRaises(IOError, msg=compression):
+                ssr.read_summary_file(truncated_file, sse.summary_columns, sse.summary_datatypes)
+            with self.assertRaises(IOError, msg=compression):
+                list(ssr.read_summary_file_chunks(truncated_file, sse.summary_columns, sse.summary_datatypes, 1000))
+
+    def test_truncated_file_extractor(self):
+        """
+        Test that the extractors let the IOError of a truncated file go instead of reporting a missing file
+        """
+        config = dict(cfg.only_seq_summary_config, sequencing_summary_source=self._truncated_file('gzip'))
+        for extractor in (sse.SequencingSummaryExtractor(config),
+                          ssse.StreamingSequencingSummaryExtractor(dict(config, chunk_size=1000))):
+            self.assertEqual((True, ""), extractor.check_conf())
+            with self.assertRaises(IOError) as context:
+                extractor.init()
+            self.assertNotIsInstance(context.exception, FileNotFoundError)
+
+
+class TestPreview(unittest.TestCase):
+
+    """ Test the preview mode on a random sample of the reads """
+
+    def test_sample_summary_file(self):
+        """
+        Test that the sampled reads are distinct reads of the file in the order of the file
+        """
+        filename = cfg.only_seq_summary_config['sequencing_summary_source']
+        columns = sse.summary_columns + ['read_id']
+        datatypes = dict(sse.summary_datatypes, read_id=ssr.read_id_datatype)
+
+        full = ssr.read_summary_file(filename, columns, datatypes)
+        sample = ssr.sample_summary_file(filename, columns, datatypes, 100, random_state=1)
+
+        self.assertTrue(0 < len(sample) <= 100)
+        positions = pd.MultiIndex.from_frame(full[ssr.read_id_key_columns()]).get_indexer(
+            pd.MultiIndex.from_frame(sample[ssr.read_id_key_columns()]))
+        self.assertTrue((positions >= 0).all())
+        self.assertTrue((np.diff(positions) > 0).all())
+        pd.testing.assert_frame_equal(full.iloc[positions].reset_index(drop=True), sample)
+
+    def test_extract_preview(self):
+        """
+        Test that the statistics of a preview are computed on the sample and marked as estimations
+        """
+        extractor = sse.SequencingSummaryExtractor(dict(cfg.only_seq_summary_config, preview='100'))
+        extractor.init()
+        result_dict = {}
+        extractor.extract(result_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.'
+        self.assertTrue(result_dict[prefix + 'preview'])
+        self.assertEqual(len(extractor.dataframe_1d), result_dict[prefix + 'read.count'])
+        self.assertEqual(result_dict[prefix + 'read.count'], result_dict[prefix + 'preview.sample.read.count'])
+        self.assertTrue(result_dict[prefix + 'preview.estimated.read.count'] > result_dict[prefix + 'read.count'])
+
+
+class TestNXX(unittest.TestCase):
+
+    """ Test the computation of the NXX and LXX values """
+
+    def test_compute_nxx(self):
+        """
+        Test the NXX and LXX values of read lengths, the reads being cumulated from the shortest to the longest
+        """
+        nxx = ssc.compute_nxx(np.array([2, 8, 4, 6], dtype=np.uint32), [10, 50, 90])
+        # Cumulated lengths of the sorted reads: 2, 6, 12, 20
+        self.assertEqual({10: (2, 1), 50: (6, 3), 90: (8, 4)}, nxx)
+        self.assertEqual({}, ssc.compute_nxx(np.array([], dtype=np.uint32)))
+
+    def test_nxx_in_report(self):
+        """
+        Test that the N10 to N90 values are set for all, pass and fail reads
+        """
+        extractor = sse.SequencingSummaryExtractor(cfg.only_seq_summary_config)
+        extractor.init()
+        result_dict = {}
+        extractor.extract(result_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.'
+        for entry in ('', 'pass.reads.sequence.length.', 'fail.reads.sequence.length.'):
+            for x in ssc.nxx_percentages:
+                self.assertIn(prefix + entry + 'n' + str(x), result_dict)
+                self.assertIn(prefix + entry + 'l' + str(x), result_dict)
+        self.assertTrue(result_dict[prefix + 'n10'] <= result_dict[prefix + 'n50'] <= result_dict[prefix + 'n90'])
+
+
+def assert_describe_equal(expected, statistics, rtol=1e-12):
+    """
+    Check the statistics of a group against describe(): the mean and the standard deviation are summed in another
+    order and in 64 bit, so they only differ by the rounding of the sums, and the other statistics are exactly the same
+    :param expected: Pandas Series returned by describe()
+    :param statistics: Pandas Series with the statistics of the group
+    :param rtol: relative tolerance of the mean and of the standard deviation
+    """
+    rounded = ['mean', 'std']
+    testing.assert_series_equal(expected.drop(rounded), statistics.drop(rounded), check_names=False,
+                                check_dtype=False, check_exact=True)
+    np.testing.assert_allclose(expected[rounded].astype(np.float64), statistics[rounded].astype(np.float64),
+                               rtol=rtol)
+
+
+class TestGroupedStatistics(unittest.TestCase):
+
+    """ Test the statistics computed for all the groups of reads at once """
+
+    def test_describe_barcode_groups(self):
+        """
+        Test that the statistics of each barcode and read type are the ones of describe() on the filtered reads
+        """
+        df = pd.DataFrame({'mean_qscore': np.array([7.1, 12.3, 9.8, 15.2, 3.4, 10.7, 8.8], dtype=np.float32),
+                           'passes_filtering': [False, True, True, True, False, True, False],
+                           'barcode_arrangement': pd.Categorical(['barcode01', 'barcode02', 'barcode01', 'barcode01',
+                                                                  'unclassified', 'barcode02', 'barcode03'])})
+        barcode_selection = ['barcode01', 'barcode02', 'barcode04']
+        groups, statistics = ssc.barcode_read_groups(df, 'mean_qscore', barcode_selection)
+
+        # The statistics are computed on the decimal values of the 32 bit PHRED scores
+        qscores = pd.Series(sss.decimal_values(df['mean_qscore'].values))
+        masks = {'all': True, 'pass': df['passes_filtering'], 'fail': ~df['passes_filtering']}
+        for barcode in barcode_selection:
+            for read_type, mask in masks.items():
+                expected = qscores[(df['barcode_arrangement'] == barcode) & mask].describe()
+                testing.assert_series_equal(expected, pd.Series(groups[(read_type, barcode)]).describe(),
+                                            check_names=False, check_exact=True)
+                assert_describe_equal(expected, statistics.loc[(read_type, barcode)])
+
+        statistics = ssc.describe_read_groups(df, 'mean_qscore')
+        assert_describe_equal(qscores[df['passes_filtering']].describe(), statistics['pass'])
+
+    def test_barcode_groups_for_boxplots(self):
+        """
+        Test that the values of the barcode boxplots are the values of the reads of each barcode and read type
+        """
+        config = dict(cfg.whole_config, barcode_selection=['barcode07', 'barcode12'])
+        extractor = sse.SequencingSummaryExtractor(config)
+        extractor.init()
+        extractor.extract({})
+        df = extractor.dataframe_1d
+
+        groups = extractor.dataframe_dict['barcode.sequence.length.groups']
+        self.assertNotIn('barcode_selection_sequence_length_dataframe', extractor.dataframe_dict)
+        for barcode in ('barcode07', 'barcode12', 'unclassified', 'other barcodes'):
+            for read_type, passes_filtering in (('pass', True), ('fail', False)):
+                expected = df['sequence_length'][(df['barcode_arrangement'] == barcode)
+                                                 & (df['passes_filtering'] == passes_filtering)]
+                np.testing.assert_array_equal(np.sort(expected.values), groups[(read_type, barcode)])
+
+    def test_group_statistics(self):
+        """
+        Test that the statistics of all the groups computed in a single pass are the ones of describe() on the
+        values of each group, including missing values and empty groups
+        """
+        rng = np.random.default_rng(42)
+        lengths = rng.integers(100, 50000, 5000).astype(np.uint32)
+        qscores = sss.decimal_values(np.round(rng.uniform(3, 15, 5000), 6).astype(np.float32))
+        qscores_32 = rng.uniform(3, 15, 5000).astype(np.float32)
+        qscores_32[rng.integers(0, 5000, 50)] = np.nan
+        codes = rng.integers(-1, 30, 5000).astype(np.int16)
+        codes[codes == 7] = 8
+
+        for values in (lengths, qscores, qscores_32):
+            statistics, groups = ssc.group_statistics(values, codes, 31)
+            for code in range(31):
+                expected = pd.Series(values[codes == code]).describe()
+                # describe() sums the 32 bit values in 32 bit
+                assert_describe_equal(expected, statistics.loc[code],
+                                      rtol=1e-6 if values.dtype == np.float32 else 1e-12)
+                np.testing.assert_array_equal(np.sort(values[codes == code]), groups[code])
+
+
+class TestLargeBarcodeKits(unittest.TestCase):
+
+    """ Test the barcode names and the barcode graphs of kits with many barcodes """
+
+    def test_parse_barcode_selection(self):
+        """
+        Test the names of the barcode arrangements of the barcodes of kits, of ranges of barcodes and of other names
+        """
+        self.assertEqual(['barcode07', 'barcode12'], ssc.parse_barcode_selection('BC12,bc07'))
+        self.assertEqual(['barcode01', 'barcode02', 'barcode03', 'barcode96', 'barcode384'],
+                         ssc.parse_barcode_selection('NB01-NB03, RB96,barcode384'))
+        self.assertEqual(['barcode01', 'barcode01_barcode02', 'barcode10'],
+                         ssc.parse_barcode_selection('PCB10,barcode01_barcode02,,BC01'))
+        self.assertEqual(['barcode95', 'barcode96'], ssc.parse_barcode_selection('BC96-95'))
+
+    def test_bounded_barcode_graphs(self):
+        """
+        Test that the boxplots of the barcodes have one trace per read type and that the pie chart has a bounded
+        number of slices whatever the number of barcodes
+        """
+        barcodes = ['barcode{:02d}'.format(i) for i in range(1, 385)] + ['unclassified', 'other barcodes']
+        values = np.arange(1, 11, dtype=np.uint32)
+        groups = {(t, b): values for t in ('all', 'pass', 'fail') for b in barcodes}
+
+        result_directory = tempfile.mkdtemp()
+        try:
+            div = pgc._barcode_boxplot_graph('Barcode boxplots', groups, 'green', 'red', 'Length', 'Read type',
+                                             result_directory)[3]
+            self.assertEqual(2, div.count('"type": "box"'))
+            self.assertIn('"barcode384"', div)
+            self.assertIn('barcode361 - barcode384', div)
+
+            counts = pd.Series(np.arange(len(barcodes)), index=barcodes)
+            graph_name, _, table_html, div = pgc._pie_chart_graph('Barcode pie chart', counts, ['red'], False,
+                                                                  result_directory)
+            self.assertIn('367 smaller barcodes', div)
+            self.assertIn('barcode01', table_html)
+        finally:
+            shutil.rmtree(result_directory)
+
+
+class TestLengthHistogram(unittest.TestCase):
+
+    """ Test the exact statistics of the read lengths computed from histograms """
+
+    def test_same_statistics_as_pandas(self):
+        """
+        Test that the statistics and the NXX values are the same as the ones of describe() and compute_nxx(),
+        including lengths stored in the sparse bins
+        """
+        lengths = np.random.default_rng(2).integers(0, 50000, 10001).astype(np.uint32)
+        lengths[:3] = [ssa.histogram_dense_size, 3 * ssa.histogram_dense_size, ssa.histogram_dense_size]
+
+        histogram = ssa.Histogram()
+        histogram.update(lengths[:5000])
+        other = ssa.Histogram.from_values(lengths[5000:])
+        histogram.merge(other)
+
+        expected = pd.Series(lengths).describe()
+        testing.assert_series_equal(expected.drop('std'), histogram.describe().drop('std'), check_exact=True)
+        self.assertAlmostEqual(expected['std'], histogram.describe()['std'])
+        self.assertEqual(ssc.compute_nxx(lengths), histogram.nxx_values())
+        self.assertEqual(2, len(histogram.sparse_bins))
+
+    def test_length_statistics_in_report(self):
+        """
+        Test that the length statistics of the extractor are the same as the ones of describe()
+        """
+        extractor = sse.SequencingSummaryExtractor(cfg.only_seq_summary_config)
+        extractor.init()
+        result_dict = {}
+        extractor.extract(result_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.'
+        df = extractor.dataframe_1d
+        self.assertEqual(int(df['sequence_length'].sum()), result_dict[prefix + 'yield'])
+        for key, value in df['sequence_length'][df['passes_filtering']].describe().drop('count').items():
+            self.assertEqual(value, result_dict[prefix + 'pass.reads.sequence.length.' + key])
+
+
+class TestQuantileSketch(unittest.TestCase):
+
+    """ Test the mergeable quantile sketches """
+
+    values = np.random.default_rng(1).lognormal(8, 1, 10001)
+
+    def test_merge_equals_union(self):
+        """
+        Test that merging the sketches of parts of the values gives the sketch of all the values
+        """
+        expected = ssa.QuantileSketch()
+        expected.update(self.values)
+
+        actual = ssa.QuantileSketch()
+        for part in (self.values[5000:], self.values[:1000], self.values[1000:5000]):
+            sketch = ssa.QuantileSketch()
+            sketch.update(part)
+            actual.merge(sketch)
+
+        self.assertEqual(expected.offset, actual.offset)
+        self.assertEqual(expected.counts.tolist(), actual.counts.tolist())
+        for q in (0, .25, .5, .75, 1):
+            self.assertEqual(expected.quantile(q), actual.quantile(q))
+
+    def test_relative_error(self):
+        """
+        Test that the quantiles are within the relative accuracy of the exact quantiles
+        """
+        sketch = ssa.QuantileSketch(0.02)
+        sketch.update(np.append(self.values, [0, np.nan]))
+        exact = pd.Series(np.append(self.values, 0))
+
+        for q in (0, .01, .25, .5, .75, .99, 1):
+            self.assertLessEqual(abs(sketch.quantile(q) - exact.quantile(q)), 0.02 * exact.quantile(q))
+        self.assertEqual(exact.max(), sketch.quantile(1))
+
+
+class TestChannelTable(unittest.TestCase):
+
+    """ Test the statistics of the reads by channel computed with bincounts """
+
+    def test_same_statistics_as_pandas(self):
+        """
+        Test that the statistics of the channels of a PromethION sized flowcell are the same as the ones of a
+        pandas groupby, the qscores being rounded to the resolution of the histograms
+        """
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame({'channel': rng.integers(1, 3001, 20000).astype(np.uint16),
+                           'sequence_length': rng.integers(1, 10000, 20000).astype(np.uint32),
+                           'passes_filtering': rng.random(20000) < 0.8,
+                           'mean_qscore': np.round(rng.normal(10, 2, 20000), 1).astype(np.float32)})
+
+        table = ssa.ChannelTable.from_dataframe(df[:5000])
+        table.merge(ssa.ChannelTable.from_dataframe(df[5000:]))
+        actual = table.to_dataframe()
+
+        grouped = df.groupby('channel')
+        np.testing.assert_array_equal(grouped.size().index.values, actual.index.values)
+        np.testing.assert_array_equal(grouped.size().values, actual['reads'].values)
+        np.testing.assert_array_equal(grouped['sequence_length'].sum().values, actual['bases'].values)
+        np.testing.assert_allclose(grouped['passes_filtering'].mean().values, actual['pass.ratio'].values)
+        np.testing.assert_allclose(grouped['mean_qscore'].median().values, actual['median.qscore'].values,
+                                   atol=1e-5)
+        testing.assert_series_equal(df['channel'].value_counts().describe(), table.occupancy().describe(),
+                                    check_names=False)
+
+
+class TestTimeBinCube(unittest.TestCase):
+
+    """ Test the aggregates of the reads by time bin, read type and barcode """
+
+    def test_same_statistics_as_pandas(self):
+        """
+        Test that the counts and the medians by time bin of a cube merged from two parts of the reads are the ones
+        of a pandas groupby, the medians being within the relative accuracy of the sketches
+        """
+        rng = np.random.default_rng(5)
+        df = pd.DataFrame({'start_time': rng.uniform(0, 3 * 3600, 20000).astype(np.float32),
+                           'sequence_length': rng.integers(1, 10000, 20000).astype(np.uint32),
+                           'passes_filtering': rng.random(20000) < 0.8,
+                           'mean_qscore': rng.uniform(3, 15, 20000).astype(np.float32),
+                           'duration': rng.uniform(1, 20, 20000).astype(np.float32),
+                           'barcode_arrangement': pd.Categorical(rng.choice(['barcode01', 'barcode02'], 20000))})
+
+        cube = ssa.TimeBinCube.from_dataframe(df[:5000], df['barcode_arrangement'][:5000])
+        cube.merge(ssa.TimeBinCube.from_dataframe(df[5000:], df['barcode_arrangement'][5000:]))
+        self.assertEqual({(t, b) for t in ssa.read_types for b in ('barcode01', 'barcode02')},
+                         set(cube.read_counts))
+
+        pass_df = df[df['passes_filtering']]
+        time_bins = (pass_df['start_time'] // ssa.time_bin_duration).astype(int)
+        np.testing.assert_array_equal(np.bincount(time_bins), cube.time_read_counts('pass'))
+        np.testing.assert_array_equal(np.bincount(time_bins, weights=pass_df['sequence_length']),
+                                      cube.time_base_counts('pass'))
+
+        hourly = cube.hourly_statistics()
+        grouped = df.groupby((df['start_time'] // 3600).astype(int))
+        np.testing.assert_array_equal(grouped.size().values, hourly['reads'].values)
+        np.testing.assert_allclose(grouped['passes_filtering'].mean().values, hourly['pass.ratio'].values)
+        np.testing.assert_allclose(grouped['sequence_length'].median().values, hourly['median.length'].values,
+                                   rtol=0.02)
+        np.testing.assert_allclose(grouped['mean_qscore'].median().values, hourly['median.qscore'].values,
+                                   rtol=0.02)
+
+        state_cube = ssa.TimeBinCube.from_state(cube.get_state())
+        self.assertEqual(cube.run_time, state_cube.run_time)
+        pd.testing.assert_frame_equal(hourly, state_cube.hourly_statistics())
+
+
+class TestPartialResults(unittest.TestCase):
+
+    """ Test the partial result files of the shards of a run and their merge """
+
+    def test_merge_partial_results(self):
+        """
+        Test that merging the partial results of two shards gives the same statistics as the whole run
+        """
+        expected = {}
+        extractor = ssse.StreamingSequencingSummaryExtractor(cfg.streaming_config)
+        extractor.init()
+        extractor.extract(expected)
+
+        chunks = list(extractor._load_sequencing_summary_chunks())
+        with tempfile.TemporaryDirectory() as directory:
+            partial_files = []
+            for i, shard in enumerate((chunks[:1], chunks[1:])):
+                aggregator = ssa.SequencingSummaryAggregator(random_seed=None)
+                for chunk in shard:
+                    aggregator.update(chunk)
+                partial_files.append(os.path.join(directory, 'shard' + str(i) + '.npz'))
+                ssp.write_partial(partial_files[-1], aggregator)
+
+            config = dict(cfg.streaming_config, partial_source='\t'.join(partial_files))
+            extractor = ssp.MergedSequencingSummaryExtractor(config)
+            self.assertEqual((True, ""), extractor.check_conf())
+            extractor.init()
+            actual = {}
+            extractor.extract(actual)
+
+        # The memory used by the reads of the whole run is unknown
+        expected = {key: value for key, value in expected.items() if '.memory.usage.' not in key}
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for key, value in expected.items():
+            if isinstance(value, float):
+                self.assertAlmostEqual(value, actual[key], places=6, msg=key)
+            else:
+                self.assertEqual(value, actual[key], msg=key)
+        read_count = expected[extractor.get_report_data_file_id() + '.read.count']
+        self.assertEqual(min(ssa.sample_size, read_count), len(extractor.aggregator.sample))
+
+    def test_merge_partial_results_of_files(self):
+        """
+        Test that merging the partial results of two files with the halves of a run gives the statistics of the
+        whole run computed with all the reads in memory, except the qscore quantiles that are rounded to 0.001
+        """
+        source = os.path.join(cfg.path, 'Guppy-basecall-1D-DNA_sequencing_summary.txt')
+        config = dict(cfg.streaming_config, sequencing_summary_source=source, chunk_size=None)
+        expected = {}
+        extractor = sse.SequencingSummaryExtractor(config)
+        extractor.init()
+        extractor.extract(expected)
+
+        with open(source) as f:
+            lines = f.readlines()
+        with tempfile.TemporaryDirectory() as directory:
+            partial_files = []
+            for i, shard in enumerate((lines[1:2000], lines[2000:])):
+                shard_file = os.path.join(directory, 'shard' + str(i) + '.txt')
+                with open(shard_file, 'w') as f:
+                    f.writelines([lines[0]] + shard)
+                extractor = ssse.StreamingSequencingSummaryExtractor(dict(config,
+                                                                          sequencing_summary_source=shard_file))
+                extractor.init()
+                partial_files.append(os.path.join(directory, 'shard' + str(i) + '.npz'))
+                ssp.write_partial(partial_files[-1], extractor.aggregator)
+
+            # Like the merge command, without sequencing summary source
+            merge_config = {key: value for key, value in config.items() if key != 'sequencing_summary_source'}
+            merge_config['partial_source'] = '\t'.join(partial_files)
+            extractor = ssp.MergedSequencingSummaryExtractor(merge_config)
+            self.assertEqual((True, ""), extractor.check_conf())
+            self.assertIsNone(extractor.preview)
+            extractor.init()
+            actual = {}
+            extractor.extract(actual)
+
+        expected = {key: value for key, value in expected.items() if '.memory.usage.' not in key}
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for key, value in expected.items():
+            if key.endswith('duration'):
+                continue
+            elif 'qscore' in key and key.endswith('%'):
+                self.assertLessEqual(abs(value - actual[key]), 0.5 / ssa.qscore_resolution + 1e-9, msg=key)
+            elif isinstance(value, float):
+                self.assertAlmostEqual(value, actual[key], delta=1e-12 * abs(value), msg=key)
+            else:
+                self.assertEqual(value, actual[key], msg=key)
+
+    def test_invalid_partial_result_file(self):
+        """
+        Test that a file that is not a partial result file is rejected
+        """
+        config = dict(cfg.streaming_config, partial_source=cfg.streaming_config['sequencing_summary_source'])
+        check_result, error_message = ssp.MergedSequencingSummaryExtractor(config).check_conf()
+        self.assertFalse(check_result)
+        self.assertIn("Invalid partial result file", error_message)
+
+
+class TestFollowMode(unittest.TestCase):
+
+    """ Test the follow mode of the sequencing summary files that are still being written """
+
+    def test_appended_lines_range(self):
+        """
+        Test that only the complete lines appended after an offset are in the range
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'sequencing_summary.txt')
+            with open(filename, 'wb') as f:
+                f.write(b'read_id\tchannel')
+            self.assertEqual((0, 0), ssr.appended_lines_range(filename, 0))
+
+            with open(filename, 'ab') as f:
+                f.write(b'\nr1\t1\nr2\t')
+            self.assertEqual((16, 21), ssr.appended_lines_range(filename, 0))
+            self.assertEqual((21, 21), ssr.appended_lines_range(filename, 21))
+
+            with open(filename, 'ab') as f:
+                f.write(b'2\nr3\t3\n')
+            self.assertEqual((21, 31), ssr.appended_lines_range(filename, 21))
+
+    def test_follow_growing_file(self):
+        """
+        Test that the statistics of a file read while it is written in several steps are the same as the ones
+        of the whole file
+        """
+        expected = {}
+        extractor = ssse.StreamingSequencingSummaryExtractor(cfg.streaming_config)
+        extractor.init()
+        extractor.extract(expected)
+
+        with open(cfg.streaming_config['sequencing_summary_source'], 'rb') as f:
+            data = f.read()
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'sequencing_summary.txt')
+            steps = [data.index(b'\n') + 10, len(data) // 3, len(data) // 2 + 7, len(data)]
+            with open(filename, 'wb') as f:
+                f.write(data[:steps[0]])
+
+            config = dict(cfg.streaming_config, sequencing_summary_source=filename, follow='1')
+            extractor = ssse.FollowingSequencingSummaryExtractor(config)
+            self.assertEqual((True, ""), extractor.check_conf())
+
+            # The first line is not complete yet, init() waits for the next step
+            with patch.object(ssse.time, 'sleep', side_effect=lambda seconds: self._append(filename, data[:steps[1]])):
+                extractor.init()
+
+            for start, end in zip(steps[1:], steps[2:]):
+                with open(filename, 'ab') as f:
+                    f.write(data[start:end])
+                self.assertLess(0, extractor.update())
+            self.assertEqual(0, extractor.update())
+
+            actual = {}
+            extractor.extract(actual)
+
+        for key, value in expected.items():
+            if key.endswith('.duration'):
+                continue
+            if isinstance(value, float):
+                self.assertAlmostEqual(value, actual[key], places=6, msg=key)
+            else:
+                self.assertEqual(value, actual[key], msg=key)
+
+    @staticmethod
+    def _append(filename, data):
+        """
+        Append to a file the end of data that is not in the file yet
+        :param filename: path of the file
+        :param data: bytes of the whole file
+        """
+        with open(filename, 'ab') as f:
+            f.write(data[f.tell():])
+
+    def test_follow_before_first_read(self):
+        """
+        Test that the follow mode started before the header and the first read are written waits for the first read
+        and stops with an error when no read is written
+        """
+        with open(cfg.streaming_config['sequencing_summary_source'], 'rb') as f:
+            data = f.read()
+        header_end = data.index(b'\n') + 1
+        steps = [data[:header_end // 2], data[:header_end], data[:data.index(b'\n', header_end) + 1]]
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'sequencing_summary.txt')
+            open(filename, 'wb').close()
+
+            config = dict(cfg.streaming_config, sequencing_summary_source=filename, follow='0.5')
+            extractor = ssse.FollowingSequencingSummaryExtractor(config)
+            self.assertEqual((True, ""), extractor.check_conf())
+
+            # The file is empty, then its header is incomplete, then it has no read, then it has a read
+            remaining_steps = iter(steps)
+            with patch.object(ssse.time, 'sleep',
+                              side_effect=lambda seconds: self._append(filename, next(remaining_steps))) as sleep:
+                extractor.init()
+            self.assertEqual(3, sleep.call_count)
+            sleep.assert_called_with(30)
+            self.assertEqual(1, extractor.aggregator.read_count)
+
+            # The command stops with an error message when no read is written
+            open(filename, 'wb').close()
+            extractor = ssse.FollowingSequencingSummaryExtractor(config)
+            with patch.object(ssse, 'follow_idle_timeout', 0):
+                self.assertRaises(pd.errors.EmptyDataError, extractor.init)
+
+    @patch.object(tqc, '_write_reports')
+    @patch.object(tqc.time, 'sleep')
+    def test_follow_durations(self, sleep, write_reports):
+        """
+        Test that the reports written at each update have the durations of all the extractors
+        """
+        telemetry_extractor = Mock()
+        telemetry_extractor.get_report_data_file_id.return_value = 'sequencing.telemetry.extractor'
+        telemetry_extractor.graph_generation.return_value = []
+        follow_extractor = Mock(spec=ssse.FollowingSequencingSummaryExtractor)
+        follow_extractor.get_report_data_file_id.return_value = ssse.FollowingSequencingSummaryExtractor.\
+            get_report_data_file_id()
+        follow_extractor.graph_generation.return_value = []
+        follow_extractor.update.side_effect = [100, KeyboardInterrupt()]
+
+        tqc._follow({'quiet': 'true'}, [telemetry_extractor, follow_extractor], 1)
+
+        result_dict = write_reports.call_args[0][1]
+        self.assertIn('sequencing.telemetry.extractor.duration', result_dict)
+        self.assertIn('basecaller.sequencing.summary.1d.extractor.duration', result_dict)
+
+
+class TestReadIdKeys(unittest.TestCase):
+
+    """ Test the conversion of read ids to 128-bit keys """
+
+    def test_uuid_keys(self):
+        """
+        Test that the keys of UUIDs are their 128-bit values, whatever the case of their hexadecimal digits
+        """
+        read_ids = np.array(['eb635312-ffcb-45bb-aa3a-5719833bb9c3', '2FD5B7C6-962D-4BB2-9150-53B2DCA0E9A2'])
+        high, low = ssr.read_id_keys(read_ids)
+
+        self.assertEqual([0xeb635312ffcb45bb, 0x2fd5b7c6962d4bb2], high.tolist())
+        self.assertEqual([0xaa3a5719833bb9c3, 0x915053b2dca0e9a2], low.tolist())
+
+    def test_other_read_id_keys(self):
+        """
+        Test that the read ids that are not UUIDs get distinct keys
+        """
+        high, low = ssr.read_id_keys(np.array(['read_1', 'read_2', 'read_1', 'eb635312-ffcb-45bb-aa3a-5719833bb9c3x']))
+
+        self.assertEqual(3, len(set(zip(high.tolist(), low.tolist()))))
+        self.assertEqual((high[0], low[0]), (high[2], low[2]))
+
+
+class TestCategoricalBarcodes(unittest.TestCase):
+
+    """ Test the categorical barcode_arrangement column """
+
+    def test_load_categorical_barcodes(self):
+        """
+        Test that the barcodes are loaded as a categorical with sorted categories and without missing values
+        """
+        extractor = sse.SequencingSummaryExtractor(cfg.whole_config)
+        extractor.init()
+        df = extractor.dataframe_1d
+
+        self.assertIsInstance(df['barcode_arrangement'].dtype, pd.CategoricalDtype)
+        categories = list(df['barcode_arrangement'].cat.categories)
+        self.assertEqual(sorted(categories), categories)
+        self.assertFalse(df['barcode_arrangement'].isna().any())
+
+    def test_group_other_barcodes(self):
+        """
+        Test that the barcodes that are not selected are replaced by 'other barcodes'
+        """
+        barcodes = pd.Series(['barcode02', 'unclassified', 'barcode01', 'barcode03', 'barcode02'], dtype='category')
+        actual = ssc.group_other_barcodes(barcodes, ['barcode02', 'unclassified'])
+
+        self.assertEqual(['barcode02', 'other barcodes', 'unclassified'], list(actual.cat.categories))
+        self.assertEqual(['barcode02', 'unclassified', 'other barcodes', 'other barcodes', 'barcode02'],
+                         actual.tolist())
+
+
+class TestSequencingSummarySchema(unittest.TestCase):
+
+    """ Test the types and the missing values of the columns """
+
+    def test_fill_missing_values(self):
+        """
+        Test that only the missing values are replaced, with the types of the columns kept
+        """
+        df = pd.DataFrame({'duration': np.array([1.5, np.nan], dtype=np.float32),
+                           'channel': np.array([1, 2], dtype=np.uint16),
+                           'barcode_arrangement': pd.Categorical(['barcode01', np.nan])})
+        sss.fill_missing_values(df)
+
+        self.assertEqual([1.5, 0], df['duration'].tolist())
+        self.assertEqual(np.float32, df['duration'].dtype)
+        self.assertEqual(np.uint16, df['channel'].dtype)
+        self.assertEqual(['barcode01', 'unclassified'], df['barcode_arrangement'].tolist())
+
+    def test_decimal_values(self):
+        """
+        Test that the 32 bit values are converted to the shortest decimal numbers read as the same 32 bit floats
+        """
+        values = np.array([8.226, 9.919, 14.379015, 16991.570312, 0, np.nan, -3.25, 1.0e7], dtype=np.float32)
+        expected = np.array([8.226, 9.919, 14.379015, 16991.57, 0, np.nan, -3.25, 1.0e7])
+
+        actual = sss.decimal_values(values)
+        self.assertEqual(np.float64, actual.dtype)
+        np.testing.assert_array_equal(expected, actual)
+
+        lengths = np.array([1, 2], dtype=np.uint32)
+        self.assertIs(lengths, sss.decimal_values(lengths))
+
+    def test_qscore_statistics_of_file_values(self):
+        """
+        Test that the PHRED score statistics in the result_dict are the ones of the values of the file, not the ones
+        of their 32 bit approximations
+        """
+        extractor = sse.SequencingSummaryExtractor(cfg.only_seq_summary_config)
+        extractor.init()
+        result_dict = {}
+        extractor.extract(result_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.'
+        self.assertEqual(9.919, result_dict[prefix + 'all.read.qscore.max'])
+        self.assertEqual(7.028, result_dict[prefix + 'all.read.qscore.25%'])
+
+    def test_memory_usage_in_report(self):
+        """
+        Test that the memory used by each column is in the result_dict
+        """
+        extractor = sse.SequencingSummaryExtractor(cfg.whole_config)
+        extractor.init()
+        result_dict = {}
+        extractor.extract(result_dict)
+
+        prefix = extractor.get_report_data_file_id() + '.memory.usage.'
+        self.assertEqual(extractor.dataframe_1d['channel'].nbytes, result_dict[prefix + 'channel'])
+        self.assertEqual(sum(extractor.memory_usage.values()), result_dict[prefix + 'total'])
@@ -153,14 +153,41 @@ def _modules_report(graphs, result_dict, run_id, report_name, run_date, toulligq
 def _basic_statistics_module_report(result_dict, sample_id, report_name, run_date, toulligqc_version):
     minknow_version = _get_result_value(result_dict, 'sequencing.telemetry.extractor.minknow.version', "Unknown")
 
-    td = datetime.timedelta(hours=result_dict["basecaller.sequencing.summary.1d.extractor.run.time"])
-    seconds = td.total_seconds()
-    run_time = '%dh%02dm%02ds' % (seconds / 3600, seconds / 60 % 60, seconds % 60)
+    # The statistics that have not been computed (see the outputs option) are unknown
+    if "basecaller.sequencing.summary.1d.extractor.run.time" in result_dict:
+        td = datetime.timedelta(hours=result_dict["basecaller.sequencing.summary.1d.extractor.run.time"])
+        seconds = td.total_seconds()
+        run_time = '%dh%02dm%02ds' % (seconds / 3600, seconds / 60 % 60, seconds % 60)
+    else:
+        run_time = "Unknown"
 
-    read_count = result_dict["basecaller.sequencing.summary.1d.extractor.read.count"]
-    run_yield = _format_int_with_prefix(result_dict["basecaller.sequencing.summary.1d.extractor.yield"])
-    n50 = result_dict["basecaller.sequencing.summary.1d.extractor.n50"]
-    l50 = result_dict["basecaller.sequencing.summary.1d.extractor.l50"]
+    if "basecaller.sequencing.summary.1d.extractor.read.count" in result_dict:
+        read_count = _format_int(result_dict["basecaller.sequencing.summary.1d.extractor.read.count"])
+    else:
+        read_count = "Unknown"
+    if "basecaller.sequencing.summary.1d.extractor.yield" in result_dict:
+        run_yield = _format_int_with_prefix(result_dict["basecaller.sequencing.summary.1d.extractor.yield"])
+    else:
+        run_yield = "Unknown"
+    if "basecaller.sequencing.summary.1d.extractor.n50" in result_dict:
+        n50 = _format_int(int(result_dict["basecaller.sequencing.summary.1d.extractor.n50"]))
+        l50 = _format_int(int(result_dict["basecaller.sequencing.summary.1d.extractor.l50"]))
+    else:
+        n50 = l50 = "Unknown"
+
+    # In preview mode, the statistics are estimated from a sample of the reads
+    preview_note = ""
+    preview_prefix = "basecaller.sequencing.summary.1d.extractor.preview."
+    if preview_prefix + "sample.read.count" in result_dict:
+        if preview_prefix + "estimated.read.count" in result_dict:
+            read_count = "~" + _format_int(result_dict[preview_prefix + "estimated.read.count"])
+        if preview_prefix + "estimated.yield" in result_dict:
+            run_yield = "~" + str(_format_int_with_prefix(result_dict[preview_prefix + "estimated.yield"]))
+        if preview_prefix + "estimated.l50" in result_dict:
+            l50 = "~" + _format_int(result_dict[preview_prefix + "estimated.l50"])
+        preview_note = """
+            <p><b>Preview:</b> the statistics and the graphs are estimations computed from a random sample of
+            {} reads.</p>""".format(_format_int(result_dict[preview_prefix + "sample.read.count"]))
 
     # from telemetry file
     flow_cell_id = _get_result_value(result_dict, 'sequencing.telemetry.extractor.flowcell.id', "Unknown")
@@ -186,7 +213,7 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
     # Compose the main of the page
     result = """
       <div class="module" id="Run-statistics">
-            <h2>Run Statistics {help_link}</h2>
+            <h2>Run Statistics {help_link}</h2>{preview_note}
             <table class="dataframe" border="">
               <thead><tr><th>Measure</th><th>Value</th></tr></thead>
               <tbody>
@@ -208,6 +235,7 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
             </table>
       </div> <!-- End of "Run-statistics" module -->
     """.format(help_link=help_html_link("Run Statistics"),
+               preview_note=preview_note,
                run_id=run_id,
                experiment_group=experiment_group,
                sample_id=sample_id,
@@ -219,9 +247,9 @@ def _basic_statistics_module_report(result_dict, sample_id, report_name, run_dat
                flowcell_version=flowcell_version,
                kit_version=kit_version,
                run_yield=run_yield,
-               read_count=_format_int(read_count),
-               n50=_format_int(int(n50)),
-               l50=_format_int(int(l50)))
+               read_count=read_count,
+               n50=n50,
+               l50=l50)
 
     result += """
       <div class="module" id="Software-info">
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Catalog of the input files of a run. Each file is opened only once to get its type, its compression,
+# its columns, its size and an estimation of its number of lines. The extractors query the catalog
+# instead of reading the header of the files themselves.
+# Directory sources are walked once, in parallel, to find all the summary files they contain.
+
+import bz2
+import concurrent.futures
+import fnmatch
+import os
+import zlib
+
+from toulligqc.sequencing_summary_reader import compression_magic_bytes
+from toulligqc.sequencing_summary_reader import decompression_errors
+from toulligqc.sequencing_summary_reader import read_header
+from toulligqc.sequencing_summary_reader import zstandard
+
+# Types of input files
+sequencing_summary_type = 'sequencing_summary'
+sequencing_summary_with_barcodes_type = 'sequencing_summary_with_barcodes'
+sequencing_summary_1dsqr_type = 'sequencing_summary_1dsqr'
+barcoding_summary_type = 'barcoding_summary'
+
+# Patterns of the names of the summary files searched in directory sources
+summary_file_patterns = ('sequencing_summary*', 'barcoding_summary*', 'sequencing_1dsq_summary*')
+
+# Number of bytes read at the beginning of the files to get their header and to estimate their number of lines
+sample_size = 1024 * 1024
+
+
+class InputFile:
+    """
+    Description of an input file
+    """
+
+    def __init__(self, path, file_type, compression, columns, size, line_count):
+        """
+        Constructor
+        :param path: path of the file
+        :param file_type: type of the file or None if the file is not a summary file
+        :param compression: compression format or None if the file is not compressed
+        :param columns: list of the columns of the file
+        :param size: size of the file in bytes
+        :param line_count: number of lines (without header) if the file is small, an estimation otherwise,
+        None if it cannot be estimated
+        """
+        self.path = path
+        self.type = file_type
+        self.compression = compression
+        self.columns = columns
+        self.size = size
+        self.line_count = line_count
+
+    @property
+    def header(self):
+        return '\t'.join(self.columns)
+
+
+class InputCatalog:
+    """
+    Catalog of the input files of a run. The files are described on their first query and the description is
+    kept for the next queries.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._directories = {}
+
+    def get(self, path):
+        """
+        Get the description of an input file
+        :param path: path of the file
+        :return: an InputFile object
+        """
+        if path not in self._files:
+            self._files[path] = _describe_file(path)
+        return self._files[path]
+
+    def expand_sources(self, sources):
+        """
+        Replace the directories of a list of sources by the summary files they contain (recursively)
+        :param sources: list of paths of files or directories
+        :return: a list of paths of files
+        """
+        result = []
+        for source in sources:
+            if source and os.path.isdir(source):
+                result.extend(self.find_summary_files(source))
+            else:
+                result.append(source)
+        return result
+
+    def expand_sources_again(self, sources):
+        """
+        Like expand_sources(), but scan the directories again to find the files created since the last scan
+        :param sources: list of paths of files or directories
+        :return: a list of paths of files
+        """
+        for source in sources:
+            self._directories.pop(source, None)
+        return self.expand_sources(sources)
+
+    def describe_again(self, path):
+        """
+        Describe a file again, e.g. a file whose header was not written yet when it was first described
+        :param path: path of the file
+        :return: an InputFile object
+        """
+        self._files.pop(path, None)
+        return self.get(path)
+
+    def find_summary_files(self, directory):
+        """
+        Find the summary files of a directory and of its subdirectories. The subdirectories are scanned and the
+        files found are described in parallel, the files already described are not described again.
+        The result is kept for the next calls
+        :param directory: path of the directory
+        :return: a sorted list of paths of files
+        """
+        if directory in self._directories:
+            return self._directories[directory]
+
+        files = []
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            pending = {executor.submit(_scan_directory, directory)}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    subdirectories, directory_files = future.result()
+                    files.extend(directory_files)
+                    pending.update(executor.submit(_scan_directory, d) for d in subdirectories)
+
+            files.sort()
+            new_files = [f for f in files if f not in self._files]
+            descriptions = executor.map(_describe_file, new_files)
+            self._files.update(zip(new_files, descriptions))
+
+        self._directories[directory] = files
+        return files
+
+    def files(self):
+        """
+        Get the descriptions of all the files queried
+        :return: a list of InputFile objects
+        """
+        return list(self._files.values())
+
+    def get_type(self, path):
+        return self.get(path).type
+
+    def is_barcode_file(self, path):
+        """
+        Check if input is a barcoding summary file i.e. has the column barcode_arrangement
+        """
+        return self.get_type(path) == barcoding_summary_type
+
+    def is_sequencing_summary_file(self, path):
+        """
+        Check if input is a sequencing summary file i.e. first word is "filename" and does not have column
+        'barcode_arrangement'
+        """
+        return self.get_type(path) == sequencing_summary_type
+
+    def is_sequencing_summary_with_barcodes(self, path):
+        """
+        Check if the sequencing summary has also barcode information
+        """
+        return self.get_type(path) == sequencing_summary_with_barcodes_type
+
+    def is_sequencing_summary_1dsqr_file(self, path):
+        """
+        Check if input is a 1D² sequencing summary file i.e. first word is "filename1"
+        """
+        return self.get_type(path) == sequencing_summary_1dsqr_type
+
+
+def _scan_directory(path):
+    """
+    List the subdirectories and the summary files of a directory
+    :param path: path of the directory
+    :return: a tuple with the list of the subdirectories and the list of the summary files
+    """
+    subdirectories = []
+    files = []
+    with os.scandir(path) as it:
+        for entry in it:
+            # Symbolic links to directories are not followed to avoid cycles
+            if entry.is_dir(follow_symlinks=False):
+                subdirectories.append(entry.path)
+            elif entry.is_file() and any(fnmatch.fnmatchcase(entry.name, p) for p in summary_file_patterns):
+                files.append(entry.path)
+    return subdirectories, files
+
+
+def _describe_file(path):
+    """
+    Describe a file by reading its beginning
+    :param path: path of the file
+    :return: an InputFile object
+    """
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        raw = f.read(sample_size)
+
+    compression = None
+    for name, magic_bytes in compression_magic_bytes.items():
+        if raw.startswith(magic_bytes):
+            compression = name
+
+    data = _decompress_sample(raw, compression)
+    if data is None or b'\n' not in data:
+        # The header is longer than the sample or cannot be decompressed from memory
+        header = read_header(path)
+        line_count = None
+    else:
+        header = data[:data.index(b'\n')].decode('utf-8', errors='replace')
+        lines = data.count(b'\n')
+        if len(raw) == size:
+            # The whole file has been read
+            line_count = lines - 1 + (0 if data.endswith(b'\n') else 1)
+        else:
+            line_count = int(size * lines / len(raw)) - 1
+
+    return InputFile(path, _file_type(header), compression, header.rstrip('\r\n').split('\t'), size, line_count)
+
+
+def _file_type(header):
+    """
+    Get the type of a file from its header
+    """
+    if header.startswith('read_id') and 'barcode_arrangement' in header:
+        return barcoding_summary_type
+    if header.startswith('filename1') and 'barcode_arrangement' not in header:
+        return sequencing_summary_1dsqr_type
+    if header.startswith('filename') and 'barcode_arrangement' in header:
+        return sequencing_summary_with_barcodes_type
+    if header.startswith('filename'):
+        return sequencing_summary_type
+    return None
+
+
+def _decompress_sample(raw, compression):
+    """
+    Decompress the beginning of a file
+    :param raw: first bytes of the file
+    :param compression: compression format
+    :return: the decompressed bytes or None if the format cannot be decompressed in memory
+    """
+    if compression is None:
+        return raw
+
+    result = []
+    try:
+        # Multiple members or streams may be concatenated (e.g. bgzip blocks)
+        while raw:
+            if compression == 'gzip':
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            elif compression == 'bzip2':
+                decompressor = bz2.BZ2Decompressor()
+            elif zstandard is not None:
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+            else:
+                return None
+
+            result.append(decompressor.decompress(raw))
+            raw = getattr(decompressor, 'unused_data', b'')
+    except decompression_errors + (OSError,):
+        # Truncated data at the end of the sample
+        pass
+
+    return b''.join(result)
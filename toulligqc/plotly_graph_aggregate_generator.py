@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Generation of the Plotly and MPL graphs from the running aggregates of a sequencing summary
+# (see the sequencing_summary_aggregator module) instead of the dataframe_dict dictionary.
+
+import pandas as pd
+
+from toulligqc import plotly_graph_generator as pgg
+from toulligqc.plotly_graph_common import _boxplot_values
+from toulligqc.plotly_graph_common import _barcode_boxplot_values_graph
+from toulligqc.plotly_graph_common import _dataFrame_to_html
+from toulligqc.plotly_graph_common import _format_describe_dataframe
+from toulligqc.plotly_graph_common import _interpolate
+from toulligqc.plotly_graph_common import _phred_score_density_graph
+from toulligqc.plotly_graph_common import _pie_chart_graph
+from toulligqc.plotly_graph_common import _read_length_distribution_graph
+from toulligqc.plotly_graph_common import _read_quality_multiboxplot_graph
+from toulligqc.plotly_graph_common import _smooth_data
+from toulligqc.plotly_graph_common import interpolation_threshold
+from toulligqc.plotly_graph_common import toulligqc_colors
+from toulligqc.sequencing_summary_common import sort_barcode_index
+
+
+def read_length_scatterplot(aggregator, result_directory):
+    graph_name = "Distribution of read lengths"
+
+    npoints = 10000
+    sigma = 5
+    histograms = [aggregator.all_length(), aggregator.length['pass'], aggregator.length['fail']]
+    max_all_reads = histograms[0].max
+
+    data = []
+    for h in histograms:
+        count_x, count_y, cum_count_y = _smooth_data(npoints, sigma, h.bin_values(), min_arg=0,
+                                                     max_arg=max_all_reads, weights=h.bin_counts())
+        data.append((count_x, count_y))
+
+    table_df = pd.concat([h.describe() for h in histograms], axis=1, keys=['All reads', 'Pass reads', 'Fail reads'])
+
+    return _read_length_distribution_graph(graph_name=graph_name,
+                                           all_data=data[0],
+                                           pass_data=data[1],
+                                           fail_data=data[2],
+                                           percentiles={p: histograms[0].quantile(p / 100) for p in [25, 50, 75]},
+                                           coef=max_all_reads / npoints,
+                                           min_x_range=0,
+                                           max_x_range=histograms[0].quantile(.99),
+                                           all_color=toulligqc_colors['all'],
+                                           pass_color=toulligqc_colors['pass'],
+                                           fail_color=toulligqc_colors['fail'],
+                                           xaxis_title='Read length (bp)',
+                                           table_html=_dataFrame_to_html(_format_describe_dataframe(table_df)),
+                                           result_directory=result_directory)
+
+
+def yield_plot(aggregator, result_directory):
+    """
+    Plots the different reads (1D, 1D pass, 1D fail) produced along the run against the time(in hour)
+    """
+
+    return pgg.yield_plot({'time.bins': aggregator.time_bins}, result_directory)
+
+
+def read_quality_multiboxplot(aggregator, result_directory):
+    """
+    Boxplot of PHRED score between read pass and read fail
+    Violin plot of PHRED score between read pass and read fail
+    """
+
+    graph_name = "PHRED score distribution"
+
+    histograms = {'All reads': aggregator.all_qscore(),
+                  'Pass reads': aggregator.qscore['pass'],
+                  'Fail reads': aggregator.qscore['fail']}
+
+    sample = aggregator.sample
+    violin_data = {'All reads': sample['mean_qscore'],
+                   'Pass reads': sample['mean_qscore'][sample['passes_filtering']],
+                   'Fail reads': sample['mean_qscore'][~sample['passes_filtering']]}
+
+    # If more than 10.000 reads, interpolate data
+    for name, values in violin_data.items():
+        if len(values) > interpolation_threshold:
+            violin_data[name] = _interpolate(values, 1000)
+
+    boxplot_values = {name: _boxplot_values(h.min, h.quantile(.25), h.quantile(.5), h.quantile(.75), h.max, h.count)
+                      for name, h in histograms.items()}
+
+    table_df = pd.concat([h.describe() for h in histograms.values()], axis=1, keys=list(histograms))
+
+    return _read_quality_multiboxplot_graph(graph_name=graph_name,
+                                            boxplot_values=boxplot_values,
+                                            violin_data=violin_data,
+                                            colors={'All reads': toulligqc_colors['all'],
+                                                    'Pass reads': toulligqc_colors['pass'],
+                                                    'Fail reads': toulligqc_colors['fail']},
+                                            yaxis_range=[histograms['All reads'].min - 2.0,
+                                                         histograms['All reads'].max + 2.0],
+                                            table_html=_dataFrame_to_html(_format_describe_dataframe(table_df)),
+                                            result_directory=result_directory)
+
+
+def allphred_score_frequency(aggregator, result_directory):
+    """
+    Plot the distribution of the phred score per read type (1D , 1D pass, 1D fail)
+    """
+
+    graph_name = "PHRED score density distribution"
+
+    all_histogram = aggregator.all_qscore()
+
+    data = []
+    for h in (aggregator.qscore['pass'], aggregator.qscore['fail']):
+        count_x, count_y, cum_count_y = _smooth_data(10000, 5, h.bin_values(), min_arg=all_histogram.min,
+                                                     max_arg=all_histogram.max, weights=h.bin_counts(),
+                                                     density=True)
+        # _smooth_data() scales densities by the number of values, here the number of bins
+        data.append((count_x, count_y * h.count / max(1, len(h.bin_values())) / all_histogram.count))
+
+    pass_histogram = aggregator.qscore['pass']
+
+    return _phred_score_density_graph(graph_name=graph_name,
+                                      pass_data=data[0],
+                                      fail_data=data[1],
+                                      pass_percentiles={p: pass_histogram.quantile(p / 100) for p in [25, 50, 75]},
+                                      pass_color=toulligqc_colors['pass'],
+                                      fail_color=toulligqc_colors['fail'],
+                                      result_directory=result_directory)
+
+
+def plot_performance(aggregator, result_directory):
+    """
+    Plots the channels occupancy by the reads
+    """
+
+    return pgg._channel_occupancy_heatmap(aggregator.channels, result_directory)
+
+
+def sequence_length_over_time(aggregator, result_directory):
+    return pgg.sequence_length_over_time({'time.bins': aggregator.time_bins}, result_directory)
+
+
+def phred_score_over_time(aggregator, result_dict, result_directory):
+    return pgg.phred_score_over_time({'time.bins': aggregator.time_bins}, result_dict, result_directory)
+
+
+def speed_over_time(aggregator, result_directory):
+    return pgg.speed_over_time({'time.bins': aggregator.time_bins}, result_directory)
+
+
+def sample_dataframe_dict(aggregator):
+    """
+    Create a dataframe_dict like dictionary from the random sample of reads, for the graphs of the
+    plotly_graph_generator module that only need a subset of the reads (scatter plot)
+    :param aggregator: SequencingSummaryAggregator object
+    :return: a dictionary of Series
+    """
+
+    sample = aggregator.sample.sort_values('start_time')
+    passes_filtering = sample['passes_filtering']
+
+    return {'pass.reads.sequence.length': sample['sequence_length'][passes_filtering],
+            'fail.reads.sequence.length': sample['sequence_length'][~passes_filtering],
+            'pass.reads.mean.qscore': sample['mean_qscore'][passes_filtering],
+            'fail.reads.mean.qscore': sample['mean_qscore'][~passes_filtering],
+            'all.reads.sequence.length': sample['sequence_length'],
+            'all.reads.mean.qscore': sample['mean_qscore'],
+            'all.reads.start.time': sample['start_time'],
+            'all.reads.duration': sample['duration']}
+
+
+#
+# For each barcode 1D
+#
+
+def barcode_percentage_pie_chart(aggregator, read_type, result_directory):
+    """
+    Plots a pie chart of 1D read pass or fail percentage per barcode of a run.
+    :param read_type: 'pass' or 'fail'
+    """
+
+    graph_name = "{} barcoded reads distribution".format(read_type.capitalize())
+
+    return _pie_chart_graph(graph_name=graph_name,
+                            count_sorted=sort_barcode_index(aggregator.barcode_counts(read_type)),
+                            color_palette=toulligqc_colors['pie_chart_palette'],
+                            one_d_square=False,
+                            result_directory=result_directory)
+
+
+def barcode_length_boxplot(aggregator, result_directory):
+    """
+    Boxplots all the 1D pass and fail read length for each barcode indicated in the sample sheet
+    """
+
+    return _barcode_boxplot(aggregator, 0, "Read size distribution for barcodes", "Sequence length (bp)",
+                            result_directory)
+
+
+def barcoded_phred_score_frequency(aggregator, result_directory):
+    """
+    Plot boxplot of the 1D pass and fail read qscore for each barcode indicated in the sample sheet
+    """
+
+    return _barcode_boxplot(aggregator, 1, "PHRED score distribution for barcodes", "PHRED score", result_directory)
+
+
+def _barcode_boxplot(aggregator, histogram_index, graph_name, yaxis_title, result_directory):
+
+    boxplot_values = {}
+    for read_type in ('Pass', 'Fail'):
+        boxplot_values[read_type] = {}
+        for barcode in sorted({barcode for barcode, t in aggregator.barcode_length}):
+            h = aggregator.barcode_histograms(barcode, read_type.lower())[histogram_index]
+            boxplot_values[read_type][barcode] = _boxplot_values(h.min, h.quantile(.25), h.quantile(.5),
+                                                                 h.quantile(.75), h.max, h.count)
+
+    return _barcode_boxplot_values_graph(graph_name=graph_name,
+                                         boxplot_values=boxplot_values,
+                                         pass_color=toulligqc_colors['pass'],
+                                         fail_color=toulligqc_colors['fail'],
+                                         yaxis_title=yaxis_title,
+                                         legend_title="Read type",
+                                         result_directory=result_directory)
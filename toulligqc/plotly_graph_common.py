@@ -20,6 +20,8 @@
 
 # This module contains common methods for plotly modules.
 
+import math
+
 import numpy as np
 import pandas as pd
 import plotly.offline as py
@@ -28,13 +30,17 @@ from scipy.ndimage.filters import gaussian_filter1d
 from sklearn.utils import resample
 import plotly.graph_objs as go
 from scipy.stats import norm
-from collections import defaultdict
+
+from toulligqc.sequencing_summary_aggregator import over_time_bin_duration
+from toulligqc.sequencing_summary_common import barcode_sort_key
 
 figure_image_width = 1000
 figure_image_height = 562
 percent_format_str = '{:.2f}%'
 line_width = 2
 interpolation_threshold = 10000
+barcodes_per_page = 24
+max_pie_chart_slices = 20
 
 toulligqc_colors = {'all': '#fca311',  # Yellow
                     'all_1d2': '#fca311',  # Yellow
@@ -151,7 +157,16 @@ def _make_describe_dataframe(value):
     :param value: information measured (series)
     """
 
-    desc = value.describe()
+    return _format_describe_dataframe(value.describe())
+
+
+def _format_describe_dataframe(desc):
+    """
+    Format a statistics table computed with the describe() method (or with the same index) for report.html
+    :param desc: statistics (dataframe)
+    """
+
+    desc = desc.copy()
     desc.loc['count'] = desc.loc['count'].astype(int).apply(lambda x: _format_int(x))
     desc.iloc[1:] = desc.iloc[1:].applymap(lambda x: _format_float(x))
     desc.rename({'50%': 'median'}, axis='index', inplace=True)
@@ -238,21 +253,36 @@ def _precompute_boxplot_values(y):
                     max=0,
                     notchspan=0)
 
-    q1 = y.quantile(.25)
-    q3 = y.quantile(.75)
+    return _boxplot_values(min(y), y.quantile(.25), y.quantile(.5), y.quantile(.75), max(y), len(y))
+
+
+def _boxplot_values(min_value, q1, median, q3, max_value, count):
+    """
+    Compute the values of a boxplot from the quartiles, the extreme values and the number of values
+    """
+
+    if count == 0:
+        return dict(min=0,
+                    lowerfence=0,
+                    q1=0,
+                    median=0,
+                    q3=0,
+                    upperfence=0,
+                    max=0,
+                    notchspan=0)
+
     iqr = q3 - q1
     upper_fence = q3 + (1.5 * iqr)
     lower_fence = q1 - (1.5 * iqr)
-    import math
-    notchspan = 1.57 * iqr / math.sqrt(len(y))
+    notchspan = 1.57 * iqr / math.sqrt(count)
 
-    return dict(min=min(y),
-                lowerfence=max(lower_fence, float(min(y))),
+    return dict(min=min_value,
+                lowerfence=max(lower_fence, float(min_value)),
                 q1=q1,
-                median=y.quantile(.5),
+                median=median,
                 q3=q3,
-                upperfence=min(upper_fence, float(max(y))),
-                max=max(y),
+                upperfence=min(upper_fence, float(max_value)),
+                max=max_value,
                 notchspan=notchspan)
 
 
@@ -306,52 +336,55 @@ def _create_and_save_div(fig, result_directory, main):
     return div, output_file
 
 
-def _over_time_graph(data_series,
-                     time_series,
-                     result_directory,
-                     graph_name,
-                     color,
-                     yaxis_title,
-                     log=False,
-                     time_bins=1000,
-                     sigma=1,
-                     quartiles=True,
-                     min_max=False,
-                     yaxis_starts_zero=False,
-                     green_zone_starts_at=None,
-                     green_zone_color='rgba(0,100,0,.1)'):
-
-    t = (time_series/3600).values
-    x = np.linspace(t.min(), t.max(), num=time_bins)
-    t = np.digitize(t, bins=x, right=True)
-
-    bin_dict = defaultdict(list)
-    for bin_idx, val in zip(t, data_series):
-        b = x[bin_idx]
-        bin_dict[b].append(val)
-
-    percentiles = (0, 25, 50, 75, 100)
-    y = []
-    for i in range(len(percentiles)):
-        y.append([])
-
-    for b in x:
-        if b in bin_dict:
-            for i, v in enumerate(percentiles):
-                y[i].append(np.percentile(bin_dict[b], v))
-        else:
-            for i in range(len(percentiles)):
-                y[i].append(np.nan)
+def _over_time_graph(sketches, result_directory, graph_name, color, yaxis_title, **kwargs):
+    """
+    Plot the min, quartiles and max of values through time from their quantile sketches by time bin
+    :param sketches: dictionary of the QuantileSketch objects by bin of over_time_bin_duration seconds
+    """
 
-    for i, v in enumerate(y):
-        y[i] = gaussian_filter1d(v, sigma=sigma)
+    time_bins = np.arange(min(sketches), max(sketches) + 1)
+
+    # Center of the time bins in hours
+    x = (time_bins + .5) * over_time_bin_duration / 3600
+    y = [[sketches[b].quantile(p / 100) if b in sketches else np.nan for b in time_bins]
+         for p in (0, 25, 50, 75, 100)]
+
+    return _over_time_percentiles_graph(x=x,
+                                        y=y,
+                                        result_directory=result_directory,
+                                        graph_name=graph_name,
+                                        color=color,
+                                        yaxis_title=yaxis_title,
+                                        **kwargs)
+
+
+def _over_time_percentiles_graph(x,
+                                 y,
+                                 result_directory,
+                                 graph_name,
+                                 color,
+                                 yaxis_title,
+                                 log=False,
+                                 sigma=1,
+                                 quartiles=True,
+                                 min_max=False,
+                                 yaxis_starts_zero=False,
+                                 green_zone_starts_at=None,
+                                 green_zone_color='rgba(0,100,0,.1)'):
+    """
+    Plot the min, quartiles and max of values through time
+    :param x: times of the bins in hours
+    :param y: list of the 0, 25, 50, 75 and 100 percentiles of the values of the bins (NaN for empty bins)
+    """
+
+    y = [gaussian_filter1d(v, sigma=sigma) for v in y]
 
     fig = go.Figure()
 
     # define the green zone if required
     if green_zone_starts_at is not None:
-        min_x = min(time_series)/3600
-        max_x = max(time_series)/3600
+        min_x = x[0]
+        max_x = x[-1]
         if min_max:
             max_y = max(y[4]) * 1.05
         else:
@@ -457,42 +490,274 @@ def _over_time_graph(data_series,
     return graph_name, output_file, table_html, div
 
 
-def _barcode_boxplot_graph(graph_name, df, barcode_selection, pass_color, fail_color, yaxis_title, legend_title, result_directory):
+def _yield_plot_graph(graph_name, read_data, base_data, colors, coef, result_directory, table_html=None):
+    """
+    Plot the cumulative and per hour yields in reads and in bases through time
+    :param read_data: dictionary of the smoothed read counts (as returned by _smooth_data) by read type name
+    :param base_data: dictionary of the smoothed base counts (as returned by _smooth_data) by read type name
+    :param colors: dictionary of the colors by read type name
+    :param coef: width of the time bins, used to convert counts to counts per hour
+    :param table_html: optional statistics table printed with the graph
+    """
+
+    fig = go.Figure()
+
+    # Figures for cumulative base yield plot
+    first = True
+    for smooth_data_dict in [read_data, base_data]:
+        for name, (count_x, count_y, cum_count_y) in smooth_data_dict.items():
+
+            fig.add_trace(go.Scatter(x=count_x,
+                                     y=cum_count_y,
+                                     name=name,
+                                     fill='tozeroy',
+                                     marker_color=colors[name],
+                                     visible=first
+                                     ))
+
+        count_x, count_y, cum_count_y = next(iter(smooth_data_dict.values()))
+        for p in [50, 75, 90, 99]:
+            y = cum_count_y
+            ymax = max(y)
+            index = (np.abs(y - ymax * p / 100)).argmin()
+            x0 = count_x[index]
+            fig.add_trace(go.Scatter(
+                mode="lines+text",
+                name=name,
+                x=[x0, x0],
+                y=[0, ymax],
+                line=dict(color="gray", width=1, dash="dot"),
+                text=["", str(p) + "% all reads"],
+                textposition="top center",
+                hoverinfo="skip",
+                showlegend=False,
+                visible=first
+            ))
+        first = False
+
+        for name, (count_x, count_y, cum_count_y) in smooth_data_dict.items():
+
+            fig.add_trace(go.Scatter(x=count_x,
+                                     y=count_y / coef,
+                                     name=name,
+                                     marker_color=colors[name],
+                                     fill='tozeroy',
+                                     visible=False
+                                     ))
+
+    fig.update_layout(
+        **_title(graph_name),
+        **default_graph_layout,
+        **_legend(args=dict(y=0.75)),
+        hovermode='x',
+        **_xaxis('Time (hours)', dict(rangemode="tozero")),
+        **_yaxis('Read count', dict(fixedrange=False, rangemode="tozero")),
+    )
+
+    # Add buttons
+
+    fig.update_layout(
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="down",
+                buttons=list([
+                    dict(
+                        args=[{'visible': [True, True, True,
+                                           True, True, True, True,
+                                           False, False, False,
+                                           False, False, False,
+                                           False, False, False, False,
+                                           False, False, False]},
+                              {'yaxis': {'title': '<b>Read count</b>', 'rangemode': "tozero"}}],
+                        label="Cumulative reads",
+                        method="update"
+                    ),
+                    dict(
+                        args=[{'visible': [False, False, False,
+                                           False, False, False, False,
+                                           True, True, True,
+                                           False, False, False,
+                                           False, False, False, False,
+                                           False, False, False
+                                           ]},
+                               {'yaxis': {'title': '<b>Read count per hour</b>', 'rangemode': "tozero"}}],
+                        label="Yield reads",
+                        method="update"
+                    ),
+                    dict(
+                        args=[{'visible': [False, False, False,
+                                           False, False, False, False,
+                                           False, False, False,
+                                           True, True, True,
+                                           True, True, True, True,
+                                           False, False, False]},
+                               {'yaxis': {'title': '<b>Base count</b>', 'rangemode': "tozero"}}],
+                        label="Cumulative bases",
+                        method="update"
+                    ),
+                    dict(
+                        args=[{'visible': [False, False, False,
+                                           False, False, False, False,
+                                           False, False, False,
+                                           False, False, False,
+                                           False, False, False, False,
+                                           True, True, True]},
+                               {'yaxis': {'title': '<b>Base count per hour</b>', 'rangemode': "tozero"}}],
+                        label="Yield bases",
+                        method="update"
+                    )
+                ]),
+                pad={"r": 20, "t": 20, "l": 20, "b": 20},
+                showactive=True,
+                x=1.0,
+                xanchor="left",
+                y=1.25,
+                yanchor="top"
+            ),
+        ]
+    )
+    div, output_file = _create_and_save_div(fig, result_directory, graph_name)
+    return graph_name, output_file, table_html, div
+
+
+def _read_quality_multiboxplot_graph(graph_name, boxplot_values, violin_data, colors, yaxis_range, table_html,
+                                     result_directory):
+    """
+    Plot the boxplots and the violin plots of the PHRED scores by read type
+    :param boxplot_values: dictionary of the boxplot values (see _precompute_boxplot_values) by read type name
+    :param violin_data: dictionary of the values to use for violin plots by read type name
+    :param colors: dictionary of the colors by read type name
+    :param yaxis_range: list with the minimal and maximal values of the y axis
+    """
+
+    fig = go.Figure()
+
+    for name, d in boxplot_values.items():
+        fig.add_trace(go.Box(
+            q1=[d['q1']], median=[d['median']], q3=[d['q3']], lowerfence=[d['lowerfence']],
+            upperfence=[d['upperfence']],
+            name=name,
+            x0=name,
+            marker=dict(
+                opacity=0.3,
+                color=colors[name]
+
+            ),
+            boxmean=False,
+            showlegend=True
+        ))
+
+        fig.add_trace(go.Violin(y=violin_data[name],
+                                name=name,
+                                meanline_visible=True,
+                                marker=dict(color=colors[name]),
+                                visible=False))
+
+    fig.update_layout(
+        **_title(graph_name),
+        **default_graph_layout,
+        **_legend(),
+        hovermode='x',
+        **_xaxis('Read type', dict(fixedrange=True)),
+        **_yaxis('PHRED score', dict(range=yaxis_range)),
+    )
+
+    # Add buttons
+    fig.update_layout(
+        updatemenus=[
+            dict(
+                type="buttons",
+                direction="left",
+                buttons=list([
+                    dict(
+                        args=[{'visible': [True, False]}],
+                        label="Boxplot",
+                        method="update"
+                    ),
+                    dict(
+                        args=[{'visible': [False, True]}],
+                        label="Violin plot",
+                        method="update"
+                    )
+                ]),
+                pad={"r": 20, "t": 20, "l": 20, "b": 20},
+                showactive=True,
+                x=1.0,
+                xanchor="left",
+                y=1.25,
+                yanchor="top"
+            ),
+        ]
+    )
+
+
+    div, output_file = _create_and_save_div(fig, result_directory, graph_name)
+    return graph_name, output_file, table_html, div
+
+
+def _barcode_boxplot_graph(graph_name, groups, pass_color, fail_color, yaxis_title, legend_title, result_directory):
+    """
+    Plot the boxplots of pass and fail reads for each barcode from the values of the reads grouped by barcode
+    :param groups: dictionary with the numpy array of the values of each ('pass'|'fail', barcode) group
+    """
 
-    # Sort reads by read type and drop read type column
-    pass_df = df.loc[df['passes_filtering'] == bool(True)].drop(columns='passes_filtering')
-    fail_df = df.loc[df['passes_filtering'] == bool(False)].drop(columns='passes_filtering')
+    boxplot_values = {}
+    for read_type in ('Pass', 'Fail'):
+        boxplot_values[read_type] = {}
+        for barcode in [b for t, b in groups if t == read_type.lower()]:
+            values = groups[(read_type.lower(), barcode)]
+            values = values[values > 0]
+            if len(values) == 0:
+                boxplot_values[read_type][barcode] = _boxplot_values(0, 0, 0, 0, 0, 0)
+            else:
+                q1, median, q3 = np.quantile(values, [.25, .5, .75])
+                boxplot_values[read_type][barcode] = _boxplot_values(values.min(), q1, median, q3, values.max(),
+                                                                     len(values))
+
+    return _barcode_boxplot_values_graph(graph_name=graph_name,
+                                         boxplot_values=boxplot_values,
+                                         pass_color=pass_color,
+                                         fail_color=fail_color,
+                                         yaxis_title=yaxis_title,
+                                         legend_title=legend_title,
+                                         result_directory=result_directory)
+
+
+def _barcode_boxplot_values_graph(graph_name, boxplot_values, pass_color, fail_color, yaxis_title, legend_title,
+                                  result_directory):
+    """
+    Plot the boxplots of pass and fail reads for each barcode. The boxes of each read type are in a single trace and
+    the barcodes are shown by pages of barcodes_per_page barcodes, so the size of the graph does not depend on the
+    number of barcodes of the kit
+    :param boxplot_values: dictionary with the boxplot values by barcode for 'Pass' and 'Fail' read types
+    """
 
     fig = go.Figure()
 
+    barcodes = sorted(set(boxplot_values['Pass']) | set(boxplot_values['Fail']), key=barcode_sort_key)
+    empty_values = _boxplot_values(0, 0, 0, 0, 0, 0)
+
     for read_type in ('Pass', 'Fail'):
 
         if read_type == 'Pass':
-            df = pass_df
             color = pass_color
         else:
-            df = fail_df
             color = fail_color
 
-        first = True
-        for barcode in sorted(barcode_selection):
-
-            df[barcode] = df[barcode].loc[df[barcode] > 0]
-            d = _precompute_boxplot_values(df[barcode])
-            fig.add_trace(go.Box(
-                q1=[d['q1']],
-                median=[d['median']],
-                q3=[d['q3']],
-                lowerfence=[d['lowerfence']],
-                upperfence=[d['upperfence']],
-                name=read_type + " reads",
-                x0=barcode,
-                marker_color=color,
-                offsetgroup=read_type.lower(),
-                showlegend=first
-            ))
-            if first:
-                first = False
+        values = [boxplot_values[read_type].get(barcode, empty_values) for barcode in barcodes]
+
+        fig.add_trace(go.Box(
+            q1=[d['q1'] for d in values],
+            median=[d['median'] for d in values],
+            q3=[d['q3'] for d in values],
+            lowerfence=[d['lowerfence'] for d in values],
+            upperfence=[d['upperfence'] for d in values],
+            name=read_type + " reads",
+            x=barcodes,
+            marker_color=color,
+            offsetgroup=read_type.lower()
+        ))
 
     fig.update_layout(
         **_title(graph_name),
@@ -505,6 +770,31 @@ def _barcode_boxplot_graph(graph_name, df, barcode_selection, pass_color, fail_c
         boxgroupgap=0,
     )
 
+    # Show the barcodes by pages, a page being a range of the categories of the x axis
+    if len(barcodes) > barcodes_per_page:
+        buttons = []
+        for first in range(0, len(barcodes), barcodes_per_page):
+            last = min(first + barcodes_per_page, len(barcodes)) - 1
+            buttons.append(dict(args=[{'xaxis.range': [first - 0.5, last + 0.5]}],
+                                label=barcodes[first] + ' - ' + barcodes[last],
+                                method="relayout"))
+
+        fig.update_layout(
+            xaxis_range=[-0.5, barcodes_per_page - 0.5],
+            updatemenus=[
+                dict(
+                    type="dropdown",
+                    buttons=buttons,
+                    pad={"r": 20, "t": 20, "l": 20, "b": 20},
+                    showactive=True,
+                    x=1.0,
+                    xanchor="left",
+                    y=1.25,
+                    yanchor="top"
+                ),
+            ]
+        )
+
     # all_read = all_df.describe().T
     # read_pass = pass_df.describe().T
     # read_fail = fail_df.describe().T
@@ -526,6 +816,14 @@ def _pie_chart_graph(graph_name, count_sorted, color_palette, one_d_square, resu
 
     fig = go.Figure()
 
+    # Gather the smallest barcodes in a single slice of the pie chart, the histogram shows all the barcodes
+    pie_counts = count_sorted
+    if len(count_sorted) > max_pie_chart_slices:
+        largest = count_sorted.sort_values(ascending=False, kind='mergesort')
+        smallest = largest.iloc[max_pie_chart_slices - 1:]
+        pie_counts = pd.concat([largest.iloc[:max_pie_chart_slices - 1],
+                                pd.Series([smallest.sum()], index=['{} smaller barcodes'.format(len(smallest))])])
+
     if len(labels) <= len(color_palette):
         pie_marker = dict(colors=color_palette, line=dict(width=line_width, color='#808080'))
         bar_colors = color_palette
@@ -534,8 +832,8 @@ def _pie_chart_graph(graph_name, count_sorted, color_palette, one_d_square, resu
         bar_colors = color_palette[0]
 
     # Pie chart
-    fig.add_trace(go.Pie(labels=labels,
-                         values=count_sorted,
+    fig.add_trace(go.Pie(labels=pie_counts.index.values.tolist(),
+                         values=pie_counts,
                          hoverinfo='label+percent',
                          textinfo='percent',
                          textfont_size=14,
@@ -617,7 +915,11 @@ def _pie_chart_graph(graph_name, count_sorted, color_palette, one_d_square, resu
 
 
 def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all_color, pass_color, fail_color,
-                              xaxis_title, result_directory):
+                              xaxis_title, result_directory, statistics=None):
+    """
+    :param statistics: statistics of the all, pass and fail reads computed by the extractor (dataframe) or None to
+    compute them
+    """
 
     npoints = 10000
     min_all_reads = 0
@@ -634,7 +936,46 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
     # Find 50 percentile for zoomed range on x axis
     max_x_range = np.percentile(all_reads, 99)
 
-    coef = max_all_reads / npoints
+    # Create data for HTML table
+    if statistics is None:
+        table_df = pd.concat([pd.Series(all_reads), pass_reads, fail_reads], axis=1,
+                             keys=['All reads', 'Pass reads', 'Fail reads'])
+        table_html = _dataFrame_to_html(_make_describe_dataframe(table_df))
+        percentiles = {p: np.percentile(all_reads, p) for p in [25, 50, 75]}
+    else:
+        table_df = statistics[['all', 'pass', 'fail']].set_axis(['All reads', 'Pass reads', 'Fail reads'], axis=1)
+        table_html = _dataFrame_to_html(_format_describe_dataframe(table_df))
+        percentiles = {p: statistics['all'][str(p) + '%'] for p in [25, 50, 75]}
+
+    return _read_length_distribution_graph(graph_name=graph_name,
+                                           all_data=(count_x1, count_y1),
+                                           pass_data=(count_x2, count_y2),
+                                           fail_data=(count_x3, count_y3),
+                                           percentiles=percentiles,
+                                           coef=max_all_reads / npoints,
+                                           min_x_range=min_all_reads,
+                                           max_x_range=max_x_range,
+                                           all_color=all_color,
+                                           pass_color=pass_color,
+                                           fail_color=fail_color,
+                                           xaxis_title=xaxis_title,
+                                           table_html=table_html,
+                                           result_directory=result_directory)
+
+
+def _read_length_distribution_graph(graph_name, all_data, pass_data, fail_data, percentiles, coef, min_x_range,
+                                    max_x_range, all_color, pass_color, fail_color, xaxis_title, table_html,
+                                    result_directory):
+    """
+    Plot the smoothed read length distributions of all, pass and fail reads
+    :param all_data: tuple with the x and y values of the smoothed distribution of all reads
+    :param percentiles: dictionary of the percentiles of all reads to display
+    :param coef: bin width used to convert counts to reads per base
+    """
+
+    count_x1, count_y1 = all_data
+    count_x2, count_y2 = pass_data
+    count_x3, count_y3 = fail_data
 
     max_y = max(max(count_y1), max(count_y2), max(count_y3)) / coef
 
@@ -659,8 +1000,7 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
                              ))
 
     # Threshold
-    for p in [25, 50, 75]:
-        x0 = np.percentile(all_reads, p)
+    for p, x0 in percentiles.items():
         if p == 50:
             t = 'median<br>all reads'
         else:
@@ -683,15 +1023,10 @@ def _read_length_distribution(graph_name, all_reads, pass_reads, fail_reads, all
         **default_graph_layout,
         **_legend(),
         hovermode='x',
-        **_xaxis(xaxis_title, dict(range=[min_all_reads, max_x_range])),
+        **_xaxis(xaxis_title, dict(range=[min_x_range, max_x_range])),
         **_yaxis('Reads per pb', dict(range=[0, max_y * 1.10])),
     )
 
-    # Create data for HTML table
-    table_df = pd.concat([pd.Series(all_reads), pass_reads, fail_reads], axis=1,
-                         keys=['All reads', 'Pass reads', 'Fail reads'])
-    table_html = _dataFrame_to_html(_make_describe_dataframe(table_df))
-
     div, output_file = _create_and_save_div(fig, result_directory, graph_name)
     return graph_name, output_file, table_html, div
 
@@ -710,6 +1045,28 @@ def _phred_score_density(graph_name, dataframe, prefix,  all_color, pass_color,
     count_y2 = count_y2 / len(all_series)
     count_y3 = count_y3 / len(all_series)
 
+    percentiles = {p: np.percentile(pass_series, p) for p in [25, 50, 75]}
+
+    return _phred_score_density_graph(graph_name=graph_name,
+                                      pass_data=(count_x2, count_y2),
+                                      fail_data=(count_x3, count_y3),
+                                      pass_percentiles=percentiles,
+                                      pass_color=pass_color,
+                                      fail_color=fail_color,
+                                      result_directory=result_directory)
+
+
+def _phred_score_density_graph(graph_name, pass_data, fail_data, pass_percentiles, pass_color, fail_color,
+                               result_directory):
+    """
+    Plot the smoothed PHRED score densities of pass and fail reads
+    :param pass_data: tuple with the x and y values of the smoothed density of pass reads
+    :param pass_percentiles: dictionary of the percentiles of pass reads to display
+    """
+
+    count_x2, count_y2 = pass_data
+    count_x3, count_y3 = fail_data
+
     max_y = max(max(count_y2), max(count_y3))
 
     fig = go.Figure()
@@ -730,8 +1087,7 @@ def _phred_score_density(graph_name, dataframe, prefix,  all_color, pass_color,
                              ))
 
     # Threshold
-    for p in [25, 50, 75]:
-        x0 = np.percentile(pass_series, p)
+    for p, x0 in pass_percentiles.items():
         if p == 50:
             t = 'median'
         else:
@@ -30,6 +30,7 @@ from scipy.stats import norm
 from toulligqc.plotly_graph_common import _create_and_save_div
 from toulligqc.plotly_graph_common import _dataFrame_to_html
 from toulligqc.plotly_graph_common import _interpolate
+from toulligqc.plotly_graph_common import _format_describe_dataframe
 from toulligqc.plotly_graph_common import _make_describe_dataframe
 from toulligqc.plotly_graph_common import _precompute_boxplot_values
 from toulligqc.plotly_graph_common import _smooth_data
@@ -54,8 +55,12 @@ from toulligqc.plotly_graph_common import _title
 from toulligqc.plotly_graph_common import default_graph_layout
 from toulligqc.plotly_graph_common import _xaxis
 from toulligqc.plotly_graph_common import _yaxis
+from toulligqc.plotly_graph_common import _yield_plot_graph
+from toulligqc.plotly_graph_common import _read_quality_multiboxplot_graph
 from toulligqc.plotly_graph_common import _format_int
 from toulligqc.plotly_graph_common import _format_float
+from toulligqc.plotly_graph_common import _format_percent
+from toulligqc.sequencing_summary_aggregator import time_bin_duration
 
 #
 #  1D plots
@@ -170,167 +175,78 @@ def read_length_scatterplot(dataframe_dict, result_directory):
                                      pass_color=toulligqc_colors['pass'],
                                      fail_color=toulligqc_colors['fail'],
                                      xaxis_title='Read length (bp)',
-                                     result_directory=result_directory)
+                                     result_directory=result_directory,
+                                     statistics=dataframe_dict.get('sequence.length.statistics'))
 
 
-def yield_plot(df, result_directory, oneDsquare=False):
+def yield_plot(dataframe_dict, result_directory):
     """
     Plots the different reads (1D, 1D pass, 1D fail) produced along the run against the time(in hour)
+    @:param dataframe_dict: dictionary with the TimeBinCube of the reads in the time.bins key
     """
 
-    graph_name = "Yield plot through time"
+    return _time_bin_yield_plot(dataframe_dict['time.bins'], result_directory)
 
-    if oneDsquare:
-        start_time_column = 'start_time1'
-    else:
-        start_time_column = 'start_time'
 
-    new_df = df.filter(['sequence_length', start_time_column, 'passes_filtering']).sort_values(by=start_time_column)
-    new_df['start_time'] = new_df[start_time_column] / 3600
+def _time_bin_yield_plot(time_bins, result_directory):
+    """
+    Plots the yield through time and the table of the statistics per hour from the read and base counts by time bin
+    :param time_bins: TimeBinCube object of the reads
+    """
 
-    all_reads_length_df = new_df.filter(['sequence_length', start_time_column])
-    pass_reads_length_df = new_df[new_df['passes_filtering'] == True].filter(['sequence_length', start_time_column])
-    fail_reads_length_df = new_df[new_df['passes_filtering'] == False].filter(['sequence_length', start_time_column])
+    graph_name = "Yield plot through time"
 
-    data = [(all_reads_length_df, 'All reads', toulligqc_colors['all']),
-            (pass_reads_length_df, 'Pass reads', toulligqc_colors['pass']),
-            (fail_reads_length_df, 'Fail reads', toulligqc_colors['fail'])]
+    counts = {'All reads': time_bins.time_read_counts(),
+              'Pass reads': time_bins.time_read_counts('pass'),
+              'Fail reads': time_bins.time_read_counts('fail')}
+    bases = {'All reads': time_bins.time_base_counts(),
+             'Pass reads': time_bins.time_base_counts('pass'),
+             'Fail reads': time_bins.time_base_counts('fail')}
 
-    npoints = 10000
-    coef = max(all_reads_length_df[start_time_column]) / npoints
+    # Center of the time bins in hours
+    centers = (np.arange(len(counts['All reads'])) + .5) * time_bin_duration / 3600
 
-    fig = go.Figure()
-
-    # Figures for cumulative base yield plot
-    first = True
-    for reads in [True, False]:
-        smooth_data_dict = {}
-        for d in data:
-
-            if d[1] not in smooth_data_dict:
-                if reads:
-                    count_x, count_y, cum_count_y = _smooth_data(npoints, 5, d[0][start_time_column])
-                else:
-                    count_x, count_y, cum_count_y = _smooth_data(npoints, 5, d[0][start_time_column], weights=d[0]['sequence_length'])
-
-                smooth_data_dict[d[1]] = (count_x, count_y, cum_count_y)
-
-            count_x, count_y, cum_count_y = smooth_data_dict[d[1]]
-
-            fig.add_trace(go.Scatter(x=count_x,
-                                     y=cum_count_y,
-                                     name=d[1],
-                                     fill='tozeroy',
-                                     marker_color=d[2],
-                                     visible=first
-                                     ))
-
-        count_x, count_y, cum_count_y = smooth_data_dict[data[0][1]]
-        for p in [50, 75, 90, 99]:
-            y = cum_count_y
-            ymax = max(y)
-            index = (np.abs(y - ymax * p / 100)).argmin()
-            x0 = count_x[index]
-            fig.add_trace(go.Scatter(
-                mode="lines+text",
-                name=d[1],
-                x=[x0, x0],
-                y=[0, ymax],
-                line=dict(color="gray", width=1, dash="dot"),
-                text=["", str(p) + "% all reads"],
-                textposition="top center",
-                hoverinfo="skip",
-                showlegend=False,
-                visible=first
-            ))
-        first = False
-
-        for d in data:
-            count_x, count_y, cum_count_y = smooth_data_dict[d[1]]
-
-            fig.add_trace(go.Scatter(x=count_x,
-                                     y=count_y / coef,
-                                     name=d[1],
-                                     marker_color=d[2],
-                                     fill='tozeroy',
-                                     visible=False
-                                     ))
+    npoints = 10000
+    coef = time_bins.run_time / 3600 / npoints
+
+    # Smoothed read and base counts through time
+    read_data = {}
+    base_data = {}
+    for name in counts:
+        nonzero = np.flatnonzero(counts[name])
+        read_data[name] = _smooth_data(npoints, 5, centers[nonzero], weights=counts[name][nonzero])
+        base_data[name] = _smooth_data(npoints, 5, centers[nonzero], weights=bases[name][nonzero])
+
+    return _yield_plot_graph(graph_name=graph_name,
+                             read_data=read_data,
+                             base_data=base_data,
+                             colors={'All reads': toulligqc_colors['all'],
+                                     'Pass reads': toulligqc_colors['pass'],
+                                     'Fail reads': toulligqc_colors['fail']},
+                             coef=coef,
+                             result_directory=result_directory,
+                             table_html=_hourly_statistics_table(time_bins))
+
+
+def _hourly_statistics_table(time_bins):
+    """
+    Create the table of the statistics of the reads started in each hour of the run
+    :param time_bins: TimeBinCube object of the reads
+    """
 
-    fig.update_layout(
-        **_title(graph_name),
-        **default_graph_layout,
-        **_legend(args=dict(y=0.75)),
-        hovermode='x',
-        **_xaxis('Time (hours)', dict(rangemode="tozero")),
-        **_yaxis('Read count', dict(fixedrange=False, rangemode="tozero")),
-    )
+    def format_median(value):
+        return _format_float(value) if np.isfinite(value) else ''
 
-    # Add buttons
+    hourly_df = time_bins.hourly_statistics()
+    table_df = pd.DataFrame({'Reads': hourly_df['reads'].apply(_format_int),
+                             'Pass reads': (hourly_df['pass.ratio'] * 100).apply(_format_percent),
+                             'Bases': hourly_df['bases'].apply(_format_int),
+                             'Median read length': hourly_df['median.length'].apply(format_median),
+                             'Median PHRED score': hourly_df['median.qscore'].apply(format_median),
+                             'Median speed': hourly_df['median.speed'].apply(format_median)})
+    table_df.index = pd.Index(['{}h-{}h'.format(h, h + 1) for h in hourly_df.index], name='Run time')
 
-    fig.update_layout(
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="down",
-                buttons=list([
-                    dict(
-                        args=[{'visible': [True, True, True,
-                                           True, True, True, True,
-                                           False, False, False,
-                                           False, False, False,
-                                           False, False, False, False,
-                                           False, False, False]},
-                              {'yaxis': {'title': '<b>Read count</b>', 'rangemode': "tozero"}}],
-                        label="Cumulative reads",
-                        method="update"
-                    ),
-                    dict(
-                        args=[{'visible': [False, False, False,
-                                           False, False, False, False,
-                                           True, True, True,
-                                           False, False, False,
-                                           False, False, False, False,
-                                           False, False, False
-                                           ]},
-                               {'yaxis': {'title': '<b>Read count per hour</b>', 'rangemode': "tozero"}}],
-                        label="Yield reads",
-                        method="update"
-                    ),
-                    dict(
-                        args=[{'visible': [False, False, False,
-                                           False, False, False, False,
-                                           False, False, False,
-                                           True, True, True,
-                                           True, True, True, True,
-                                           False, False, False]},
-                               {'yaxis': {'title': '<b>Base count</b>', 'rangemode': "tozero"}}],
-                        label="Cumulative bases",
-                        method="update"
-                    ),
-                    dict(
-                        args=[{'visible': [False, False, False,
-                                           False, False, False, False,
-                                           False, False, False,
-                                           False, False, False,
-                                           False, False, False, False,
-                                           True, True, True]},
-                               {'yaxis': {'title': '<b>Base count per hour</b>', 'rangemode': "tozero"}}],
-                        label="Yield bases",
-                        method="update"
-                    )
-                ]),
-                pad={"r": 20, "t": 20, "l": 20, "b": 20},
-                showactive=True,
-                x=1.0,
-                xanchor="left",
-                y=1.25,
-                yanchor="top"
-            ),
-        ]
-    )
-    table_html = None
-    div, output_file = _create_and_save_div(fig, result_directory, graph_name)
-    return graph_name, output_file, table_html, div
+    return _dataFrame_to_html(table_df)
 
 
 def read_quality_multiboxplot(dataframe_dict, result_directory):
@@ -368,73 +284,26 @@ def read_quality_multiboxplot(dataframe_dict, result_directory):
     max_yaxis = (dataframe.max(skipna=True, numeric_only=True).values.max() + 2.0)
     min_yaxis = (dataframe.min(skipna=True, numeric_only=True).values.min() - 2.0)
 
-    fig = go.Figure()
-
-    for column in dataframe.columns:
-        d = _precompute_boxplot_values(dataframe[column])
-        fig.add_trace(go.Box(
-            q1=[d['q1']], median=[d['median']], q3=[d['q3']], lowerfence=[d['lowerfence']],
-            upperfence=[d['upperfence']],
-            name=names[column],
-            x0=names[column],
-            marker=dict(
-                opacity=0.3,
-                color=colors[column]
-
-            ),
-            boxmean=False,
-            showlegend=True
-        ))
-
-        fig.add_trace(go.Violin(y=dataframe[column],
-                                name=names[column],
-                                meanline_visible=True,
-                                marker=dict(color=colors[column]),
-                                visible=False))
-
-    fig.update_layout(
-        **_title(graph_name),
-        **default_graph_layout,
-        **_legend(),
-        hovermode='x',
-        **_xaxis('Read type', dict(fixedrange=True)),
-        **_yaxis('PHRED score', dict(range=[min_yaxis, max_yaxis])),
-    )
-
-    # Add buttons
-    fig.update_layout(
-        updatemenus=[
-            dict(
-                type="buttons",
-                direction="left",
-                buttons=list([
-                    dict(
-                        args=[{'visible': [True, False]}],
-                        label="Boxplot",
-                        method="update"
-                    ),
-                    dict(
-                        args=[{'visible': [False, True]}],
-                        label="Violin plot",
-                        method="update"
-                    )
-                ]),
-                pad={"r": 20, "t": 20, "l": 20, "b": 20},
-                showactive=True,
-                x=1.0,
-                xanchor="left",
-                y=1.25,
-                yanchor="top"
-            ),
-        ]
-    )
+    boxplot_values = {names[column]: _precompute_boxplot_values(dataframe[column]) for column in dataframe.columns}
+    violin_data = {names[column]: dataframe[column] for column in dataframe.columns}
 
-    df = df[["1D", "1D pass", "1D fail"]]
-    df.columns=["All reads", "Pass reads", "Fail reads"]
-    table_html = _dataFrame_to_html(_make_describe_dataframe(df))
+    # Statistics computed by the extractor if available
+    if 'mean.qscore.statistics' in dataframe_dict:
+        table_df = dataframe_dict['mean.qscore.statistics'][['all', 'pass', 'fail']]
+        table_df = table_df.set_axis(["All reads", "Pass reads", "Fail reads"], axis=1)
+        table_html = _dataFrame_to_html(_format_describe_dataframe(table_df))
+    else:
+        df = df[["1D", "1D pass", "1D fail"]]
+        df.columns=["All reads", "Pass reads", "Fail reads"]
+        table_html = _dataFrame_to_html(_make_describe_dataframe(df))
 
-    div, output_file = _create_and_save_div(fig, result_directory, graph_name)
-    return graph_name, output_file, table_html, div
+    return _read_quality_multiboxplot_graph(graph_name=graph_name,
+                                            boxplot_values=boxplot_values,
+                                            violin_data=violin_data,
+                                            colors={names[column]: colors[column] for column in dataframe.columns},
+                                            yaxis_range=[min_yaxis, max_yaxis],
+                                            table_html=table_html,
+                                            result_directory=result_directory)
 
 
 def allphred_score_frequency(dataframe_dict, result_directory):
@@ -514,7 +383,7 @@ def all_scatterplot(dataframe_dict, result_directory):
 
 def _minion_flowcell_layout():
     """
-    Represents the layout of a minion flowcell (not use anymore)
+    Represents the layout of a minion flowcell
     """
     seeds = [125, 121, 117, 113, 109, 105, 101, 97,
              93, 89, 85, 81, 77, 73, 69, 65,
@@ -529,44 +398,61 @@ def _minion_flowcell_layout():
     return flowcell_layout
 
 
+def _flowcell_layout(channel_count):
+    """
+    Get the layout of the flowcell from the largest channel number: MinION/GridION flowcells have 512 channels
+    in 16 rows, PromethION flowcells have 3000 channels shown in 25 rows in channel number order
+    :param channel_count: largest channel number
+    :return: a tuple with the number of rows and the list of the channel numbers column by column
+    """
+    if channel_count <= 512:
+        return 16, _minion_flowcell_layout()
+
+    row_count = 25
+    column_count = max(120, -(-channel_count // row_count))
+    return row_count, list(range(1, row_count * column_count + 1))
+
+
 def plot_performance(dataframe_dict, result_directory):
     """
     Plots the channels occupancy by the reads
-    @:param pore_measure: reads number per pore
+    @:param dataframe_dict: dictionary with the ChannelTable of the reads in the channel.table key
     """
 
-    graph_name = "Channel occupancy of the flowcell"
+    return _channel_occupancy_heatmap(dataframe_dict['channel.table'], result_directory)
 
-    pore_measure = pd.value_counts(dataframe_dict['all.reads.channel'])
 
-    output_file = result_directory + '/' + '_'.join(graph_name.split()) + '.png'
-    flowcell_layout = _minion_flowcell_layout()
+def _channel_occupancy_heatmap(channel_table, result_directory):
+    """
+    Plots the heatmap of the channels occupancy
+    :param channel_table: ChannelTable object of the reads
+    """
 
-    pore_values = []
-    for pore in flowcell_layout:
-        if pore in pore_measure:
-            pore_values.append(pore_measure[pore])
-        else:
-            pore_values.append(0)
+    graph_name = "Channel occupancy of the flowcell"
 
-    d = {'Row number': list(range(1, 17)) * 32,
-         'Column number': sorted(list(range(1, 33)) * 16),
-         'tot_reads': pore_values,
-         'labels': flowcell_layout}
+    output_file = result_directory + '/' + '_'.join(graph_name.split()) + '.png'
+    row_count, flowcell_layout = _flowcell_layout(len(channel_table.read_counts) - 1)
+
+    # Read number of each channel of the layout, in a single indexing of the channel table
+    read_counts = np.pad(channel_table.read_counts, (0, max(0, max(flowcell_layout) + 1
+                                                              - len(channel_table.read_counts))))
+    pore_values = read_counts[flowcell_layout]
 
-    df = pd.DataFrame(d)
+    d = pd.DataFrame(pore_values.reshape(-1, row_count).T,
+                     index=pd.Index(range(1, row_count + 1), name='Row number'),
+                     columns=pd.Index(range(1, len(flowcell_layout) // row_count + 1), name='Column number'))
 
-    d = df.pivot("Row number", "Column number", "tot_reads")
-    df.pivot("Row number", "Column number", "labels")
     plt.figure(figsize=(figure_image_width / image_dpi, figure_image_height / image_dpi), dpi=image_dpi)
-    sns.heatmap(d, fmt="", linewidths=.5, cmap="YlGnBu", annot_kws={"size": 7},
+    sns.heatmap(d, fmt="", linewidths=.5 if row_count <= 16 else 0, cmap="YlGnBu", annot_kws={"size": 7},
                 cbar_kws={'label': 'Read number per pore channel', "orientation": "horizontal"})
 
     plt.tight_layout()
     plt.savefig(output_file)
     plt.close()
 
-    table_html = None
+    table_df = channel_table.to_dataframe().describe()
+    table_df.columns = ['Reads', 'Bases', 'Pass ratio', 'Median PHRED score']
+    table_html = _dataFrame_to_html(_format_describe_dataframe(table_df))
     return graph_name, output_file, table_html
 
 
@@ -582,9 +468,11 @@ def barcode_percentage_pie_chart_pass(dataframe_dict, barcode_selection, result_
 
     graph_name = "Pass barcoded reads distribution"
 
+    # The barcodes with reads are the categories of the barcode arrangement column
+    barcodes = set(dataframe_dict['barcode.arrangement'].cat.categories)
     for element in barcode_selection:
 
-        if all(dataframe_dict['barcode.arrangement'] != element):
+        if element not in barcodes:
             print("The barcode {} doesn't exist".format(element))
             return False
 
@@ -605,9 +493,11 @@ def barcode_percentage_pie_chart_fail(dataframe_dict, barcode_selection, result_
 
     graph_name = "Fail barcoded reads distribution"
 
+    # The barcodes with reads are the categories of the barcode arrangement column
+    barcodes = set(dataframe_dict['barcode.arrangement'].cat.categories)
     for element in barcode_selection:
 
-        if all(dataframe_dict['barcode.arrangement'] != element):
+        if element not in barcodes:
             print("The barcode {} doesn't exist".format(element))
             return False
 
@@ -627,11 +517,8 @@ def barcode_length_boxplot(datafame_dict, result_directory):
 
     graph_name = "Read size distribution for barcodes"
 
-    df = datafame_dict['barcode_selection_sequence_length_dataframe']
-
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  groups=datafame_dict['barcode.sequence.length.groups'],
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title="Sequence length (bp)",
@@ -646,11 +533,8 @@ def barcoded_phred_score_frequency(dataframe_dict, result_directory):
 
     graph_name = "PHRED score distribution for barcodes"
 
-    df = dataframe_dict['barcode_selection_sequence_phred_dataframe']
-
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  groups=dataframe_dict['barcode.mean.qscore.groups'],
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title="PHRED score",
@@ -661,8 +545,7 @@ def barcoded_phred_score_frequency(dataframe_dict, result_directory):
 def sequence_length_over_time(dataframe_dict, result_directory):
     graph_name = "Read length over time"
 
-    return _over_time_graph(data_series=dataframe_dict['all.reads.sequence.length'],
-                            time_series=dataframe_dict['all.reads.start.time'],
+    return _over_time_graph(sketches=dataframe_dict['time.bins'].time_sketches('sequence_length'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['sequence_length_over_time'],
@@ -677,11 +560,7 @@ def phred_score_over_time(dataframe_dict, result_dict, result_directory):
     if key in result_dict:
         pass_min_qscore=float(result_dict[key])
 
-    qscore_series = dataframe_dict["all.reads.mean.qscore"]
-    time_series = dataframe_dict['all.reads.start.time']
-
-    return _over_time_graph(data_series=qscore_series,
-                            time_series=time_series,
+    return _over_time_graph(sketches=dataframe_dict['time.bins'].time_sketches('mean_qscore'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['phred_score_over_time'],
@@ -695,17 +574,10 @@ def phred_score_over_time(dataframe_dict, result_dict, result_directory):
 def speed_over_time(dataframe_dict, result_directory):
     graph_name = "Translocation speed"
 
-    sequence_length_series = dataframe_dict['all.reads.sequence.length']
-    duration_series = dataframe_dict['all.reads.duration']
-
-    speed_series = pd.Series(sequence_length_series / duration_series)
-
-    return _over_time_graph(data_series=speed_series,
-                            time_series=dataframe_dict['all.reads.start.time'],
+    return _over_time_graph(sketches=dataframe_dict['time.bins'].time_sketches('speed'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['speed_over_time'],
                             yaxis_title='Speed (bases per second)',
                             green_zone_starts_at=300,
                             green_zone_color=toulligqc_colors['green_zone_color'])
-
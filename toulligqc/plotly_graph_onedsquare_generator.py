@@ -365,9 +365,11 @@ def barcode_percentage_pie_chart_1dsqr_pass(dataframe_dict_1dsqr, barcode_select
 
     graph_name = "1D² read pass barcode distribution"
 
+    # The barcodes with reads are the categories of the barcode arrangement column
+    barcodes = set(dataframe_dict_1dsqr['barcode.arrangement'].cat.categories)
     for element in barcode_selection:
 
-        if all(dataframe_dict_1dsqr['barcode.arrangement'] != element):
+        if element not in barcodes:
             print("The barcode {} doesn't exist".format(element))
             return False
 
@@ -388,9 +390,11 @@ def barcode_percentage_pie_chart_1dsqr_fail(dataframe_dict_1dsqr, barcode_select
 
     graph_name = "1D² read fail barcode distribution"
 
+    # The barcodes with reads are the categories of the barcode arrangement column
+    barcodes = set(dataframe_dict_1dsqr['barcode.arrangement'].cat.categories)
     for element in barcode_selection:
 
-        if all(dataframe_dict_1dsqr['barcode.arrangement'] != element):
+        if element not in barcodes:
             print("The barcode {} doesn't exist".format(element))
             return False
 
@@ -410,11 +414,8 @@ def barcode_length_boxplot_1dsqr(dataframe_dict_1dsqr, result_directory):
 
     graph_name = "1D² read size distribution for barcodes"
 
-    df = dataframe_dict_1dsqr['barcode_selection_sequence_length_dataframe']
-
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  groups=dataframe_dict_1dsqr['barcode.sequence.length.groups'],
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title='Sequence length (bp)',
@@ -429,11 +430,8 @@ def barcoded_phred_score_frequency_1dsqr(dataframe_dict_1dsqr, result_directory)
 
     graph_name = "1D² PHRED score distribution for barcodes"
 
-    df = dataframe_dict_1dsqr['barcode_selection_sequence_phred_dataframe']
-
     return _barcode_boxplot_graph(graph_name=graph_name,
-                                  df=df,
-                                  barcode_selection=df.columns.drop('passes_filtering'),
+                                  groups=dataframe_dict_1dsqr['barcode.mean.qscore.groups'],
                                   pass_color=toulligqc_colors['pass'],
                                   fail_color=toulligqc_colors['fail'],
                                   yaxis_title='PHRED score',
@@ -444,8 +442,7 @@ def barcoded_phred_score_frequency_1dsqr(dataframe_dict_1dsqr, result_directory)
 def sequence_length_over_time_dsqr(dataframe_dict_1dsqr, result_directory):
     graph_name = "1D² Read length over time"
 
-    return _over_time_graph(data_series=dataframe_dict_1dsqr['all.reads.sequence.length'],
-                            time_series=dataframe_dict_1dsqr['all.reads.start.time1'],
+    return _over_time_graph(sketches=dataframe_dict_1dsqr['time.bins'].time_sketches('sequence_length'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['sequence_length_over_time'],
@@ -460,8 +457,7 @@ def phred_score_over_time_dsqr(result_dict, dataframe_dict_1dsqr, result_directo
     if key in result_dict:
         pass_min_qscore=float(result_dict[key])
 
-    return _over_time_graph(data_series=dataframe_dict_1dsqr['all.reads.mean.qscore'],
-                            time_series=dataframe_dict_1dsqr['all.reads.start.time1'],
+    return _over_time_graph(sketches=dataframe_dict_1dsqr['time.bins'].time_sketches('mean_qscore'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['phred_score_over_time'],
@@ -474,10 +470,7 @@ def phred_score_over_time_dsqr(result_dict, dataframe_dict_1dsqr, result_directo
 def speed_over_time_dsqr(dataframe_dict_1dsqr, result_directory):
     graph_name = "1D² translocation speed"
 
-    speed = pd.Series(dataframe_dict_1dsqr['all.reads.sequence.length'] / dataframe_dict_1dsqr['all.reads.duration'])
-
-    return _over_time_graph(data_series=speed,
-                            time_series=dataframe_dict_1dsqr['all.reads.start.time1'],
+    return _over_time_graph(sketches=dataframe_dict_1dsqr['time.bins'].time_sketches('speed'),
                             result_directory=result_directory,
                             graph_name=graph_name,
                             color=toulligqc_colors['speed_over_time'],
@@ -0,0 +1,1045 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# This module contains the running aggregates used to compute statistics and graphs
+# from a sequencing summary read chunk by chunk, with a memory usage independent of the number of reads.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from toulligqc.sequencing_summary_common import group_other_barcodes
+from toulligqc.sequencing_summary_common import group_values
+from toulligqc.sequencing_summary_common import nxx_percentages
+from toulligqc.sequencing_summary_schema import decimal_values
+
+# Duration in seconds of the time bins used for the yield graphs
+time_bin_duration = 10
+
+# Number of bins of the histograms stored in an array, the bins above are stored sparsely
+histogram_dense_size = 1 << 18
+
+# Number of bins per PHRED score unit in the qscore histograms
+qscore_resolution = 1000
+
+# Number of bins per PHRED score unit in the qscore histograms of the channels
+channel_qscore_resolution = 10
+
+# Relative accuracy of the quantiles computed by the quantile sketches
+sketch_relative_accuracy = 0.01
+
+# Values of the quantile sketches smaller than this value are counted as zeros
+sketch_min_value = 1e-6
+
+# Duration in seconds of the time bins of the quantile sketches used for the over time graphs
+over_time_bin_duration = 120
+
+# Maximal number of reads kept in the random sample used for scatter, violin and over time graphs
+sample_size = 100000
+
+read_types = ('pass', 'fail')
+
+# Values of the reads summarized by time bin for the over time graphs
+over_time_values = {
+    'sequence_length': lambda df: df['sequence_length'].values,
+    'mean_qscore': lambda df: df['mean_qscore'].values,
+    'speed': lambda df: (df['sequence_length'] / df['duration']).values}
+
+
+class Histogram:
+    """
+    Histogram of non-negative values with fixed width bins. The bins below histogram_dense_size are stored in an
+    array that grows with the largest value seen, the few bins above (e.g. ultra-long reads) are stored sparsely,
+    so the memory used is bounded whatever the largest value.
+    Values are rounded to the nearest bin: with a resolution of 1 and integer values (e.g. read lengths),
+    all the statistics computed from the histogram are exact. Otherwise the quantiles are computed from the values
+    of the bins, but the count, the mean, the standard deviation, the minimum and the maximum are computed from the
+    values themselves: the sum of the values and the sum of their squared deviations from the mean are stored
+    and merged with the pairwise formula of Chan et al.
+    """
+
+    def __init__(self, resolution=1):
+        """
+        Constructor
+        :param resolution: number of bins per unit
+        """
+        self.resolution = resolution
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.sparse_bins = np.zeros(0, dtype=np.int64)
+        self.sparse_counts = np.zeros(0, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.squared_deviations = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @classmethod
+    def from_values(cls, values, resolution=1):
+        """
+        Create an histogram of values
+        :param values: array-like of values
+        :param resolution: number of bins per unit
+        :return: a Histogram object
+        """
+        histogram = cls(resolution)
+        histogram.update(values)
+        return histogram
+
+    def update(self, values):
+        """
+        Add values to the histogram
+        :param values: array-like of values
+        """
+        values = decimal_values(values)
+        if len(values) == 0:
+            return
+
+        if self.resolution == 1 and np.issubdtype(values.dtype, np.integer):
+            bins = values.astype(np.int64)
+        else:
+            bins = np.rint(values * self.resolution).astype(np.int64)
+        np.clip(bins, 0, None, out=bins)
+
+        sparse = bins >= histogram_dense_size
+        if sparse.any():
+            self._add_sparse_counts(*np.unique(bins[sparse], return_counts=True))
+            bins = bins[~sparse]
+
+        self._add_counts(np.bincount(bins))
+        values_sum = float(values.sum(dtype=np.float64))
+        squared_deviations = float(((values_sum / len(values) - values) ** 2).sum(dtype=np.float64))
+        self._add_moments(len(values), values_sum, squared_deviations)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        """
+        Add the content of another histogram with the same resolution to this histogram
+        :param other: the other histogram
+        """
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge histograms with different resolutions")
+
+        self._add_counts(other.counts)
+        self._add_sparse_counts(other.sparse_bins, other.sparse_counts)
+        self._add_moments(other.count, other.sum, other.squared_deviations)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def get_state(self):
+        """
+        Get the content of the histogram as a dictionary of numbers and numpy arrays
+        :return: a dictionary
+        """
+        return {'resolution': self.resolution, 'counts': self.counts, 'sparse_bins': self.sparse_bins,
+                'sparse_counts': self.sparse_counts, 'count': self.count, 'sum': self.sum,
+                'squared_deviations': self.squared_deviations, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Create an histogram from the dictionary returned by get_state()
+        :param state: dictionary of the content of the histogram
+        :return: a Histogram object
+        """
+        histogram = cls(state['resolution'])
+        for key in ('counts', 'sparse_bins', 'sparse_counts'):
+            setattr(histogram, key, np.array(state[key], dtype=np.int64))
+        for key in ('count', 'sum', 'squared_deviations', 'min', 'max'):
+            setattr(histogram, key, state[key])
+        return histogram
+
+    def _add_moments(self, count, values_sum, squared_deviations):
+        """
+        Add the count, the sum and the sum of the squared deviations from their mean of other values
+        """
+        if count == 0:
+            return
+
+        if self.count > 0:
+            delta = values_sum / count - self.sum / self.count
+            squared_deviations += delta * delta * self.count * count / (self.count + count)
+        self.count += count
+        self.sum += values_sum
+        self.squared_deviations += squared_deviations
+
+    def _add_counts(self, counts):
+        if len(counts) > len(self.counts):
+            self.counts = np.pad(self.counts, (0, len(counts) - len(self.counts)))
+        self.counts[:len(counts)] += counts
+
+    def _add_sparse_counts(self, bins, counts):
+        if len(bins) == 0:
+            return
+
+        all_bins = np.concatenate([self.sparse_bins, bins])
+        self.sparse_bins, indexes = np.unique(all_bins, return_inverse=True)
+        self.sparse_counts = np.bincount(indexes, weights=np.concatenate([self.sparse_counts, counts]),
+                                         minlength=len(self.sparse_bins)).astype(np.int64)
+
+    def _bins(self):
+        """
+        Get the indexes and the counts of the non-empty bins, in increasing order
+        :return: a tuple of numpy arrays
+        """
+        dense_bins = np.flatnonzero(self.counts)
+        return (np.concatenate([dense_bins, self.sparse_bins]),
+                np.concatenate([self.counts[dense_bins], self.sparse_counts]))
+
+    def bin_values(self):
+        """
+        Get the values of the non-empty bins
+        :return: a numpy array
+        """
+        return self._bins()[0] / self.resolution
+
+    def bin_counts(self):
+        """
+        Get the counts of the non-empty bins
+        :return: a numpy array
+        """
+        return self._bins()[1]
+
+    def mean(self):
+        return self.sum / self.count if self.count > 0 else np.nan
+
+    def std(self):
+        """
+        Compute the sample standard deviation (ddof=1) like pandas
+        """
+        if self.count < 2:
+            return np.nan
+        return math.sqrt(self.squared_deviations / (self.count - 1))
+
+    def quantile(self, q):
+        """
+        Compute a quantile with the linear interpolation used by pandas
+        :param q: quantile to compute, between 0 and 1
+        :return: a float
+        """
+        if self.count == 0:
+            return np.nan
+
+        bins, counts = self._bins()
+        cumulative_counts = np.cumsum(counts)
+        h = (self.count - 1) * q
+        lower = int(math.floor(h))
+        upper = min(lower + 1, self.count - 1)
+        a, b = bins[np.searchsorted(cumulative_counts, [lower, upper], side='right')] / self.resolution
+        t = h - lower
+
+        # Same formula as numpy to avoid rounding differences
+        if t >= 0.5:
+            return float(b - (b - a) * (1 - t))
+        return float(a + (b - a) * t)
+
+    def describe(self):
+        """
+        Compute the same statistics as pandas.Series.describe()
+        :return: a pandas Series
+        """
+        if self.count == 0:
+            return pd.Series([0.0] + [np.nan] * 7, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+        return pd.Series([float(self.count), self.mean(), self.std(), self.min,
+                          self.quantile(.25), self.quantile(.5), self.quantile(.75), self.max],
+                         index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'])
+
+    def nxx(self, x):
+        """
+        Compute NXX and LXX values, reads being cumulated from the shortest to the longest like in
+        sequencing_summary_common.compute_nxx()
+        :param x: percentage of the total of the values
+        :return: a tuple with the NXX and LXX values
+        """
+        return self.nxx_values([x])[x]
+
+    def nxx_values(self, percentages=None):
+        """
+        Compute NXX and LXX values for several percentages like sequencing_summary_common.compute_nxx()
+        :param percentages: list of percentages, by default nxx_percentages
+        :return: a dictionary with a tuple of the NXX and LXX values for each percentage, empty if there is no value
+        """
+        if percentages is None:
+            percentages = nxx_percentages
+        if self.count == 0:
+            return {}
+
+        values, counts = self._bins()
+        cumulative_sum = np.cumsum(values * counts)
+        cumulative_counts = np.cumsum(counts)
+
+        result = {}
+        for x in percentages:
+            threshold = cumulative_sum[-1] * x / 100
+
+            i = int(np.searchsorted(cumulative_sum, threshold, side='left'))
+            sum_before = cumulative_sum[i - 1] if i > 0 else 0
+            count_before = cumulative_counts[i - 1] if i > 0 else 0
+            value = int(values[i])
+            count_in_bin = max(1, math.ceil((threshold - sum_before) / value)) if value > 0 else 1
+
+            result[x] = (value // self.resolution, int(count_before + count_in_bin))
+        return result
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of non-negative values with logarithmic buckets (like DDSketch).
+    A value x is counted in the bucket i = ceil(log(x) / log(gamma)) with gamma = (1 + a) / (1 - a), a being the
+    relative accuracy. The representative value of the bucket, 2 * gamma ** i / (gamma + 1), is within a relative
+    error of a of all the values of the bucket. Quantiles are interpolated like pandas between the representative
+    values of the order statistics, so the error of a quantile is at most a times the exact quantile (values smaller
+    than sketch_min_value are counted as zeros).
+    The buckets do not depend on the values seen: merging the sketches of parts of the values gives exactly the
+    sketch of all the values, whatever the partition and the order of the values.
+    """
+
+    def __init__(self, relative_accuracy=sketch_relative_accuracy):
+        """
+        Constructor
+        :param relative_accuracy: relative accuracy of the quantiles, between 0 and 1
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """
+        Add values to the sketch, the NaN and infinite values are ignored
+        :param values: array-like of values
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+
+        positives = values[values >= sketch_min_value]
+        if len(positives) > 0:
+            indexes = np.ceil(np.log(positives) / math.log(self.gamma)).astype(np.int64)
+            offset = int(indexes.min())
+            self._add_counts(offset, np.bincount(indexes - offset))
+
+        self.zero_count += len(values) - len(positives)
+        self.count += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        """
+        Add the content of another sketch with the same relative accuracy to this sketch
+        :param other: the other sketch
+        """
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge quantile sketches with different relative accuracies")
+
+        self._add_counts(other.offset, other.counts)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def get_state(self):
+        """
+        Get the content of the sketch as a dictionary of numbers and numpy arrays
+        :return: a dictionary
+        """
+        return {'relative_accuracy': self.relative_accuracy, 'offset': self.offset, 'counts': self.counts,
+                'zero_count': self.zero_count, 'count': self.count, 'min': self.min, 'max': self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Create a sketch from the dictionary returned by get_state()
+        :param state: dictionary of the content of the sketch
+        :return: a QuantileSketch object
+        """
+        sketch = cls(state['relative_accuracy'])
+        sketch.counts = np.array(state['counts'], dtype=np.int64)
+        for key in ('offset', 'zero_count', 'count', 'min', 'max'):
+            setattr(sketch, key, state[key])
+        return sketch
+
+    def _add_counts(self, offset, counts):
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.offset = offset
+            self.counts = np.array(counts, dtype=np.int64)
+            return
+
+        start = min(self.offset, offset)
+        end = max(self.offset + len(self.counts), offset + len(counts))
+        if start < self.offset or end > self.offset + len(self.counts):
+            self.counts = np.pad(self.counts, (self.offset - start, end - self.offset - len(self.counts)))
+            self.offset = start
+        self.counts[offset - self.offset:offset - self.offset + len(counts)] += counts
+
+    def _value(self, rank):
+        """
+        Get the representative value of the value of a rank in the sorted values, the extreme values are exact
+        """
+        if rank == 0:
+            return self.min
+        if rank == self.count - 1:
+            return self.max
+        if rank < self.zero_count:
+            return max(self.min, 0.0)
+
+        i = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        value = 2 * self.gamma ** (self.offset + i) / (self.gamma + 1)
+        return min(max(value, self.min), self.max)
+
+    def quantile(self, q):
+        """
+        Compute an approximation of a quantile with the linear interpolation used by pandas
+        :param q: quantile to compute, between 0 and 1
+        :return: a float
+        """
+        if self.count == 0:
+            return np.nan
+
+        h = (self.count - 1) * q
+        lower = int(math.floor(h))
+        upper = min(lower + 1, self.count - 1)
+        a = self._value(lower)
+        b = self._value(upper)
+        t = h - lower
+
+        if t >= 0.5:
+            return float(b - (b - a) * (1 - t))
+        return float(a + (b - a) * t)
+
+
+class ChannelTable:
+    """
+    Statistics of the reads of each channel of a flowcell, computed with bincounts in a single pass: number of reads,
+    number of bases, number of pass reads and histogram of the qscores (with channel_qscore_resolution bins per unit)
+    to get the median qscore. The arrays are indexed by channel number and sized from the largest channel seen,
+    512 channels for a MinION flowcell and 3000 for a PromethION flowcell. Tables are merged by adding their arrays.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.read_counts = np.zeros(0, dtype=np.int64)
+        self.base_counts = np.zeros(0, dtype=np.int64)
+        self.pass_counts = np.zeros(0, dtype=np.int64)
+        self.qscore_counts = np.zeros((0, 0), dtype=np.int64)
+
+    @classmethod
+    def from_dataframe(cls, dataframe):
+        """
+        Create the table of the reads of a dataframe
+        :param dataframe: Pandas DataFrame with a channel column and optionally the sequence_length,
+        passes_filtering and mean_qscore columns
+        :return: a ChannelTable object
+        """
+        table = cls()
+        table.update(dataframe['channel'].values,
+                     *[dataframe[c].values if c in dataframe else None
+                       for c in ('sequence_length', 'passes_filtering', 'mean_qscore')])
+        return table
+
+    def update(self, channels, lengths=None, passes_filtering=None, qscores=None):
+        """
+        Add reads to the table
+        :param channels: array of the channel numbers of the reads
+        :param lengths: optional array of the lengths of the reads
+        :param passes_filtering: optional array of booleans, True for pass reads
+        :param qscores: optional array of the mean qscores of the reads
+        """
+        channels = np.asarray(channels).astype(np.int64)
+        if len(channels) == 0:
+            return
+
+        self.read_counts = _add_bincount(self.read_counts, channels)
+        if lengths is not None:
+            self.base_counts = _add_bincount(self.base_counts, channels, lengths)
+        if passes_filtering is not None:
+            self.pass_counts = _add_bincount(self.pass_counts, channels, passes_filtering)
+
+        if qscores is not None:
+            qscore_bins = np.clip(np.rint(np.asarray(qscores) * channel_qscore_resolution).astype(np.int64), 0, None)
+            bin_count = max(self.qscore_counts.shape[1], int(qscore_bins.max()) + 1)
+            channel_count = max(self.qscore_counts.shape[0], int(channels.max()) + 1)
+
+            # A single bincount on the (channel, qscore bin) cells
+            counts = np.bincount(channels * bin_count + qscore_bins, minlength=channel_count * bin_count)
+            self._add_qscore_counts(counts.reshape(channel_count, bin_count))
+
+    def merge(self, other):
+        """
+        Add the content of another table to this table
+        :param other: the other table
+        """
+        self.read_counts = _add_array(self.read_counts, other.read_counts)
+        self.base_counts = _add_array(self.base_counts, other.base_counts)
+        self.pass_counts = _add_array(self.pass_counts, other.pass_counts)
+        self._add_qscore_counts(other.qscore_counts)
+
+    def _add_qscore_counts(self, counts):
+        shape = np.maximum(self.qscore_counts.shape, counts.shape)
+        if tuple(shape) != self.qscore_counts.shape:
+            self.qscore_counts = np.pad(self.qscore_counts, [(0, shape[0] - self.qscore_counts.shape[0]),
+                                                             (0, shape[1] - self.qscore_counts.shape[1])])
+        self.qscore_counts[:counts.shape[0], :counts.shape[1]] += counts
+
+    def get_state(self):
+        """
+        Get the content of the table as a dictionary of numbers and numpy arrays
+        :return: a dictionary
+        """
+        return {'read_counts': self.read_counts, 'base_counts': self.base_counts, 'pass_counts': self.pass_counts,
+                'qscore_bin_count': self.qscore_counts.shape[1], 'qscore_counts': self.qscore_counts.ravel()}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Create a table from the dictionary returned by get_state()
+        :param state: dictionary of the content of the table
+        :return: a ChannelTable object
+        """
+        table = cls()
+        for key in ('read_counts', 'base_counts', 'pass_counts'):
+            setattr(table, key, np.array(state[key], dtype=np.int64))
+        table.qscore_counts = np.array(state['qscore_counts'], dtype=np.int64).reshape(-1, state['qscore_bin_count'])
+        return table
+
+    def channels(self):
+        """
+        Get the numbers of the channels with at least one read
+        :return: a numpy array
+        """
+        return np.flatnonzero(self.read_counts)
+
+    def occupancy(self):
+        """
+        Get the number of reads per channel for the channels with at least one read
+        :return: a Pandas Series indexed by channel numbers
+        """
+        channels = self.channels()
+        return pd.Series(self.read_counts[channels], index=channels)
+
+    def median_qscores(self):
+        """
+        Compute the median qscore of the reads of each channel from the qscore histograms, like pandas the median is
+        the mean of the two middle values when the number of reads is even
+        :return: a numpy array indexed by channel numbers, NaN for the channels without qscore
+        """
+        counts = self.qscore_counts
+        result = np.full(len(self.read_counts), np.nan)
+        if counts.size == 0:
+            return result
+
+        cumulative_counts = np.cumsum(counts, axis=1)
+        totals = cumulative_counts[:, -1]
+        lower = np.argmax(cumulative_counts > ((totals - 1) // 2)[:, None], axis=1)
+        upper = np.argmax(cumulative_counts > (totals // 2)[:, None], axis=1)
+
+        medians = np.where(totals > 0, (lower + upper) / 2 / channel_qscore_resolution, np.nan)
+        result[:len(medians)] = medians
+        return result
+
+    def to_dataframe(self):
+        """
+        Get the statistics of the channels with at least one read
+        :return: a Pandas DataFrame indexed by channel numbers with the reads, bases, pass.ratio and median.qscore
+        columns
+        """
+        channels = self.channels()
+        reads = self.read_counts[channels]
+        return pd.DataFrame({'reads': reads,
+                             'bases': _padded(self.base_counts, len(self.read_counts))[channels],
+                             'pass.ratio': _padded(self.pass_counts, len(self.read_counts))[channels] / reads,
+                             'median.qscore': self.median_qscores()[channels]},
+                            index=pd.Index(channels, name='channel'))
+
+
+class TimeBinCube:
+    """
+    Aggregates of the reads by time bin, read type and barcode, computed in a single pass and shared by the yield
+    graph, the over time graphs and the table of the statistics per hour: number of reads and number of bases by
+    bin of time_bin_duration seconds, quantile sketches of the lengths, qscores and speeds by bin of
+    over_time_bin_duration seconds. The cells of the cube are keyed by (read type, barcode) tuples, the barcode is
+    None when the reads are not barcoded. The count arrays are indexed by time bin from the start of the run.
+    Cubes are merged by adding their cells.
+    """
+
+    def __init__(self):
+        """
+        Constructor
+        """
+        self.read_counts = {}
+        self.base_counts = {}
+        self.sketches = {}
+        self.run_time = -math.inf
+
+    @classmethod
+    def from_dataframe(cls, dataframe, barcodes=None, time_column='start_time'):
+        """
+        Create the cube of the reads of a dataframe
+        :param dataframe: Pandas DataFrame with the sequence_length, mean_qscore, passes_filtering, duration and
+        time columns
+        :param barcodes: optional categorical Pandas Series with the barcode of each read
+        :param time_column: name of the column with the start times of the reads in seconds
+        :return: a TimeBinCube object
+        """
+        cube = cls()
+        cube.update(dataframe, barcodes, time_column)
+        return cube
+
+    def update(self, dataframe, barcodes=None, time_column='start_time'):
+        """
+        Add reads to the cube
+        :param dataframe: Pandas DataFrame with the sequence_length, mean_qscore, passes_filtering, duration and
+        time columns
+        :param barcodes: optional categorical Pandas Series with the barcode of each read
+        :param time_column: name of the column with the start times of the reads in seconds
+        """
+        if dataframe.empty:
+            return
+
+        keys, cells = self._cells(dataframe['passes_filtering'].values, barcodes)
+        start_times = dataframe[time_column].values
+        self.run_time = max(self.run_time, float(start_times.max()))
+
+        # A single bincount on the (cell, time bin) pairs for the read and base counts
+        time_bins, first_bin, bin_count = _time_bins(start_times, time_bin_duration)
+        codes = cells * bin_count + time_bins
+        read_counts = np.bincount(codes, minlength=len(keys) * bin_count).reshape(len(keys), bin_count)
+        base_counts = np.bincount(codes, weights=dataframe['sequence_length'].values,
+                                  minlength=len(keys) * bin_count).astype(np.int64).reshape(len(keys), bin_count)
+
+        for i in np.flatnonzero(read_counts.sum(axis=1)):
+            key = keys[i]
+            self.read_counts[key] = _add_array(self.read_counts.get(key, np.zeros(0, dtype=np.int64)),
+                                               np.pad(read_counts[i], (first_bin, 0)))
+            self.base_counts[key] = _add_array(self.base_counts.get(key, np.zeros(0, dtype=np.int64)),
+                                               np.pad(base_counts[i], (first_bin, 0)))
+
+        # The values of all the sketches are split by (cell, time bin) with a single sort
+        time_bins, first_bin, bin_count = _time_bins(start_times, over_time_bin_duration)
+        values = np.column_stack([function(dataframe) for function in over_time_values.values()])
+        groups = group_values(values, cells * bin_count + time_bins, len(keys) * bin_count)
+
+        for i, group in enumerate(groups):
+            if len(group) == 0:
+                continue
+            sketches = self.sketches.setdefault(keys[i // bin_count], {name: {} for name in over_time_values})
+            for j, name in enumerate(over_time_values):
+                sketches[name].setdefault(first_bin + i % bin_count, QuantileSketch()).update(group[:, j])
+
+    @staticmethod
+    def _cells(passes_filtering, barcodes):
+        """
+        Get the keys of the cells of reads and the index of the key of each read
+        :return: a tuple with the list of the (read type, barcode) keys and a numpy array of indexes in this list
+        """
+        read_type_codes = np.where(passes_filtering.astype(bool), 0, 1)
+        if barcodes is None:
+            return [(t, None) for t in read_types], read_type_codes
+
+        # The reads without barcode are in the cells of the None barcode
+        names = list(barcodes.cat.categories) + [None]
+        barcode_codes = barcodes.cat.codes.values.astype(np.int64)
+        barcode_codes[barcode_codes < 0] = len(names) - 1
+
+        return [(t, b) for b in names for t in read_types], barcode_codes * len(read_types) + read_type_codes
+
+    def merge(self, other):
+        """
+        Add the content of another cube to this cube
+        :param other: the other cube
+        """
+        for key, counts in other.read_counts.items():
+            self.read_counts[key] = _add_array(self.read_counts.get(key, np.zeros(0, dtype=np.int64)), counts)
+            self.base_counts[key] = _add_array(self.base_counts.get(key, np.zeros(0, dtype=np.int64)),
+                                               other.base_counts[key])
+
+            sketches = self.sketches.setdefault(key, {name: {} for name in over_time_values})
+            for name, other_sketches in other.sketches[key].items():
+                for time_bin, sketch in other_sketches.items():
+                    sketches[name].setdefault(time_bin, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+
+        self.run_time = max(self.run_time, other.run_time)
+
+    def get_state(self):
+        """
+        Get the content of the cube as nested lists of numbers, strings and numpy arrays
+        :return: a dictionary
+        """
+        return {'run_time': self.run_time,
+                'cells': [[read_type, barcode, self.read_counts[(read_type, barcode)],
+                           self.base_counts[(read_type, barcode)],
+                           {name: [[time_bin, sketch.get_state()] for time_bin, sketch in sorted(sketches.items())]
+                            for name, sketches in self.sketches[(read_type, barcode)].items()}]
+                          for read_type, barcode in self.read_counts]}
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Create a cube from the dictionary returned by get_state()
+        :param state: dictionary of the content of the cube
+        :return: a TimeBinCube object
+        """
+        cube = cls()
+        cube.run_time = state['run_time']
+        for read_type, barcode, read_counts, base_counts, sketches in state['cells']:
+            key = (read_type, barcode)
+            cube.read_counts[key] = np.array(read_counts, dtype=np.int64)
+            cube.base_counts[key] = np.array(base_counts, dtype=np.int64)
+            cube.sketches[key] = {name: {int(time_bin): QuantileSketch.from_state(sketch)
+                                         for time_bin, sketch in sketches[name]}
+                                  for name in over_time_values}
+        return cube
+
+    def _keys(self, read_type=None):
+        return [key for key in self.read_counts if read_type is None or key[0] == read_type]
+
+    def time_read_counts(self, read_type=None):
+        """
+        Get the number of reads of each bin of time_bin_duration seconds
+        :param read_type: 'pass', 'fail' or None for all reads
+        :return: a numpy array indexed by time bin
+        """
+        return _sum_arrays(self.read_counts[key] for key in self._keys(read_type))
+
+    def time_base_counts(self, read_type=None):
+        """
+        Get the number of bases of each bin of time_bin_duration seconds
+        :param read_type: 'pass', 'fail' or None for all reads
+        :return: a numpy array indexed by time bin
+        """
+        return _sum_arrays(self.base_counts[key] for key in self._keys(read_type))
+
+    def time_sketches(self, name, read_type=None):
+        """
+        Get the quantile sketches of a value of the reads of each bin of over_time_bin_duration seconds
+        :param name: name of the value, a key of over_time_values
+        :param read_type: 'pass', 'fail' or None for all reads
+        :return: a dictionary of QuantileSketch objects by time bin
+        """
+        result = {}
+        for key in self._keys(read_type):
+            for time_bin, sketch in self.sketches[key][name].items():
+                result.setdefault(time_bin, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+        return result
+
+    def hourly_statistics(self):
+        """
+        Get the statistics of the reads started in each hour of the run, the durations of the time bins divide an hour
+        :return: a Pandas DataFrame indexed by hour with the reads, pass.ratio, bases, median.length, median.qscore and
+        median.speed columns, for the hours with at least one read
+        """
+        bins_per_hour = 3600 // time_bin_duration
+        reads = _hourly_sums(self.time_read_counts(), bins_per_hour)
+        pass_reads = _padded(_hourly_sums(self.time_read_counts('pass'), bins_per_hour), len(reads))
+        bases = _hourly_sums(self.time_base_counts(), bins_per_hour)
+        hours = np.flatnonzero(reads)
+
+        table = pd.DataFrame({'reads': reads[hours],
+                              'pass.ratio': pass_reads[hours] / reads[hours],
+                              'bases': bases[hours]},
+                             index=pd.Index(hours, name='hour'))
+
+        for name, column in (('sequence_length', 'median.length'), ('mean_qscore', 'median.qscore'),
+                             ('speed', 'median.speed')):
+            hourly_sketches = {}
+            for time_bin, sketch in self.time_sketches(name).items():
+                hour = time_bin * over_time_bin_duration // 3600
+                hourly_sketches.setdefault(hour, QuantileSketch(sketch.relative_accuracy)).merge(sketch)
+            table[column] = [hourly_sketches[h].quantile(.5) if h in hourly_sketches else np.nan for h in hours]
+
+        return table
+
+
+class SequencingSummaryAggregator:
+    """
+    Running aggregates of the reads of a sequencing summary: counts, length and qscore histograms by read type,
+    statistics by channel, yield and quantile sketches of the lengths, qscores and speeds by time bin, read type and
+    barcode, barcodes and a uniform random sample of reads for graphs that need individual reads.
+    """
+
+    def __init__(self, barcode_selection=None, random_seed=1):
+        """
+        Constructor
+        :param barcode_selection: list of the barcodes to aggregate separately, the other barcodes are gathered
+        in "other barcodes". None if the reads are not barcoded
+        :param random_seed: seed of the random generator used for sampling, None for a seed from the system entropy
+        """
+        self.barcode_selection = list(barcode_selection) if barcode_selection is not None else None
+        self.length = {t: Histogram() for t in read_types}
+        self.qscore = {t: Histogram(qscore_resolution) for t in read_types}
+        self.channels = ChannelTable()
+        self.time_bins = TimeBinCube()
+        self.barcode_length = {}
+        self.barcode_qscore = {}
+        self.sample = None
+        self._random = np.random.default_rng(random_seed)
+
+    @property
+    def read_count(self):
+        return sum(self.length[t].count for t in read_types)
+
+    @property
+    def run_time(self):
+        return self.time_bins.run_time
+
+    def update(self, dataframe):
+        """
+        Add a chunk of reads to the aggregates
+        :param dataframe: Pandas DataFrame with the sequence_length, mean_qscore, passes_filtering, channel,
+        start_time, duration and optionally barcode_arrangement columns
+        """
+        if dataframe.empty:
+            return
+
+        passes_filtering = dataframe['passes_filtering'].values.astype(bool)
+        for read_type, mask in (('pass', passes_filtering), ('fail', ~passes_filtering)):
+            df = dataframe[mask]
+            self.length[read_type].update(df['sequence_length'].values)
+            self.qscore[read_type].update(df['mean_qscore'].values)
+
+        self.channels.update(dataframe['channel'].values, dataframe['sequence_length'].values, passes_filtering,
+                             dataframe['mean_qscore'].values)
+
+        barcodes = self._selected_barcodes(dataframe) if self.barcode_selection is not None else None
+        self.time_bins.update(dataframe, barcodes)
+
+        if barcodes is not None:
+            self._update_barcodes(dataframe, barcodes)
+
+        self._update_sample(dataframe)
+
+    def _selected_barcodes(self, dataframe):
+        """
+        Get the barcodes of the reads, with the barcodes that are not in the selection replaced by 'other barcodes'
+        :return: a categorical Pandas Series
+        """
+        barcodes = dataframe['barcode_arrangement']
+        if not isinstance(barcodes.dtype, pd.CategoricalDtype):
+            barcodes = barcodes.astype(str).astype('category')
+        return group_other_barcodes(barcodes, self.barcode_selection)
+
+    def _update_barcodes(self, dataframe, barcodes):
+
+        for (barcode, passes_filtering), df in dataframe.groupby([barcodes, 'passes_filtering'], observed=True):
+            key = (barcode, 'pass' if passes_filtering else 'fail')
+            if key not in self.barcode_length:
+                self.barcode_length[key] = Histogram()
+                self.barcode_qscore[key] = Histogram(qscore_resolution)
+            self.barcode_length[key].update(df['sequence_length'].values)
+            self.barcode_qscore[key].update(df['mean_qscore'].values)
+
+    def _update_sample(self, dataframe):
+        """
+        Keep the reads with the smallest random keys (bottom-k sampling): the result is a uniform sample
+        without replacement of all the reads seen, whatever the size of the chunks
+        """
+        columns = ['sequence_length', 'mean_qscore', 'passes_filtering', 'start_time', 'duration']
+        chunk = dataframe[columns].assign(sample_key=self._random.random(len(dataframe)))
+
+        if self.sample is not None:
+            if len(self.sample) >= sample_size:
+                chunk = chunk[chunk['sample_key'] < self.sample['sample_key'].iloc[-1]]
+            chunk = pd.concat([self.sample, chunk], ignore_index=True)
+
+        self.sample = chunk.nsmallest(sample_size, 'sample_key').reset_index(drop=True)
+
+    def merge(self, other):
+        """
+        Add the aggregates of another aggregator with the same barcode selection to this aggregator. The result is
+        the same as if the reads of the other aggregator had been added to this one, except the random sample that is
+        a uniform sample of the reads of both aggregators if their random keys are independent
+        :param other: the other aggregator
+        """
+        if other.barcode_selection != self.barcode_selection:
+            raise ValueError("Cannot merge aggregates with different barcode selections")
+
+        for read_type in read_types:
+            self.length[read_type].merge(other.length[read_type])
+            self.qscore[read_type].merge(other.qscore[read_type])
+
+        self.channels.merge(other.channels)
+        self.time_bins.merge(other.time_bins)
+
+        for key, histogram in other.barcode_length.items():
+            if key not in self.barcode_length:
+                self.barcode_length[key] = Histogram()
+                self.barcode_qscore[key] = Histogram(qscore_resolution)
+            self.barcode_length[key].merge(histogram)
+            self.barcode_qscore[key].merge(other.barcode_qscore[key])
+
+        if other.sample is not None:
+            sample = other.sample if self.sample is None else pd.concat([self.sample, other.sample], ignore_index=True)
+            self.sample = sample.nsmallest(sample_size, 'sample_key').reset_index(drop=True)
+
+    def get_state(self):
+        """
+        Get the content of the aggregator as nested dictionaries and lists of numbers, strings and numpy arrays
+        :return: a dictionary
+        """
+        return {'barcode_selection': self.barcode_selection,
+                'length': {t: self.length[t].get_state() for t in read_types},
+                'qscore': {t: self.qscore[t].get_state() for t in read_types},
+                'channels': self.channels.get_state(),
+                'time_bins': self.time_bins.get_state(),
+                'barcodes': [[barcode, read_type, histogram.get_state(),
+                              self.barcode_qscore[(barcode, read_type)].get_state()]
+                             for (barcode, read_type), histogram in self.barcode_length.items()],
+                'sample': None if self.sample is None else {c: self.sample[c].values for c in self.sample.columns}}
+
+    @classmethod
+    def from_state(cls, state, random_seed=1):
+        """
+        Create an aggregator from the dictionary returned by get_state()
+        :param state: dictionary of the content of the aggregator
+        :param random_seed: seed of the random generator used for sampling the reads added later
+        :return: a SequencingSummaryAggregator object
+        """
+        aggregator = cls(state['barcode_selection'], random_seed)
+        aggregator.length = {t: Histogram.from_state(state['length'][t]) for t in read_types}
+        aggregator.qscore = {t: Histogram.from_state(state['qscore'][t]) for t in read_types}
+        aggregator.channels = ChannelTable.from_state(state['channels'])
+        aggregator.time_bins = TimeBinCube.from_state(state['time_bins'])
+
+        for barcode, read_type, length, qscore in state['barcodes']:
+            aggregator.barcode_length[(barcode, read_type)] = Histogram.from_state(length)
+            aggregator.barcode_qscore[(barcode, read_type)] = Histogram.from_state(qscore)
+
+        if state['sample'] is not None:
+            aggregator.sample = pd.DataFrame(state['sample'])
+        return aggregator
+
+    def all_length(self):
+        return _merged_histograms(self.length.values())
+
+    def all_qscore(self):
+        return _merged_histograms(self.qscore.values())
+
+    def barcode_histograms(self, barcode, read_type=None):
+        """
+        Get the length and qscore histograms of a barcode
+        :param barcode: barcode name
+        :param read_type: 'pass', 'fail' or None for all reads
+        :return: a tuple with the length and qscore histograms
+        """
+        types = read_types if read_type is None else (read_type,)
+        length = _merged_histograms([self.barcode_length[(barcode, t)] for t in types
+                                     if (barcode, t) in self.barcode_length])
+        qscore = _merged_histograms([self.barcode_qscore[(barcode, t)] for t in types
+                                     if (barcode, t) in self.barcode_qscore], qscore_resolution)
+        return length, qscore
+
+    def barcode_counts(self, read_type):
+        """
+        Get the number of reads of each barcode of the selection and of the other barcodes
+        :param read_type: 'pass' or 'fail'
+        :return: a Pandas Series indexed by barcode names
+        """
+        barcodes = list(self.barcode_selection) + ['other barcodes']
+        return pd.Series([self.barcode_length[(b, read_type)].count if (b, read_type) in self.barcode_length else 0
+                          for b in barcodes], index=barcodes)
+
+    def channel_occupancy(self):
+        """
+        Get the number of reads per channel for the channels with at least one read
+        :return: a Pandas Series indexed by channel numbers
+        """
+        return self.channels.occupancy()
+
+
+def _merged_histograms(histograms, resolution=None):
+    histograms = list(histograms)
+    if resolution is None:
+        resolution = histograms[0].resolution if histograms else 1
+
+    result = Histogram(resolution)
+    for h in histograms:
+        result.merge(h)
+    return result
+
+
+def _add_bincount(counts, bins, weights=None):
+    """
+    Add the bincount of an array to an array of counts, extending it if required
+    """
+    if len(bins) == 0:
+        return counts
+
+    return _add_array(counts, np.bincount(bins, weights=weights).astype(np.int64))
+
+
+def _time_bins(start_times, duration):
+    """
+    Get the time bins of start times relative to the first bin
+    :return: a tuple with the numpy array of the relative bins, the first bin and the number of bins
+    """
+    time_bins = (start_times // duration).astype(np.int64)
+    first_bin = int(time_bins.min())
+    return time_bins - first_bin, first_bin, int(time_bins.max()) - first_bin + 1
+
+
+def _sum_arrays(arrays):
+    """
+    Sum arrays of counts of different lengths
+    """
+    result = np.zeros(0, dtype=np.int64)
+    for a in arrays:
+        result = _add_array(result, a)
+    return result
+
+
+def _hourly_sums(counts, bins_per_hour):
+    """
+    Sum an array of counts by groups of bins_per_hour bins
+    """
+    counts = _padded(counts, -(-len(counts) // bins_per_hour) * bins_per_hour)
+    return counts.reshape(-1, bins_per_hour).sum(axis=1)
+
+
+def _padded(counts, length):
+    """
+    Extend an array of counts with zeros to a length
+    """
+    return np.pad(counts, (0, max(0, length - len(counts))))
+
+
+def _add_array(counts, other_counts):
+    """
+    Add an array of counts to another one, extending it if required
+    """
+    if len(other_counts) > len(counts):
+        counts = np.pad(counts, (0, len(other_counts) - len(counts)))
+    counts[:len(other_counts)] += other_counts
+    return counts
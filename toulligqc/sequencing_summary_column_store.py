@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# On-disk store of the columns of the reads of a run, ready to be memory-mapped.
+# Each entry of the store is a directory with one raw file per column type. A file contains the columns of its
+# type one after the other, which is the memory layout of a Pandas block: the dataframe is built on the mapped
+# files without parsing or copying the data, and the pages of the files are shared by all the processes that
+# read the same run. Categorical columns are stored as their integer codes, their categories are saved in the
+# description file of the entry.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from toulligqc.sequencing_summary_reader import datatype_name
+
+# Version of the layout of the entries, entries of other versions are ignored
+store_format_version = 1
+
+# Name of the description file of the entries
+description_filename = 'columns.json'
+
+
+def get_column_store(config_dictionary):
+    """
+    Get the column store defined in the configuration
+    :param config_dictionary: configuration dictionary
+    :return: a ColumnStore object or None if no column store directory is defined
+    """
+    if 'column_store_directory' in config_dictionary and config_dictionary['column_store_directory']:
+        return ColumnStore(config_dictionary['column_store_directory'])
+    return None
+
+
+class ColumnStore:
+    """
+    Store of the columns of the reads of runs as raw arrays. The entries are identified by the paths, the sizes and
+    the modification times of the input files of the run and by the types of the loaded columns.
+    """
+
+    def __init__(self, directory):
+        """
+        Constructor
+        :param directory: path of the directory of the store
+        """
+        self.directory = directory
+
+    def _entry_path(self, files, datatypes):
+        """
+        Get the path of the entry of a run
+        """
+        file_keys = []
+        for f in files:
+            stat = os.stat(f)
+            file_keys.append([os.path.abspath(f), stat.st_size, stat.st_mtime_ns])
+
+        key = json.dumps([store_format_version, file_keys, sorted((c, datatype_name(t)) for c, t in datatypes.items())])
+
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def load(self, files, datatypes):
+        """
+        Map the columns of a run in memory
+        :param files: list of the input files of the run
+        :param datatypes: dictionary of the types of the columns that can be loaded from the files
+        :return: a Pandas Dataframe object or None if the run is not in the store
+        """
+        path = self._entry_path(files, datatypes)
+        try:
+            with open(os.path.join(path, description_filename)) as f:
+                description = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        if description['version'] != store_format_version:
+            return None
+
+        rows = description['rows']
+        dataframes = []
+        for group in description['groups']:
+            # Copy on write: the dataframe can be modified without changing the store
+            values = np.memmap(os.path.join(path, group['file']), dtype=np.dtype(group['dtype']), mode='c',
+                               shape=(len(group['columns']), rows)) if rows > 0 \
+                else np.empty((len(group['columns']), 0), dtype=np.dtype(group['dtype']))
+
+            if 'categories' in group:
+                dataframes.append(pd.DataFrame({group['columns'][0]: pd.Categorical.from_codes(
+                    values[0], categories=group['categories'])}))
+            else:
+                dataframes.append(pd.DataFrame(values.T, columns=group['columns'], copy=False))
+
+        return pd.concat(dataframes, axis=1, copy=False)
+
+    def save(self, files, datatypes, dataframe):
+        """
+        Save the columns of a run in the store
+        :param files: list of the input files of the run
+        :param datatypes: dictionary of the types of the columns that can be loaded from the files
+        :param dataframe: Pandas Dataframe object with the columns of the reads
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(files, datatypes)
+        if os.path.isdir(path):
+            return
+
+        # Columns grouped by type, in the order of the dataframe
+        groups = {}
+        for column in dataframe.columns:
+            dtype = dataframe[column].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                groups[column] = {'file': column + '.codes', 'columns': [column],
+                                  'categories': [str(c) for c in dtype.categories]}
+            else:
+                groups.setdefault(dtype.str, {'file': dtype.name + '.bin', 'columns': []})['columns'].append(column)
+
+        # Write a temporary directory first to never leave an incomplete entry in the store
+        tmp_path = tempfile.mkdtemp(suffix='.tmp', dir=self.directory)
+        try:
+            for group in groups.values():
+                with open(os.path.join(tmp_path, group['file']), 'wb') as f:
+                    for column in group['columns']:
+                        values = dataframe[column]
+                        values = values.cat.codes.values if 'categories' in group else values.values
+                        group['dtype'] = values.dtype.str
+                        np.ascontiguousarray(values).tofile(f)
+
+            with open(os.path.join(tmp_path, description_filename), 'w') as f:
+                json.dump({'version': store_format_version, 'rows': len(dataframe),
+                           'groups': list(groups.values())}, f)
+
+            os.rename(tmp_path, path)
+        except OSError:
+            # The entry has been created by another process
+            if not os.path.isdir(path):
+                raise
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path)
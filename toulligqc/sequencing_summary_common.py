@@ -20,8 +20,21 @@
 
 # This module contains common methods for sequencing summary modules.
 
+import re
+
+import numpy as np
 import pandas as pd
 
+from toulligqc.sequencing_summary_schema import decimal_values
+
+# Percentages of the NXX and LXX values of the read lengths
+nxx_percentages = (10, 20, 30, 40, 50, 60, 70, 80, 90)
+
+# Barcode of a kit (BC01, NB12, RB96, PCB01, barcode384...) and range of barcodes of a kit (NB01-NB96)
+kit_barcode_pattern = re.compile(r'(?:BC|NB|RB|PCB|BARCODE)(\d+)', re.IGNORECASE)
+kit_barcode_range_pattern = re.compile(r'(?:BC|NB|RB|PCB|BARCODE)(\d+)-(?:BC|NB|RB|PCB|BARCODE)?(\d+)',
+                                       re.IGNORECASE)
+
 
 def set_result_value(extractor, result_dict, key: str, value):
     """
@@ -63,6 +76,47 @@ def _check_result_key_value(key, value):
         raise TypeError("Invalid type for the value of the key {}: {} ".format(key, type(value)))
 
 
+def compute_nxx(lengths, percentages=None, is_sorted=False):
+    """
+    Compute the NXX and LXX values of read lengths for several percentages with a single sort. The reads are
+    cumulated from the shortest to the longest: NXX is the length of the read where the cumulated length reaches
+    XX% of the total length and LXX the number of reads cumulated until this read
+    :param lengths: array-like of read lengths, the missing values are ignored
+    :param percentages: list of percentages, by default nxx_percentages
+    :param is_sorted: True if the lengths are already sorted, to skip the sort
+    :return: a dictionary with a tuple of the NXX and LXX values for each percentage, empty if there is no read
+    """
+    if percentages is None:
+        percentages = nxx_percentages
+
+    values = np.asarray(lengths)
+    if values.dtype.kind == 'f':
+        values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {}
+
+    if not is_sorted:
+        values = np.sort(values)
+    cumulative_sum = np.cumsum(values, dtype=np.float64 if values.dtype.kind == 'f' else np.int64)
+    thresholds = cumulative_sum[-1] * np.asarray(percentages) / 100
+
+    # Index of the first read where the cumulated length reaches each threshold
+    indexes = np.searchsorted(cumulative_sum, thresholds, side='left')
+
+    return {x: (int(values[i]), int(i) + 1) for x, i in zip(percentages, indexes)}
+
+
+def nxx_dict(extractor, result_dict: dict, nxx_values: dict, entry: str):
+    """
+    Set NXX and LXX values in the result_dict
+    :param nxx_values: dictionary of the NXX and LXX values returned by compute_nxx()
+    :param entry: prefix of the keys, completed with nXX and lXX
+    """
+    for x, (nxx, lxx) in nxx_values.items():
+        set_result_value(extractor, result_dict, entry + 'n' + str(x), nxx)
+        set_result_value(extractor, result_dict, entry + 'l' + str(x), lxx)
+
+
 def describe_dict(extractor, result_dict: dict, function, entry: str):
     """
     Set statistics for a key like mean, min, max, median and percentiles (without the count value) filled in the _set_result_value dictionary
@@ -75,6 +129,148 @@ def describe_dict(extractor, result_dict: dict, function, entry: str):
         set_result_value(extractor, result_dict, entry + '.' + key, value)
 
 
+def statistics_dict(extractor, result_dict: dict, statistics, entry: str, count=False):
+    """
+    Set statistics computed like pandas.Series.describe() in the result_dict
+    :param statistics: pandas Series with the statistics
+    :param entry: entry to put in result_dict completed with the statistics
+    :param count: True to also set the count value
+    """
+    for key, value in statistics.items():
+        if count or key != 'count':
+            set_result_value(extractor, result_dict, entry + '.' + key, value)
+
+
+def group_values(values, codes, group_count):
+    """
+    Split values by group in a single pass. The values are partitioned with a stable sort on the small integer codes
+    of the groups, which is a linear radix sort. Each group is then a contiguous slice with the values in their
+    original order, so the statistics of a group are the same as the ones of the values filtered by the group
+    :param values: numpy array of values
+    :param codes: numpy array of integers with the group of each value, from 0 to group_count - 1. The values with
+    a negative code are ignored
+    :param group_count: number of groups
+    :return: a list with the numpy array of the values of each group
+    """
+    order = np.argsort(codes, kind='stable')
+    sorted_values = values[order]
+
+    counts = np.bincount(codes[codes >= 0], minlength=group_count)
+    ends = np.cumsum(counts) + np.count_nonzero(codes < 0)
+    starts = ends - counts
+
+    return [sorted_values[start:end] for start, end in zip(starts, ends)]
+
+
+def describe_read_groups(dataframe, column: str):
+    """
+    Compute the statistics of pandas.Series.describe() of a column for all the reads and for the pass and fail reads,
+    on the decimal values of the files for the 32 bit columns
+    :param dataframe: Pandas Dataframe with a passes_filtering column
+    :param column: name of the column
+    :return: a Pandas Dataframe with the statistics as index and the 'all', 'pass' and 'fail' columns
+    """
+    values = decimal_values(dataframe[column].values)
+    fail_values, pass_values = group_values(values, dataframe['passes_filtering'].values.astype(np.int8), 2)
+
+    return pd.DataFrame({'all': pd.Series(values).describe(),
+                         'pass': pd.Series(pass_values).describe(),
+                         'fail': pd.Series(fail_values).describe()})
+
+
+def group_statistics(values, codes, group_count):
+    """
+    Compute the statistics of pandas.Series.describe() of the values of all the groups in a single pass. The values
+    are sorted once by group and by value, so each group is a contiguous slice of sorted values: the minimum, the
+    maximum and the quantiles of the groups are read at their index, and the sums of the mean and of the standard
+    deviation (with two passes like describe()) are reduced on the slices. The count, the minimum, the maximum and the
+    quantiles are the same as the ones of describe(), the mean and the standard deviation only differ by the rounding
+    of the sums
+    :param values: numpy array of values
+    :param codes: numpy array of integers with the group of each value, from 0 to group_count - 1. The values with
+    a negative code are ignored
+    :param group_count: number of groups
+    :return: a tuple with a Pandas Dataframe with the statistics of each group as rows, like describe(), and the list
+    with the sorted numpy array of the values of each group
+    """
+    order = np.lexsort((values, codes))
+    sorted_values = values[order]
+    sorted_codes = codes[order]
+
+    counts = np.bincount(codes[codes >= 0], minlength=group_count)
+    ends = np.cumsum(counts) + np.count_nonzero(codes < 0)
+    starts = ends - counts
+    groups = [sorted_values[start:end] for start, end in zip(starts, ends)]
+
+    # The missing values are sorted at the end of their group and ignored like with describe()
+    valid = sorted_codes >= 0
+    if sorted_values.dtype.kind == 'f':
+        valid &= ~np.isnan(sorted_values)
+    valid_counts = np.bincount(sorted_codes[valid], minlength=group_count)
+    non_empty = valid_counts > 0
+    last = starts + np.maximum(valid_counts - 1, 0)
+
+    # Sums of the slices of the groups, a zero is appended for the empty groups at the end of the values
+    floats = np.append(np.where(valid, sorted_values, 0).astype(np.float64), 0)
+    mean = np.add.reduceat(floats, starts) / np.maximum(valid_counts, 1)
+    deviations = np.append(np.where(valid, floats[:-1] - mean[np.maximum(sorted_codes, 0)], 0) ** 2, 0)
+    variance = np.add.reduceat(deviations, starts) / np.maximum(valid_counts - 1, 1)
+
+    statistics = {'count': valid_counts.astype(np.float64),
+                  'mean': np.where(non_empty, mean, np.nan),
+                  'std': np.where(valid_counts > 1, np.sqrt(variance), np.nan),
+                  'min': np.where(non_empty, sorted_values[np.minimum(starts, len(sorted_values) - 1)], np.nan)}
+
+    # Linear interpolation between the closest values, computed like numpy.percentile() used by describe()
+    for q in (0.25, 0.5, 0.75):
+        position = (np.maximum(valid_counts, 1) - 1) * q
+        below = np.floor(position).astype(np.int64)
+        t = position - below
+        above = np.minimum(below + 1, np.maximum(valid_counts - 1, 0))
+        a = sorted_values[np.minimum(starts + below, len(sorted_values) - 1)]
+        b = sorted_values[np.minimum(starts + above, len(sorted_values) - 1)]
+        difference = b - a
+        quantile = np.where(t >= 0.5, b - difference * (1 - t), a + difference * t)
+        if sorted_values.dtype.kind == 'f':
+            # describe() keeps the type of the values for the quantiles of the values with missing values
+            quantile = np.where(valid_counts < counts, quantile.astype(sorted_values.dtype), quantile)
+        statistics['{:g}%'.format(q * 100)] = np.where(non_empty, quantile, np.nan)
+
+    statistics['max'] = np.where(non_empty, sorted_values[np.minimum(last, len(sorted_values) - 1)], np.nan)
+
+    return pd.DataFrame(statistics, dtype=np.float64), groups
+
+
+def barcode_read_groups(dataframe, column: str, barcode_selection):
+    """
+    Split the values of a column by barcode for all the reads and for the pass and fail reads and compute their
+    statistics, in a single pass for each read type. The values of the 32 bit columns are the decimal values of the
+    files
+    :param dataframe: Pandas Dataframe with a passes_filtering column and a categorical barcode_arrangement column
+    :param column: name of the column
+    :param barcode_selection: list of the barcodes
+    :return: a tuple with a dictionary with the sorted numpy array of the values of each ('all'|'pass'|'fail',
+    barcode) group and a Pandas Dataframe with the statistics of describe() of each group, indexed by the groups
+    """
+    values = decimal_values(dataframe[column].values)
+    passes = dataframe['passes_filtering'].values.astype(np.int16)
+
+    # Codes of the barcodes in barcode_selection, -1 for the other barcodes
+    codes = pd.Categorical(dataframe['barcode_arrangement'], categories=barcode_selection).codes.astype(np.int16)
+    group_codes = np.where(codes < 0, -1, codes * 2 + passes)
+
+    all_keys = [('all', b) for b in barcode_selection]
+    all_statistics, all_groups = group_statistics(values, codes, len(barcode_selection))
+    type_keys = [(t, b) for b in barcode_selection for t in ('fail', 'pass')]
+    type_statistics, type_groups = group_statistics(values, group_codes, 2 * len(barcode_selection))
+
+    groups = dict(zip(all_keys + type_keys, all_groups + type_groups))
+    statistics = pd.concat([all_statistics, type_statistics], ignore_index=True)
+    statistics.index = pd.MultiIndex.from_tuples(all_keys + type_keys)
+
+    return groups, statistics
+
+
 def count_boolean_elements(dataframe, column_name, boolean: bool) -> int:
     """
     Returns the number of values of a column filtered by a boolean
@@ -108,6 +304,69 @@ def sorted_series_boolean_elements_divided(dataframe, column_name1: str, column_
     return (dataframe[column_name1].loc[dataframe[column_name2] == bool(boolean)] / denominator).sort_values()
 
 
+def parse_barcode_selection(barcodes: str) -> list:
+    """
+    Get the names of the barcode arrangements of a list of barcodes. The barcodes of the kits (BC01, NB12, RB96,
+    PCB01...) and the ranges of barcodes (NB01-NB96) are named like the barcode arrangements of the basecaller
+    (barcode01, barcode384), the other names like the ones of dual-indexed barcodes are kept unchanged
+    :param barcodes: coma separated list of barcodes
+    :return: a list with the names of the barcode arrangements, sorted by barcode number
+    """
+    barcode_set = set()
+    for b in barcodes.split(','):
+        b = b.strip()
+        barcode_range = kit_barcode_range_pattern.fullmatch(b)
+        barcode = kit_barcode_pattern.fullmatch(b)
+        if barcode_range:
+            first, last = sorted((int(barcode_range.group(1)), int(barcode_range.group(2))))
+            barcode_set.update('barcode{:02d}'.format(i) for i in range(first, last + 1))
+        elif barcode:
+            barcode_set.add('barcode{:02d}'.format(int(barcode.group(1))))
+        elif b:
+            barcode_set.add(b)
+
+    return sorted(barcode_set, key=barcode_sort_key)
+
+
+def barcode_sort_key(barcode: str):
+    """
+    Key to sort barcode names by their numbers, barcode100 being after barcode99
+    :param barcode: name of the barcode
+    :return: a tuple to compare
+    """
+    return tuple((0, int(s), '') if s.isdigit() else (1, 0, s) for s in re.split(r'(\d+)', barcode) if s)
+
+
+def sort_barcode_index(series):
+    """
+    Sort a Pandas Series indexed by barcode names by barcode number
+    :param series: Pandas Series indexed by barcode names
+    :return: the sorted Pandas Series
+    """
+    return series.reindex(sorted(series.index, key=barcode_sort_key))
+
+
+def group_other_barcodes(barcodes, barcode_selection):
+    """
+    Replace the barcodes that are not in barcode_selection by 'other barcodes'. Only the codes of the categorical
+    are mapped, the names of the barcodes are not compared read by read
+    :param barcodes: categorical Pandas Series of barcodes
+    :param barcode_selection: list of the selected barcodes
+    :return: a categorical Pandas Series with sorted categories that are all used
+    """
+    categories = barcodes.cat.categories
+    barcode_selection = set(barcode_selection)
+    names = np.array([c if c in barcode_selection else 'other barcodes' for c in categories], dtype=object)
+    new_categories, category_codes = np.unique(names, return_inverse=True)
+
+    codes = barcodes.cat.codes.values
+    # Keep the missing values (code -1)
+    new_codes = np.where(codes < 0, -1, category_codes[codes]) if len(categories) > 0 else codes
+
+    result = pd.Categorical.from_codes(new_codes, categories=new_categories)
+    return pd.Series(result, index=barcodes.index, name=barcodes.name).cat.remove_unused_categories()
+
+
 def extract_barcode_info(extractor, result_dict, barcode_selection, dataframe_dict, df):
     """
     :param result_dict:
@@ -117,10 +376,8 @@ def extract_barcode_info(extractor, result_dict, barcode_selection, dataframe_di
     if "unclassified" not in barcode_selection:
         barcode_selection.append("unclassified")
 
-    # Create keys barcode.arrangement, and read.pass/fail.barcode in dataframe_dict with all values of
+    # Create keys read.pass/fail.barcode in dataframe_dict with all values of
     # column barcode_arrangement when reads are passed/failed
-    dataframe_dict["barcode.arrangement"] = df["barcode_arrangement"]
-
     # Get barcodes frequency by read type
     series_read_pass_barcode = series_cols_boolean_elements(df, "barcode_arrangement",
                                                             "passes_filtering", True)
@@ -149,93 +406,55 @@ def extract_barcode_info(extractor, result_dict, barcode_selection, dataframe_di
                      (read_fail_barcoded_count / total_reads) * 100)
 
     # Replaces all rows with unused barcodes (ie not in barcode_selection) in column barcode_arrangement with the 'other' value
-    df.loc[~df['barcode_arrangement'].isin(
-        barcode_selection), 'barcode_arrangement'] = 'other barcodes'
+    df['barcode_arrangement'] = group_other_barcodes(df['barcode_arrangement'], barcode_selection)
+
+    # Create key barcode.arrangement in dataframe_dict with all values of column barcode_arrangement
+    dataframe_dict["barcode.arrangement"] = df["barcode_arrangement"]
 
     if 'other barcodes' not in barcode_selection:
         barcode_selection.append('other barcodes')
 
-    # Create dataframes filtered by barcodes and read quality
-    for index_barcode, barcode in enumerate(barcode_selection):
-        barcode_all_reads_df = df[df['barcode_arrangement'] == barcode]
-        barcode_pass_reads_df = barcode_all_reads_df.loc[df['passes_filtering'] == bool(True)]
-        barcode_fail_reads_df = barcode_all_reads_df.loc[df['passes_filtering'] == bool(False)]
+    # Values and statistics of the reads of each barcode by read quality, computed for all the barcodes at once
+    length_groups, length_statistics = barcode_read_groups(df, 'sequence_length', barcode_selection)
+    qscore_groups, qscore_statistics = barcode_read_groups(df, 'mean_qscore', barcode_selection)
 
-        # Add all barcode statistics to result_dict based on values of selected dataframes
+    for barcode in barcode_selection:
+        # Add all barcode statistics to result_dict
         _barcode_stats(extractor,
                        result_dict,
-                       barcode_all_reads_df,
-                       barcode_pass_reads_df,
-                       barcode_fail_reads_df,
+                       length_groups,
+                       length_statistics,
+                       qscore_statistics,
                        barcode)
 
-    # Add filtered dataframes (all info by barcode and by length or qscore) to dataframe_dict
-    _barcode_selection_dataframe(dataframe_dict, df, "sequence_length",
-                                 "barcode_selection_sequence_length_dataframe",
-                                 "length")
-    _barcode_selection_dataframe(dataframe_dict, df, "mean_qscore",
-                                 "barcode_selection_sequence_phred_dataframe",
-                                 "qscore")
-
+    # Add the values of the reads grouped by barcode and read type to dataframe_dict for the boxplots, the groups are
+    # slices of a single array so the memory used does not depend on the number of barcodes
+    dataframe_dict["barcode.sequence.length.groups"] = length_groups
+    dataframe_dict["barcode.mean.qscore.groups"] = qscore_groups
 
-def _barcode_selection_dataframe(dataframe_dict, df, df_column_name: str, df_key_name: str,
-                                 melted_column_name: str):
-    """
-    Create custom dataframes by grouping all reads per barcodes and per read type (pass/fail) for read length or phred score info
-    Reshape the dataframes from wide to long format to display barcode, read type and read length or phred score per read
-    These dataframes are used for sequence length and qscore boxplots
-    :param key: string name to put in dataframe_dict
-    :param df_column_name: name of the dataframe_1d column used for the new barcode_selection_dataframes
-    :param melted_column_name: value (qscore or length) to use for renaming column of melted dataframe
-    """
-    # Count total number of rows
-    nrows = df.shape[0]
-    # Create a new dataframe with 3 columns : 'passes_filtering', 'barcode_arrangement' and the column name parameter
-    filtered_df = df.filter(
-        items=['passes_filtering', df_column_name, 'barcode_arrangement'])
-
-    # Reshape dataframe with new MultiIndex : numbered index of df length + passes filtering index and then shape data by barcode
-    barcode_selection_dataframe = filtered_df.set_index([pd.RangeIndex(start=0, stop=nrows), 'passes_filtering'],
-                                                        drop=True).pivot(columns="barcode_arrangement")
-
-    # Remove the column parameter index
-    barcode_selection_dataframe.columns.droplevel(level=0)
-
-    # Remove sequence_length Multindex to only have barcode_arrangement column labels
-    barcode_selection_dataframe.columns = barcode_selection_dataframe.columns.droplevel(
-        level=0)
 
-    # Reset index to have all labels in the same level
-    barcode_selection_dataframe.reset_index(
-        level='passes_filtering', inplace=True)
-
-    # Add final dataframe to dataframe_dict
-    dataframe_dict[df_key_name] = barcode_selection_dataframe
-
-
-def _barcode_stats(extractor, result_dict, barcode_selected_dataframe, barcode_selected_read_pass_dataframe,
-                   barcode_selected_read_fail_dataframe, barcode_name):
+def _barcode_stats(extractor, result_dict, length_groups, length_statistics, qscore_statistics, barcode_name):
     """
     :param result_dict:
-    :param prefix: report.data id of the extractor (string)
-    :param barcode_selected: barcode filtered dataframes
-    Put statistics (with describe method) about barcode length and qscore in result_dict for each selected dataframe : all.read/read.pass and read.fail
+    :param length_groups: sorted lengths of the reads by read type and barcode
+    :param length_statistics: statistics of the lengths of the reads by read type and barcode
+    :param qscore_statistics: statistics of the qscores of the reads by read type and barcode
+    Put statistics (like describe method) about barcode length and qscore in result_dict for each read type : all.read/read.pass and read.fail
     N.b. does not include count statistic for qscore
     """
-    df_dict = {'all.read.': barcode_selected_dataframe,
-               'read.pass.': barcode_selected_read_pass_dataframe,
-               'read.fail.': barcode_selected_read_fail_dataframe}
+    read_types = {'all.read.': 'all',
+                  'read.pass.': 'pass',
+                  'read.fail.': 'fail'}
+
+    for df_name, read_type in read_types.items():  # all.read/read.pass/read.fail
+        statistics_dict(extractor, result_dict, length_statistics.loc[(read_type, barcode_name)],
+                        df_name + barcode_name.replace(' ', '.') + '.length', count=True)
 
-    for df_name, df in df_dict.items():  # df_dict.items = all.read/read.pass/read.fail
-        for stats_index, stats_value in df['sequence_length'].describe().items():
-            key_to_result_dict = df_name + barcode_name.replace(' ', '.') + '.length.' + stats_index
-            set_result_value(extractor,
-                             result_dict, key_to_result_dict, stats_value)
+        statistics_dict(extractor, result_dict, qscore_statistics.loc[(read_type, barcode_name)],
+                        df_name + barcode_name + '.qscore')
 
-        for stats_index, stats_value in df['mean_qscore'].describe().drop('count').items():
-            key_to_result_dict = df_name + barcode_name + '.qscore.' + stats_index
-            set_result_value(extractor,
-                             result_dict, key_to_result_dict, stats_value)
+        nxx_dict(extractor, result_dict, compute_nxx(length_groups[(read_type, barcode_name)], is_sorted=True),
+                 df_name + barcode_name.replace(' ', '.') + '.length.')
 
 
 def _barcode_frequency(extractor, barcode_selection, result_dict, entry: str, df_filtered) -> pd.Series:
@@ -248,13 +467,12 @@ def _barcode_frequency(extractor, barcode_selection, result_dict, entry: str, df
     :param prefix: key prefix
     :return: Series with all barcodes (used, non used, and unclassified) frequencies
     """
-    # Regroup all barcoded read in Series
+    # Regroup all barcoded read in Series, counted on the codes of the categorical barcodes
     all_barcode_count = df_filtered.value_counts()
+    all_barcode_count.index = all_barcode_count.index.astype(str)
 
-    # Sort by list of barcode_selection
-    count_sorted = all_barcode_count.sort_index()[barcode_selection]
-    # Replace all NaN values to zero
-    count_sorted.fillna(0, downcast='int16', inplace=True)
+    # Sort by list of barcode_selection, the barcodes without reads have a zero count
+    count_sorted = all_barcode_count.reindex(barcode_selection, fill_value=0)
 
     # Compute sum of all used barcodes without barcode 'unclassified'
     set_result_value(extractor, result_dict, entry + '.count', sum(count_sorted.drop("unclassified")))
@@ -270,12 +488,12 @@ def _barcode_frequency(extractor, barcode_selection, result_dict, entry: str, df
     other_all_barcode_count = pd.Series(other_barcode_count, index=['other barcodes'])
 
     # Append Series of non-used barcode counts to the Series of barcode_selection counts
-    count_sorted = count_sorted.append(other_all_barcode_count).sort_index()
+    count_sorted = sort_barcode_index(count_sorted.append(other_all_barcode_count))
 
     # Compute frequency for all barcode counts and save into dataframe_dict
-    for barcode in count_sorted.to_dict():
-        frequency_value = count_sorted[barcode] * 100 / sum(count_sorted)
+    total_count = count_sorted.sum()
+    for barcode, count in count_sorted.items():
         set_result_value(extractor, result_dict, entry.replace(".barcoded", ".") + barcode + ".frequency",
-                         frequency_value)
+                         count * 100 / total_count)
 
     return count_sorted
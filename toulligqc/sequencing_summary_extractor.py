@@ -27,18 +27,104 @@
 
 import re
 
-import numpy as np
 import pandas as pd
 
 from toulligqc import plotly_graph_generator as pgg
+from toulligqc.input_catalog import InputCatalog
+from toulligqc.sequencing_summary_aggregator import ChannelTable
+from toulligqc.sequencing_summary_aggregator import TimeBinCube
+from toulligqc.sequencing_summary_aggregator import Histogram
+from toulligqc.sequencing_summary_column_store import get_column_store
 from toulligqc.sequencing_summary_common import check_result_values
 from toulligqc.sequencing_summary_common import count_boolean_elements
-from toulligqc.sequencing_summary_common import describe_dict
+from toulligqc.sequencing_summary_common import describe_read_groups
 from toulligqc.sequencing_summary_common import get_result_value
+from toulligqc.sequencing_summary_common import nxx_dict
 from toulligqc.sequencing_summary_common import series_cols_boolean_elements
 from toulligqc.sequencing_summary_common import set_result_value
 from toulligqc.sequencing_summary_common import sorted_series_boolean_elements_divided
+from toulligqc.sequencing_summary_common import statistics_dict
 from toulligqc.sequencing_summary_common import extract_barcode_info
+from toulligqc.sequencing_summary_reader import get_cache
+from toulligqc.sequencing_summary_reader import concat_dataframes
+from toulligqc.sequencing_summary_reader import get_parser
+from toulligqc.sequencing_summary_reader import get_threads
+from toulligqc.sequencing_summary_reader import is_parser_available
+from toulligqc.sequencing_summary_reader import read_header
+from toulligqc.sequencing_summary_reader import read_id_key_columns
+from toulligqc.sequencing_summary_reader import read_summary_file
+from toulligqc.sequencing_summary_reader import read_summary_files
+from toulligqc.sequencing_summary_reader import sample_summary_file
+from toulligqc.sequencing_summary_schema import column_datatypes
+from toulligqc.sequencing_summary_schema import fill_missing_values
+from toulligqc.sequencing_summary_schema import get_datatypes
+from toulligqc.sequencing_summary_schema import memory_usage
+
+# Columns of the sequencing summary files used by the extractor and their types
+summary_columns = ['channel', 'start_time',
+                   'passes_filtering',
+                   'sequence_length_template',
+                   'mean_qscore_template',
+                   'duration']
+
+summary_datatypes = get_datatypes(summary_columns)
+
+# If barcoding files are provided, merging of dataframes must be done on read_id column,
+# loaded as two 64-bit integer keys
+barcoding_summary_columns = ['read_id', 'barcode_arrangement']
+
+barcoding_summary_datatypes = get_datatypes(barcoding_summary_columns)
+
+# Outputs of the extractor and the columns of the sequencing summary files they need.
+# Only the columns of the requested outputs are parsed
+output_columns = {
+    'counts': ['passes_filtering'],
+    'yield': ['sequence_length_template'],
+    'n50': ['sequence_length_template'],
+    'run.time': ['start_time'],
+    'channels': ['channel'],
+    'length': ['passes_filtering', 'sequence_length_template'],
+    'qscore': ['passes_filtering', 'mean_qscore_template'],
+    'barcodes': ['passes_filtering', 'sequence_length_template', 'mean_qscore_template'],
+    'graphs': summary_columns}
+
+
+def get_outputs(config_dictionary):
+    """
+    Get the outputs to compute from the configuration. The graphs need all the statistics and the barcode
+    statistics need the read counts
+    :param config_dictionary: configuration dictionary
+    :return: the list of the names of the outputs, by default all the outputs
+    """
+    if 'outputs' not in config_dictionary or not config_dictionary['outputs']:
+        return list(output_columns)
+
+    outputs = [o.strip() for o in config_dictionary['outputs'].split(',') if o.strip()]
+    if 'graphs' in outputs:
+        return list(output_columns)
+    if 'barcodes' in outputs and 'counts' not in outputs:
+        outputs.append('counts')
+    return outputs
+
+
+def get_preview(config_dictionary):
+    """
+    Get the number of reads to sample in preview mode from the configuration
+    :param config_dictionary: configuration dictionary
+    :return: the number of reads or None if the preview mode is not enabled
+    """
+    if 'preview' in config_dictionary and config_dictionary['preview']:
+        return int(config_dictionary['preview'])
+    return None
+
+
+def get_output_columns(outputs):
+    """
+    Get the columns of the sequencing summary files needed by outputs
+    :param outputs: list of the names of the outputs
+    :return: the list of the columns, in the order of summary_columns
+    """
+    return [c for c in summary_columns if any(c in output_columns[o] for o in outputs if o in output_columns)]
 
 
 class SequencingSummaryExtractor:
@@ -47,22 +133,34 @@ class SequencingSummaryExtractor:
     The data is extracted from dataframes and placed in the result_dict in the form of key-value pairs
     """
 
-    def __init__(self, config_dictionary):
+    def __init__(self, config_dictionary, catalog=None, outputs=None):
         """
         Constructor that initialize the values of the config_dictionary and check in the case of 1 argument in 
         sequencing_summary_source if the path points to a file, the others cases are managed in check_conf 
         and _load_sequencing_summary_data methods
         :param config_dictionary: dictionary containing all files or directories paths for sequencing_summary.txt and barcoding files
+        :param catalog: InputCatalog object shared by the extractors of the run, a new one is created if None
+        :param outputs: list of the outputs to compute, by default the outputs of the configuration
         """
         self.config_dictionary = config_dictionary
-        self.sequencing_summary_source = self.config_dictionary['sequencing_summary_source']
+        self.catalog = catalog if catalog is not None else InputCatalog()
+        # The merge command has no sequencing summary source, its reads are the ones of partial result files
+        self.sequencing_summary_source = config_dictionary['sequencing_summary_source'] \
+            if 'sequencing_summary_source' in config_dictionary else ''
         self.result_directory = config_dictionary['result_directory']
-        self.sequencing_summary_files = self.sequencing_summary_source.split('\t')
+        self.sequencing_summary_files = self.catalog.expand_sources(self.sequencing_summary_source.split('\t'))
+        self.parser = get_parser(config_dictionary)
+        self.cache = get_cache(config_dictionary)
+        self.threads = get_threads(config_dictionary)
+        self.column_store = get_column_store(config_dictionary)
+        self.outputs = outputs if outputs is not None else get_outputs(config_dictionary)
+        self.summary_columns = get_output_columns(self.outputs)
+        self.preview = get_preview(config_dictionary)
 
         self.is_barcode = False
-        if config_dictionary['barcoding'] == 'True':
+        if config_dictionary['barcoding'] == 'True' and 'barcodes' in self.outputs:
             for f in self.sequencing_summary_files:
-                if self._is_barcode_file(f) or self._is_sequencing_summary_with_barcodes(f):
+                if self.catalog.is_barcode_file(f) or self.catalog.is_sequencing_summary_with_barcodes(f):
                     self.is_barcode = True
 
     def check_conf(self):
@@ -74,35 +172,72 @@ class SequencingSummaryExtractor:
         if not self.sequencing_summary_files[0]:
             return False, "No file has been defined"
 
+        for output in self.outputs:
+            if output not in output_columns:
+                return False, "Unknown output " + output + ", valid outputs are: " + ", ".join(output_columns)
+
+        if self.preview is not None and self.preview <= 0:
+            return False, "The number of reads of the preview must be positive"
+
+        if not is_parser_available(self.parser):
+            return False, "The " + self.parser + " parser is not available"
+
+        if self.cache is not None and not self.cache.is_available():
+            return False, "The cache of parsed files requires the pyarrow package"
+
         found = False
         while not found:
             for f in self.sequencing_summary_files:
                 try:
-                    if self._is_sequencing_summary_file(f) or self._is_sequencing_summary_with_barcodes(f):
+                    if self._is_summary_file(f):
                         found = True
                 except FileNotFoundError:
                     return False, "No such file or directory " + f
+                except IOError as e:
+                    return False, str(e)
             break
 
         if not found:
             return False, "No sequencing summary file has been found"
         return True, ""
 
+    def _is_summary_file(self, f):
+        """
+        Check if a file is a sequencing summary file, with or without barcodes
+        :param f: path of the file
+        :return: True if the file is a sequencing summary file
+        """
+        return self.catalog.is_sequencing_summary_file(f) or self.catalog.is_sequencing_summary_with_barcodes(f)
+
     def init(self):
         """
         Creation of the dataframe containing all info from sequencing_summary.txt
         :return: Panda's Dataframe object
         """
-        self.dataframe_1d = self._load_sequencing_summary_data()
+        self.dataframe_1d = None
+
+        # A sample of the reads is never saved in the column store
+        column_store = self.column_store if self.preview is None else None
+        if column_store is not None:
+            self.dataframe_1d = column_store.load(self.sequencing_summary_files, self._loaded_datatypes())
+
+        if self.dataframe_1d is None:
+            self.dataframe_1d = self._load_sequencing_summary_data()
+
+            # Rename 'sequence_length_template' and 'mean_qscore_template'
+            self.dataframe_1d.rename(columns={'sequence_length_template': 'sequence_length',
+                                              'mean_qscore_template': 'mean_qscore'}, inplace=True)
+
+            # Replace all NaN values to avoid data manipulation errors when columns are not the same length
+            fill_missing_values(self.dataframe_1d)
+
+            if column_store is not None:
+                column_store.save(self.sequencing_summary_files, self._loaded_datatypes(), self.dataframe_1d)
+
         if self.dataframe_1d.empty:
             raise pd.errors.EmptyDataError("Dataframe is empty")
 
-        # Rename 'sequence_length_template' and 'mean_qscore_template'
-        self.dataframe_1d.rename(columns={'sequence_length_template': 'sequence_length',
-                                          'mean_qscore_template': 'mean_qscore'}, inplace=True)
-
-        # Replace all NaN values by 0 to avoid data manipulation errors when columns are not the same length
-        self.dataframe_1d = self.dataframe_1d.fillna(0)
+        self.memory_usage = memory_usage(self.dataframe_1d)
 
         # Dictionary for storing all pd.Series and pd.Dataframe entries
         self.dataframe_dict = {}
@@ -137,6 +272,78 @@ class SequencingSummaryExtractor:
 
         self._fill_series_dict(self.dataframe_dict, self.dataframe_1d)
 
+        if 'counts' in self.outputs:
+            self._read_count_dict(result_dict)
+
+        # Yield, n50, run time
+        if 'yield' in self.outputs:
+            set_result_value(self, result_dict, "yield", int(self._length_histograms()['all'].sum))
+
+        if 'n50' in self.outputs:
+            nxx = self._length_histograms()['all'].nxx_values()
+            set_result_value(self, result_dict, "n50", nxx[50][0])
+            set_result_value(self, result_dict, "l50", nxx[50][1])
+
+            # Other NXX and LXX values
+            nxx_dict(self, result_dict, nxx, '')
+
+        if 'run.time' in self.outputs:
+            set_result_value(self, result_dict, "run.time", float(max(self.dataframe_1d['start_time'])))
+
+        # Get channel occupancy statistics and store each value into result_dict
+        if 'channels' in self.outputs:
+            for index, value in self._occupancy_channel().items():
+                set_result_value(self,
+                    result_dict, "channel.occupancy.statistics." + index, value)
+
+        if 'length' in self.outputs:
+            # Get statistics about all, pass and fail reads length and store each value into result_dict
+            length_histograms = self._length_histograms()
+            length_statistics = pd.DataFrame({t: length_histograms[t].describe() for t in ('all', 'pass', 'fail')})
+
+            # The standard deviation is computed on the lengths (in linear time) to get the same rounding as pandas
+            for t in ('all', 'pass', 'fail'):
+                length_statistics.loc['std', t] = self.dataframe_dict[t + ".reads.sequence.length"].std()
+            self.dataframe_dict["sequence.length.statistics"] = length_statistics
+
+            statistics_dict(self, result_dict, length_statistics['all'], "all.read.length", count=True)
+
+            # Add statistics (without count) about read pass/fail length in the result_dict
+            statistics_dict(self, result_dict, length_statistics['pass'], "pass.reads.sequence.length")
+            statistics_dict(self, result_dict, length_statistics['fail'], "fail.reads.sequence.length")
+
+            # NXX and LXX values of the pass/fail reads
+            nxx_dict(self, result_dict, length_histograms['pass'].nxx_values(), "pass.reads.sequence.length.")
+            nxx_dict(self, result_dict, length_histograms['fail'].nxx_values(), "fail.reads.sequence.length.")
+
+        if 'qscore' in self.outputs:
+            # Get Qscore statistics without count value and store them into result_dict
+            qscore_statistics = describe_read_groups(self.dataframe_1d, 'mean_qscore')
+            self.dataframe_dict["mean.qscore.statistics"] = qscore_statistics
+
+            statistics_dict(self, result_dict, qscore_statistics['all'], "all.read.qscore")
+
+            # Add statistics (without count) about read pass/fail qscore in the result_dict
+            statistics_dict(self, result_dict, qscore_statistics['pass'], "pass.reads.mean.qscore")
+            statistics_dict(self, result_dict, qscore_statistics['fail'], "fail.reads.mean.qscore")
+
+        # Memory used by the columns of the dataframe
+        self._memory_usage_dict(result_dict)
+
+        # In preview mode, the statistics are estimated from a sample of the reads
+        if self.preview is not None:
+            self._preview_dict(result_dict)
+
+        if self.is_barcode:
+            extract_barcode_info(self, result_dict,
+                                 self.barcode_selection,
+                                 self.dataframe_dict,
+                                 self.dataframe_1d)
+
+    def _read_count_dict(self, result_dict):
+        """
+        Set the read counts, ratios and frequencies per type read (pass or fail) in the result_dict
+        """
         # Read count
         set_result_value(self, result_dict, "read.count", len(self.dataframe_1d))
 
@@ -169,90 +376,103 @@ class SequencingSummaryExtractor:
         set_result_value(self,
             result_dict, "read.fail.frequency", read_fail_frequency)
 
-        # Yield, n50, run time
-        set_result_value(self, result_dict, "yield", sum(self.dataframe_dict["all.reads.sequence.length"]))
-
-        set_result_value(self, result_dict, "n50", self._compute_NXX(50))
-        set_result_value(self, result_dict, "l50", self._compute_LXX(50))
-
-        set_result_value(self, result_dict, "run.time", max(self.dataframe_1d['start_time']))
-
-        # Get channel occupancy statistics and store each value into result_dict
-        for index, value in self._occupancy_channel().items():
-            set_result_value(self,
-                result_dict, "channel.occupancy.statistics." + index, value)
-
-        # Get statistics about all reads length and store each value into result_dict
-        sequence_length_statistics = self.dataframe_dict["all.reads.sequence.length"].describe()
-
-        for index, value in sequence_length_statistics.items():
-            set_result_value(self,
-                result_dict, "all.read.length." + index, value)
-
-        # Add statistics (without count) about read pass/fail length in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.sequence.length"], "pass.reads.sequence.length")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.sequence.length"], "fail.reads.sequence.length")
-
-        # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe_1d['mean_qscore'].describe().drop(
-            "count")
-
-        for index, value in qscore_statistics.items():
-            set_result_value(self,
-                result_dict, "all.read.qscore." + index, value)
-
-        # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+    def _preview_dict(self, result_dict):
+        """
+        Set the size of the sample of the reads and the estimations of the count-based statistics of all the reads
+        in the result_dict
+        """
+        sample_read_count = len(self.dataframe_1d)
+        set_result_value(self, result_dict, "preview", True)
+        set_result_value(self, result_dict, "preview.sample.read.count", sample_read_count)
+
+        if self.estimated_read_count is None:
+            return
+
+        ratio = self.estimated_read_count / sample_read_count
+        set_result_value(self, result_dict, "preview.estimated.read.count", self.estimated_read_count)
+        if 'yield' in self.outputs:
+            set_result_value(self, result_dict, "preview.estimated.yield",
+                             int(round(get_result_value(self, result_dict, "yield") * ratio)))
+        if 'n50' in self.outputs:
+            set_result_value(self, result_dict, "preview.estimated.l50",
+                             int(round(get_result_value(self, result_dict, "l50") * ratio)))
+
+    def _memory_usage_dict(self, result_dict):
+        """
+        Set the number of bytes used by each column of the reads in the result_dict
+        """
+        for column, size in self.memory_usage.items():
+            set_result_value(self, result_dict, "memory.usage." + column, size)
+        set_result_value(self, result_dict, "memory.usage.total", sum(self.memory_usage.values()))
 
-        if self.is_barcode:
-            extract_barcode_info(self, result_dict,
-                                 self.barcode_selection,
-                                 self.dataframe_dict,
-                                 self.dataframe_1d)
+    def _length_histograms(self):
+        """
+        Get the histograms of the lengths of all, pass and fail reads, computed once. The statistics computed from
+        the histograms are exact and the same as the ones computed by pandas, without sorting the lengths
+        :return: a dictionary with the Histogram objects of the 'all', 'pass' and 'fail' reads, only of the 'all'
+        reads when the passes_filtering column has not been loaded (e.g. yield and n50 outputs)
+        """
+        if "sequence.length.histograms" not in self.dataframe_dict:
+            lengths = self.dataframe_1d['sequence_length'].values
+            if 'passes_filtering' not in self.dataframe_1d:
+                self.dataframe_dict["sequence.length.histograms"] = {'all': Histogram.from_values(lengths)}
+                return self.dataframe_dict["sequence.length.histograms"]
+
+            passes_filtering = self.dataframe_1d['passes_filtering'].values
+            histograms = {'pass': Histogram.from_values(lengths[passes_filtering]),
+                          'fail': Histogram.from_values(lengths[~passes_filtering]),
+                          'all': Histogram()}
+            histograms['all'].merge(histograms['pass'])
+            histograms['all'].merge(histograms['fail'])
+            self.dataframe_dict["sequence.length.histograms"] = histograms
+
+        return self.dataframe_dict["sequence.length.histograms"]
 
     def _fill_series_dict(self, df_dict, df):
-
+        """
+        Fill the dictionary of the Series of the reads with the columns that have been loaded
+        """
         for read_type in ['pass', 'fail']:
             read_type_bool = True if read_type == 'pass' else False
 
             # Read length series
-            df_dict[read_type + '.reads.sequence.length'] = series_cols_boolean_elements(df,
-                                                                                          'sequence_length',
-                                                                                          'passes_filtering',
-                                                                                          read_type_bool)
+            if 'passes_filtering' in df and 'sequence_length' in df:
+                df_dict[read_type + '.reads.sequence.length'] = series_cols_boolean_elements(df,
+                                                                                              'sequence_length',
+                                                                                              'passes_filtering',
+                                                                                              read_type_bool)
 
             # Read qscore series
-            df_dict[read_type + '.reads.mean.qscore'] = series_cols_boolean_elements(df,
-                                                                                          'mean_qscore',
-                                                                                          'passes_filtering',
-                                                                                          read_type_bool)
-
-        # Read length series
-        df_dict["all.reads.sequence.length"] = df['sequence_length']
-
-        # Mean QScore
-        df_dict["all.reads.mean.qscore"] = df['mean_qscore']
-
-        # Channel series
-        df_dict["all.reads.channel"] = df['channel']
-
-        # Time series
-        df_dict["all.reads.start.time"] = df['start_time']
-
-        # Duration series
-        df_dict["all.reads.duration"] = df['duration']
+            if 'passes_filtering' in df and 'mean_qscore' in df:
+                df_dict[read_type + '.reads.mean.qscore'] = series_cols_boolean_elements(df,
+                                                                                              'mean_qscore',
+                                                                                              'passes_filtering',
+                                                                                              read_type_bool)
+
+        for key, column in (("all.reads.sequence.length", 'sequence_length'),
+                            ("all.reads.mean.qscore", 'mean_qscore'),
+                            ("all.reads.channel", 'channel'),
+                            ("all.reads.start.time", 'start_time'),
+                            ("all.reads.duration", 'duration')):
+            if column in df:
+                df_dict[key] = df[column]
 
     def graph_generation(self, result_dict):
         """
         Generation of the different graphs containing in the plotly_graph_generator module
         :return: images array containing the title and the path toward the images
         """
+        if 'graphs' not in self.outputs:
+            return []
+
+        # The yield and over time graphs share the aggregates of the reads by time bin
+        self._time_bin_cube()
+
         images_directory = self.result_directory + '/images'
         images = list()
         images.append(pgg.read_count_histogram(result_dict, images_directory))
         images.append(pgg.read_length_scatterplot(self.dataframe_dict, images_directory))
-        images.append(pgg.yield_plot(self.dataframe_1d, images_directory))
+        images.append(pgg.yield_plot(self.dataframe_dict, images_directory))
         images.append(pgg.read_quality_multiboxplot(self.dataframe_dict, images_directory))
         images.append(pgg.allphred_score_frequency(self.dataframe_dict, images_directory))
         images.append(pgg.plot_performance(self.dataframe_dict, images_directory))
@@ -298,8 +518,35 @@ class SequencingSummaryExtractor:
         Statistics about the channels of the flowcell
         :return: pd.Series object containing statistics about the channel occupancy without count value
         """
-        total_reads_per_channel = pd.value_counts(self.dataframe_dict["all.reads.channel"])
-        return pd.DataFrame.describe(total_reads_per_channel)
+        return self._channel_table().occupancy().describe()
+
+    def _channel_table(self):
+        """
+        Get the statistics of the reads of each channel, computed once with bincounts on the channel numbers
+        :return: a ChannelTable object
+        """
+        if "channel.table" not in self.dataframe_dict:
+            self.dataframe_dict["channel.table"] = ChannelTable.from_dataframe(self.dataframe_1d)
+        return self.dataframe_dict["channel.table"]
+
+    def _time_bin_cube(self):
+        """
+        Get the aggregates of the reads by time bin, read type and barcode, computed once in a single pass
+        :return: a TimeBinCube object
+        """
+        if "time.bins" not in self.dataframe_dict:
+            barcodes = self.dataframe_1d['barcode_arrangement'] if self.is_barcode else None
+            self.dataframe_dict["time.bins"] = TimeBinCube.from_dataframe(self.dataframe_1d, barcodes)
+        return self.dataframe_dict["time.bins"]
+
+    def _loaded_datatypes(self):
+        """
+        Get the types of all the columns that can be loaded from the sequencing summary and barcoding files
+        """
+        datatypes = get_datatypes(self.summary_columns)
+        if self.is_barcode:
+            datatypes.update(barcoding_summary_datatypes)
+        return datatypes
 
     def _load_sequencing_summary_data(self):
         """
@@ -312,109 +559,148 @@ class SequencingSummaryExtractor:
         summary_dataframe = None
         barcode_dataframe = None
 
-        sequencing_summary_columns = ['channel', 'start_time',
-                                      'passes_filtering',
-                                      'sequence_length_template',
-                                      'mean_qscore_template',
-                                      'duration']
-
-        sequencing_summary_datatypes = {
-            'channel': np.int16,
-            'start_time': np.float,
-            'passes_filtering': np.bool,
-            'sequence_length_template': np.uint32,
-            'mean_qscore_template': np.float,
-            'duration': np.float}
-
-        # If barcoding files are provided, merging of dataframes must be done on read_id column
-        barcoding_summary_columns = ['read_id', 'barcode_arrangement']
-
-        barcoding_summary_datatypes = {
-            'read_id': object,
-            'barcode_arrangement': object
-        }
+        # Only the columns needed by the outputs
+        sequencing_summary_columns = list(self.summary_columns)
+        sequencing_summary_datatypes = get_datatypes(self.summary_columns)
 
         try:
-            # If 1 file and it's a sequencing_summary.txt
-            if len(files) == 1 and self._is_sequencing_summary_file(files[0]):
-                return pd.read_csv(files[0], sep="\t", usecols=sequencing_summary_columns,
-                                   dtype=sequencing_summary_datatypes)
+            # If 1 file and it's a sequencing_summary.txt or barcodes are not needed
+            if len(files) == 1 and (self.catalog.is_sequencing_summary_file(files[0]) or not self.is_barcode):
+                return self._read_summary_files(
+                    [(files[0], sequencing_summary_columns, sequencing_summary_datatypes)])[0]
 
             # If 1 file and it's a sequencing_summary.txt with barcode info, load column barcode_arrangement
-            elif len(files) == 1 and self._is_sequencing_summary_with_barcodes(files[0]):
+            elif len(files) == 1 and self.catalog.is_sequencing_summary_with_barcodes(files[0]):
                 sequencing_summary_columns.append('barcode_arrangement')
                 sequencing_summary_datatypes.update(
-                    {'barcode_arrangement': object})
+                    {'barcode_arrangement': column_datatypes['barcode_arrangement']})
 
-                return pd.read_csv(files[0], sep="\t", usecols=sequencing_summary_columns,
-                                   dtype=sequencing_summary_datatypes)
+                return self._read_summary_files(
+                    [(files[0], sequencing_summary_columns, sequencing_summary_datatypes)])[0]
 
             # If multiple files, check if there's a barcoding one and a sequencing one :
+            barcode_files = []
+            summary_files = []
+            summary_with_barcodes_files = []
             for f in files:
 
-                # check for presence of barcoding files
-                if self._is_barcode_file(f):
-                    dataframe = pd.read_csv(
-                        f, sep="\t", usecols=barcoding_summary_columns, dtype=barcoding_summary_datatypes)
-                    if barcode_dataframe is None:
-                        barcode_dataframe = dataframe
-                    # if a barcoding file has already been read, append the 2 dataframes
-                    else:
-                        barcode_dataframe = barcode_dataframe.append(
-                            dataframe, ignore_index=True)
-
-                # check for presence of sequencing_summary file, if True add column read_id for merging with barcode dataframe
-                else:
-                    if self._is_sequencing_summary_file(f):
-                        sequencing_summary_columns.append('read_id')
-                        sequencing_summary_datatypes.update(
-                            {'read_id': object})
-
-                        dataframe = pd.read_csv(f, sep="\t", usecols=sequencing_summary_columns,
-                                                dtype=sequencing_summary_datatypes)
-                        if summary_dataframe is None:
-                            summary_dataframe = dataframe
-                        else:
-                            summary_dataframe = summary_dataframe.append(
-                                dataframe, ignore_index=True)
-
-            if barcode_dataframe is None:
-                # If no barcodes in files, no merged dataframes on column 'read_id'
-                return summary_dataframe.drop(columns=['read_id'])
-            else:
-                dataframes_merged = pd.merge(
-                    summary_dataframe, barcode_dataframe, on='read_id', how='left')
-                # delete column read_id after merging
-                del dataframes_merged['read_id']
-
-                return dataframes_merged
+                # check for presence of barcoding files, skipped if barcodes are not needed
+                if self.catalog.is_barcode_file(f):
+                    if self.is_barcode:
+                        barcode_files.append(f)
+
+                # check for presence of sequencing_summary file
+                elif self.catalog.is_sequencing_summary_file(f):
+                    summary_files.append(f)
+
+                # sequencing_summary files with barcode info (e.g. shards of a directory)
+                elif self.catalog.is_sequencing_summary_with_barcodes(f):
+                    summary_with_barcodes_files.append(f)
+
+            if len(summary_files) == 0 and len(summary_with_barcodes_files) == 0:
+                raise FileNotFoundError("No sequencing summary file has been found")
+
+            # The barcode arrangements of the sequencing summary files with barcodes are only loaded when needed
+            with_barcodes_columns = list(sequencing_summary_columns)
+            with_barcodes_datatypes = dict(sequencing_summary_datatypes)
+            if self.is_barcode:
+                with_barcodes_columns.append('barcode_arrangement')
+                with_barcodes_datatypes.update({'barcode_arrangement': column_datatypes['barcode_arrangement']})
+            with_barcodes_projections = [(f, with_barcodes_columns, with_barcodes_datatypes)
+                                         for f in summary_with_barcodes_files]
+
+            if len(barcode_files) == 0:
+                return self._concat_summary_dataframes(self._read_summary_files(
+                    [(f, sequencing_summary_columns, sequencing_summary_datatypes) for f in summary_files]
+                    + with_barcodes_projections))
+
+            # Add column read_id for merging with barcode dataframe
+            sequencing_summary_columns.append('read_id')
+            sequencing_summary_datatypes.update({'read_id': column_datatypes['read_id']})
+
+            # Parse all the files in parallel, then concatenate the dataframes of each type once
+            dataframes = self._read_summary_files(
+                [(f, sequencing_summary_columns, sequencing_summary_datatypes) for f in summary_files]
+                + with_barcodes_projections,
+                [(f, barcoding_summary_columns, barcoding_summary_datatypes) for f in barcode_files])
+            summary_count = len(summary_files)
+            with_barcodes_count = len(summary_with_barcodes_files)
+
+            if summary_count == 0:
+                # The barcoding files have no sequencing summary file to be merged with
+                return self._concat_summary_dataframes(dataframes[:with_barcodes_count])
+
+            summary_dataframe = concat_dataframes(dataframes[:summary_count])
+            barcode_dataframe = concat_dataframes(dataframes[summary_count + with_barcodes_count:])
+
+            dataframes_merged = pd.merge(
+                summary_dataframe, barcode_dataframe, on=read_id_key_columns(), how='left')
+            # delete the keys of column read_id after merging
+            dataframes_merged.drop(columns=read_id_key_columns(), inplace=True)
+
+            return self._concat_summary_dataframes(
+                [dataframes_merged] + dataframes[summary_count:summary_count + with_barcodes_count])
 
-        except IOError:
+        except FileNotFoundError:
             raise FileNotFoundError("Sequencing summary file not found")
 
-    def _compute_NXX(self, x):
-        """Compute NXX value of total sequence length"""
-        data = self.dataframe_dict["all.reads.sequence.length"].dropna().values
-        data.sort()
-        half_sum = data.sum() * x / 100
-        cum_sum = 0
-        for v in data:
-            cum_sum += v
-            if cum_sum >= half_sum:
-                return int(v)
-
-    def _compute_LXX(self, x):
-        """Compute LXX value of total sequence length"""
-        data = self.dataframe_dict["all.reads.sequence.length"].dropna().values
-        data.sort()
-        half_sum = data.sum() * x / 100
-        cum_sum = 0
-        count = 0
-        for v in data:
-            cum_sum += v
-            count += 1
-            if cum_sum >= half_sum:
-                return count
+    @staticmethod
+    def _concat_summary_dataframes(dataframes):
+        """
+        Concatenate the dataframes of sequencing summary files with and without barcode arrangements, the reads of
+        the files without barcode arrangements have no barcode arrangement
+        :param dataframes: list of Pandas Dataframe objects
+        :return: a Pandas Dataframe object
+        """
+        if any('barcode_arrangement' in df for df in dataframes):
+            for i, df in enumerate(dataframes):
+                if 'barcode_arrangement' not in df:
+                    dataframes[i] = df.assign(barcode_arrangement=pd.Categorical([None] * len(df)))
+        return concat_dataframes(dataframes)
+
+    def _read_summary_files(self, summary_projections, barcode_projections=()):
+        """
+        Parse sequencing summary and barcoding files in parallel. In preview mode, only a sample of the reads of the
+        sequencing summary files is read, the barcoding files are read entirely to get the barcodes of the sample
+        :param summary_projections: list of tuples with the path of a sequencing summary file, the list of its
+        columns and the dictionary of their types to load
+        :param barcode_projections: list of tuples with the same values for the barcoding files
+        :return: a list of Pandas Dataframe objects in the same order as the files
+        """
+        if self.preview is None:
+            return read_summary_files(list(summary_projections) + list(barcode_projections),
+                                      self.parser, self.cache, self.threads)
+
+        return self._sample_summary_files(summary_projections) + \
+            read_summary_files(list(barcode_projections), self.parser, self.cache, self.threads)
+
+    def _sample_summary_files(self, file_projections):
+        """
+        Read a random sample of about preview reads of sequencing summary files. The sample of each file is
+        proportional to its estimated number of reads, the files with less reads are read entirely.
+        The estimated number of reads of all the files is set in the estimated_read_count attribute
+        :return: a list of Pandas Dataframe objects in the same order as the files
+        """
+        line_counts = [self.catalog.get(f).line_count for f, columns, datatypes in file_projections]
+        if None in line_counts:
+            # The number of lines of some files cannot be estimated, the samples are proportional to the file sizes
+            weights = [self.catalog.get(f).size for f, columns, datatypes in file_projections]
+        else:
+            weights = line_counts
+
+        result = []
+        read_counts = []
+        for (f, columns, datatypes), weight, line_count in zip(file_projections, weights, line_counts):
+            count = int(round(self.preview * weight / max(1, sum(weights))))
+            if line_count is not None and line_count <= count:
+                result.append(read_summary_file(f, columns, datatypes, self.parser))
+                read_counts.append(len(result[-1]))
+            else:
+                result.append(sample_summary_file(f, columns, datatypes, count))
+                read_counts.append(line_count)
+
+        self.estimated_read_count = None if None in read_counts else sum(read_counts)
+        return result
 
     @staticmethod
     def _is_barcode_file(filename):
@@ -424,8 +710,7 @@ class SequencingSummaryExtractor:
         :return: True if the filename is a barcoding summary file
         """
         try:
-            with open(filename, 'r') as f:
-                header = f.readline()
+            header = read_header(filename)
             return header.startswith('read_id') and 'barcode_arrangement' in header
         except FileNotFoundError:
             "No barcoding file was found"
@@ -438,8 +723,7 @@ class SequencingSummaryExtractor:
         :return: True if the file is indeed a sequencing summary file
         """
         try:
-            with open(filename, 'r') as f:
-                header = f.readline()
+            header = read_header(filename)
             return header.startswith('filename') and not 'barcode_arrangement' in header
         except IOError:
             raise FileNotFoundError
@@ -453,8 +737,7 @@ class SequencingSummaryExtractor:
         :return: True if the filename is a sequencing summary file with barcodes
         """
         try:
-            with open(filename, 'r') as f:
-                header = f.readline()
-                return header.startswith('filename') and 'barcode_arrangement' in header
+            header = read_header(filename)
+            return header.startswith('filename') and 'barcode_arrangement' in header
         except IOError:
             raise FileNotFoundError
@@ -27,11 +27,11 @@
 
 import re
 
-import numpy as np
 import pandas as pd
 
 from toulligqc import plotly_graph_generator as pgg
 from toulligqc import plotly_graph_onedsquare_generator as pgg2
+from toulligqc.sequencing_summary_aggregator import TimeBinCube
 from toulligqc.sequencing_summary_common import check_result_values
 from toulligqc.sequencing_summary_common import count_boolean_elements
 from toulligqc.sequencing_summary_common import describe_dict
@@ -40,6 +40,16 @@ from toulligqc.sequencing_summary_common import series_cols_boolean_elements
 from toulligqc.sequencing_summary_common import set_result_value
 from toulligqc.sequencing_summary_common import extract_barcode_info
 from toulligqc.sequencing_summary_extractor import SequencingSummaryExtractor as SSE
+from toulligqc.sequencing_summary_extractor import output_columns
+from toulligqc.sequencing_summary_reader import concat_dataframes
+from toulligqc.sequencing_summary_reader import read_header
+from toulligqc.sequencing_summary_reader import read_id_key_columns
+from toulligqc.sequencing_summary_reader import read_summary_file
+from toulligqc.sequencing_summary_reader import read_summary_files
+from toulligqc.sequencing_summary_schema import column_datatypes
+from toulligqc.sequencing_summary_schema import decimal_values
+from toulligqc.sequencing_summary_schema import fill_missing_values
+from toulligqc.sequencing_summary_schema import get_datatypes
 
 
 
@@ -48,25 +58,29 @@ class OneDSquareSequencingSummaryExtractor(SSE):
     Extraction of statistics from 1dsqr_sequencing_summary.txt file and graph generation
     """
 
-    def __init__(self, config_dictionary):
+    def __init__(self, config_dictionary, catalog=None):
         """
         Constructor that initialize the values of the config_dictionary and check in the case of 1 argument in
         sequencing_summary_source and seqencing_summary_1dsqr_source if the path points to a file,
         the others cases are managed in check_conf and _load_sequencing_summary_1dsqr_data
         :param config_dictionary: dictionary containing all files or directories paths for sequencing_summary, sequencing_1dsq_summary.txt and barcoding files
+        :param catalog: InputCatalog object shared by the extractors of the run, a new one is created if None
         """
-        super().__init__(config_dictionary)
-        self.sse = SSE(config_dictionary)
+        super().__init__(config_dictionary, catalog)
+        # The 1D² statistics are computed from all the columns of the 1D dataframe
+        self.sse = SSE(config_dictionary, self.catalog, list(output_columns))
+        # The 1D² reads are merged with all the 1D reads, the preview mode is not supported
+        self.sse.preview = None
         self.sequencing_summary_1dsqr_source = self.config_dictionary[
             'sequencing_summary_1dsqr_source']
-        self.sequencing_summary_1dsqr_files = self.sequencing_summary_1dsqr_source.split(
-            '\t')
+        self.sequencing_summary_1dsqr_files = self.catalog.expand_sources(
+            self.sequencing_summary_1dsqr_source.split('\t'))
 
         # overiding attribute .is_barcode
         self.is_barcode = False
         if config_dictionary['barcoding'] == 'True':
             for f in self.sequencing_summary_1dsqr_files:
-                if self._is_barcode_file(f) or self._is_sequencing_summary_with_barcodes(
+                if self.catalog.is_barcode_file(f) or self.catalog.is_sequencing_summary_with_barcodes(
                         f) or self._is_sequencing_summary_1dsqr_with_barcodes(
                         f):
                     self.is_barcode = True
@@ -85,12 +99,14 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         while not found:
             for f in self.sequencing_summary_1dsqr_files:
                 try:
-                    if self._is_sequencing_summary_1dsqr_file(
+                    if self.catalog.is_sequencing_summary_1dsqr_file(
                             f
                     ) or self._is_sequencing_summary_1dsqr_with_barcodes(f):
                         found = True
                 except FileNotFoundError:
                     return False, "No such file or directory " + f
+                except IOError as e:
+                    return False, str(e)
             break
         if not found:
             return False, "No 1D squared sequencing summary file has been found"
@@ -213,7 +229,7 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         describe_dict(self, result_dict, self.dataframe_dict_1dsqr["fail.reads.sequence.length"], "fail.reads.sequence.length")
 
         # Get Qscore statistics without count value and store them into result_dict
-        qscore_statistics = self.dataframe_1dsqr['mean_qscore'].describe().drop(
+        qscore_statistics = pd.Series(decimal_values(self.dataframe_1dsqr['mean_qscore'].values)).describe().drop(
             "count")
 
         for index, value in qscore_statistics.items():
@@ -221,8 +237,10 @@ class OneDSquareSequencingSummaryExtractor(SSE):
                 result_dict, "all.reads.mean.qscore." + index, value)
 
         # Add statistics (without count) about read pass/fail qscore in the result_dict
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["pass.reads.mean.qscore"], "pass.reads.mean.qscore")
-        describe_dict(self, result_dict, self.dataframe_dict_1dsqr["fail.reads.mean.qscore"], "fail.reads.mean.qscore")
+        describe_dict(self, result_dict, pd.Series(decimal_values(self.dataframe_dict_1dsqr["pass.reads.mean.qscore"].values)),
+                      "pass.reads.mean.qscore")
+        describe_dict(self, result_dict, pd.Series(decimal_values(self.dataframe_dict_1dsqr["fail.reads.mean.qscore"].values)),
+                      "fail.reads.mean.qscore")
 
         if self.is_barcode:
             extract_barcode_info(self,
@@ -256,6 +274,10 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         self.dataframe_dict_1dsqr["all.reads.start.time1"] = self.dataframe_1dsqr['start_time1']
         self.dataframe_dict_1dsqr["all.reads.duration"] = self.dataframe_1dsqr['duration']
 
+        # Aggregates of the 1D² reads by time bin for the yield and over time graphs
+        self.dataframe_dict_1dsqr["time.bins"] = TimeBinCube.from_dataframe(self.dataframe_1dsqr,
+                                                                          time_column='start_time1')
+
     def graph_generation(self, result_dict):
         """
         Generation of the differents graphs containing in the plotly_graph_generator modules
@@ -267,7 +289,7 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         images.append(pgg2.dsqr_read_count_histogram(result_dict, images_directory))
         images.append(pgg.read_length_scatterplot(self.dataframe_dict, images_directory))
         images.append(pgg2.dsqr_read_length_scatterplot(self.dataframe_dict_1dsqr, images_directory))
-        images.append(pgg.yield_plot(self.dataframe_1dsqr, images_directory, oneDsquare=True))
+        images.append(pgg.yield_plot(self.dataframe_dict_1dsqr, images_directory))
         images.append(pgg.read_quality_multiboxplot(self.dataframe_dict, images_directory, ))
         images.append(pgg2.dsqr_read_quality_multiboxplot(result_dict, self.dataframe_dict_1dsqr, images_directory))
         images.append(pgg.allphred_score_frequency(self.dataframe_dict, images_directory))
@@ -344,31 +366,24 @@ class OneDSquareSequencingSummaryExtractor(SSE):
             'trimmed_duration1', 'trimmed_duration2'
         ]
 
-        sequencing_summary_datatypes = {
-            'passes_filtering': np.bool,
-            'sequence_length': np.uint32,
-            'mean_qscore': np.float,
-            'start_time1': np.float,
-            'trimmed_duration1': np.float,
-            'trimmed_duration2': np.float,
-        }
+        sequencing_summary_datatypes = get_datatypes(sequencing_summary_columns)
 
-        # If barcoding files are provided, merging of dataframes must be done on read_id column
+        # If barcoding files are provided, merging of dataframes must be done on read_id column,
+        # loaded as two 64-bit integer keys
         barcoding_summary_columns = ['read_id', 'barcode_arrangement']
 
-        barcoding_summary_datatypes = {
-            'read_id': object,
-            'barcode_arrangement': object
-        }
+        barcoding_summary_datatypes = get_datatypes(barcoding_summary_columns)
 
         try:
             # If 1 file and it's a 1dsqr_sequencing_summary.txt
-            if len(files) == 1 and self._is_sequencing_summary_1dsqr_file(
+            if len(files) == 1 and self.catalog.is_sequencing_summary_1dsqr_file(
                     files[0]):
-                return pd.read_csv(files[0],
-                                   sep="\t",
-                                   usecols=sequencing_summary_columns,
-                                   dtype=sequencing_summary_datatypes)
+                return read_summary_file(files[0],
+                                         sequencing_summary_columns,
+                                         sequencing_summary_datatypes,
+                                         self.parser,
+                                         self.cache,
+                                         self.threads)
 
             # If 1 file and it's a 1_dsqr_sequencing_summary.txt with barcode info, load column barcode_arrangement
             elif len(
@@ -377,63 +392,58 @@ class OneDSquareSequencingSummaryExtractor(SSE):
                 files[0]):
                 sequencing_summary_columns.append('barcode_arrangement')
                 sequencing_summary_datatypes.update(
-                    {'barcode_arrangement': object})
+                    {'barcode_arrangement': column_datatypes['barcode_arrangement']})
 
-                return pd.read_csv(files[0],
-                                   sep="\t",
-                                   usecols=sequencing_summary_columns,
-                                   dtype=sequencing_summary_datatypes)
+                return read_summary_file(files[0],
+                                         sequencing_summary_columns,
+                                         sequencing_summary_datatypes,
+                                         self.parser,
+                                         self.cache,
+                                         self.threads)
 
             # If multiple files, check if there's a barcoding one and a sequencing one :
+            barcode_files = []
+            summary_files = []
             for f in files:
 
                 # check for presence of barcoding files
-                if self._is_barcode_file(f):
-                    dataframe = pd.read_csv(f,
-                                            sep="\t",
-                                            usecols=barcoding_summary_columns,
-                                            dtype=barcoding_summary_datatypes)
-                    if barcode_dataframe is None:
-                        barcode_dataframe = dataframe
-                    # if a barcoding file has already been read, append the 2 dataframes
-                    else:
-                        barcode_dataframe = barcode_dataframe.append(
-                            dataframe, ignore_index=True)
-
-                # check for presence of sequencing_summary file, if True add column read_id for merging with barcode dataframe
-                else:
-                    if self._is_sequencing_summary_1dsqr_file(f):
-                        sequencing_summary_columns.append('read_id1')
-                        sequencing_summary_datatypes.update(
-                            {'read_id1': object})
-
-                        dataframe = pd.read_csv(
-                            f,
-                            sep="\t",
-                            usecols=sequencing_summary_columns,
-                            dtype=sequencing_summary_datatypes)
-                        if summary_dataframe is None:
-                            summary_dataframe = dataframe
-                        else:
-                            summary_dataframe = summary_dataframe.append(
-                                dataframe, ignore_index=True)
+                if self.catalog.is_barcode_file(f):
+                    barcode_files.append(f)
+
+                # check for presence of sequencing_summary file
+                elif self.catalog.is_sequencing_summary_1dsqr_file(f):
+                    summary_files.append(f)
+
+            # Add column read_id1 for merging with barcode dataframe
+            sequencing_summary_columns.append('read_id1')
+            sequencing_summary_datatypes.update({'read_id1': column_datatypes['read_id1']})
+
+            # Parse all the files in parallel, then concatenate the dataframes of each type once
+            dataframes = read_summary_files(
+                [(f, sequencing_summary_columns, sequencing_summary_datatypes) for f in summary_files] +
+                [(f, barcoding_summary_columns, barcoding_summary_datatypes) for f in barcode_files],
+                self.parser, self.cache, self.threads)
+
+            summary_dataframe = concat_dataframes(dataframes[:len(summary_files)])
+            barcode_dataframe = concat_dataframes(dataframes[len(summary_files):])
 
             if barcode_dataframe is None:
                 # If no barcodes in files, no merged dataframes on column 'read_id'
-                return summary_dataframe.drop(columns=['read_id1'])
+                return summary_dataframe.drop(columns=read_id_key_columns('read_id1'))
             else:
-                summary_dataframe.rename(columns={"read_id1": "read_id"},
+                summary_dataframe.rename(columns=dict(zip(read_id_key_columns('read_id1'), read_id_key_columns())),
                                          inplace=True)
                 dataframes_merged = pd.merge(summary_dataframe,
                                              barcode_dataframe,
-                                             on='read_id',
+                                             on=read_id_key_columns(),
                                              how='left')
-                # delete column read_id after merging
-                del dataframes_merged['read_id']
+                # delete the keys of column read_id after merging
+                dataframes_merged.drop(columns=read_id_key_columns(), inplace=True)
+                fill_missing_values(dataframes_merged)
 
                 return dataframes_merged
 
-        except IOError:
+        except FileNotFoundError:
             raise FileNotFoundError("Sequencing summary file not found")
 
     @staticmethod
@@ -444,8 +454,7 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         :return: True if the filename is a barcoding summary file
         """
         try:
-            with open(filename, 'r') as f:
-                header = f.readline()
+            header = read_header(filename)
             return header.startswith(
                 'read_id') and 'barcode_arrangement' in header
         except FileNotFoundError:
@@ -461,8 +470,7 @@ class OneDSquareSequencingSummaryExtractor(SSE):
         :return: True if the file is indeed a sequencing summary file
         """
         try:
-            with open(filename, 'r') as f:
-                header = f.readline()
+            header = read_header(filename)
             return header.startswith(
                 'filename1') and not 'barcode_arrangement' in header
         except IOError:
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Partial result files of a shard of the reads of a run, and the extractor that merges them.
+# A partial result file is a numpy .npz file with the aggregates of the reads of the shard (counts, histograms,
+# quantile sketches, channel and time bin tables, random sample): the arrays of the aggregates are concatenated
+# by type in one array per type, the other values and the positions of the arrays are saved in a JSON description.
+# The partial results of any number of shards are merged without reading the reads again into the statistics of the
+# whole run: the counts, the yields, the read length statistics and the NXX values are the same as the ones of the
+# whole run, the means and standard deviations of the PHRED scores are the same up to the rounding of the floating
+# point sums, but their quantiles are computed from histograms and rounded to 1 / qscore_resolution (0.001).
+# The shards are read by chunks, so the memory used by the reads of the whole run is unknown: the merged reports
+# have no memory.usage values.
+
+import json
+
+import numpy as np
+
+from toulligqc import version
+from toulligqc.sequencing_summary_aggregator import SequencingSummaryAggregator
+from toulligqc.sequencing_summary_streaming_extractor import StreamingSequencingSummaryExtractor
+
+# Format of the partial result files
+partial_format = 'toulligqc.partial'
+
+# Version of the layout of the partial result files, files of other versions cannot be merged
+partial_format_version = 4
+
+# Name of the entry of the description in the partial result files
+description_entry = 'description'
+
+
+def write_partial(path, aggregator):
+    """
+    Write the aggregates of a shard of the reads in a partial result file
+    :param path: path of the partial result file
+    :param aggregator: SequencingSummaryAggregator object with the reads of the shard
+    """
+    buffers = {}
+    state = _pack(aggregator.get_state(), buffers)
+
+    description = {'format': partial_format,
+                   'version': partial_format_version,
+                   'toulligqc.version': version.__version__,
+                   'read.count': aggregator.read_count,
+                   'barcode.selection': aggregator.barcode_selection,
+                   'state': state}
+
+    arrays = {name: np.concatenate(buffer) for name, buffer in buffers.items()}
+    arrays[description_entry] = np.array(json.dumps(description))
+
+    # Use a file object as numpy adds a .npz extension to paths
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+
+
+def read_partial_description(path):
+    """
+    Read the description of a partial result file, without loading its arrays
+    :param path: path of the partial result file
+    :return: a dictionary
+    """
+    try:
+        with np.load(path, allow_pickle=False) as npz:
+            description = json.loads(str(npz[description_entry]))
+    except (KeyError, ValueError, OSError):
+        raise ValueError("Invalid partial result file: " + path)
+
+    if description.get('format') != partial_format:
+        raise ValueError("Invalid partial result file: " + path)
+    if description.get('version') != partial_format_version:
+        raise ValueError("Unsupported version of partial result file: " + path)
+
+    return description
+
+
+def read_partial(path):
+    """
+    Read the aggregates of a partial result file
+    :param path: path of the partial result file
+    :return: a SequencingSummaryAggregator object
+    """
+    description = read_partial_description(path)
+
+    with np.load(path, allow_pickle=False) as npz:
+        arrays = {name: npz[name] for name in npz.files if name != description_entry}
+
+    return SequencingSummaryAggregator.from_state(_unpack(description['state'], arrays))
+
+
+def _pack(value, buffers):
+    """
+    Replace the numpy arrays of nested dictionaries and lists by their position in the buffers of their type
+    :param value: value to pack
+    :param buffers: dictionary of the lists of the arrays of each type, updated with the arrays of the value
+    :return: the packed value that can be saved in JSON
+    """
+    if isinstance(value, np.ndarray):
+        buffer = buffers.setdefault(value.dtype.name, [])
+        offset = sum(len(a) for a in buffer)
+        buffer.append(value)
+        return {'array': value.dtype.name, 'offset': offset, 'length': len(value)}
+    if isinstance(value, dict):
+        return {'dict': {key: _pack(v, buffers) for key, v in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return [_pack(v, buffers) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _unpack(value, arrays):
+    """
+    Restore the numpy arrays of a value packed by _pack()
+    :param value: packed value
+    :param arrays: dictionary of the concatenated arrays of each type
+    :return: the unpacked value
+    """
+    if isinstance(value, dict):
+        if 'array' in value:
+            return arrays[value['array']][value['offset']:value['offset'] + value['length']].copy()
+        return {key: _unpack(v, arrays) for key, v in value['dict'].items()}
+    if isinstance(value, list):
+        return [_unpack(v, arrays) for v in value]
+    return value
+
+
+class MergedSequencingSummaryExtractor(StreamingSequencingSummaryExtractor):
+    """
+    Extraction of statistics from the partial result files of the shards of a run.
+    The statistics put in the result_dict have the same keys as the ones of SequencingSummaryExtractor.
+    """
+
+    def __init__(self, config_dictionary):
+        """
+        Constructor
+        :param config_dictionary: dictionary containing the paths of the partial result files in the partial_source key
+        """
+        super().__init__(config_dictionary)
+        self.partial_files = [f for f in config_dictionary['partial_source'].split('\t') if f]
+        self.barcode_selection = None
+
+    @staticmethod
+    def get_name() -> str:
+        """
+        Get the name of the extractor.
+        :return: the name of the extractor
+        """
+        return 'Merged basecaller sequencing summary'
+
+    def check_conf(self):
+        """
+        Check that the partial result files exist and have the same barcode selection. The barcode selection of the
+        partial results is set in the configuration
+        :return: boolean and a string for error message
+        """
+        if len(self.partial_files) == 0:
+            return False, "No partial result file has been defined"
+
+        barcode_selections = []
+        for f in self.partial_files:
+            try:
+                barcode_selections.append(read_partial_description(f)['barcode.selection'])
+            except FileNotFoundError:
+                return False, "No such file or directory " + f
+            except ValueError as e:
+                return False, str(e)
+
+        if any(selection != barcode_selections[0] for selection in barcode_selections):
+            return False, "The partial result files have different barcode selections"
+
+        if barcode_selections[0] is not None:
+            self.is_barcode = True
+            self.config_dictionary['barcoding'] = 'True'
+            self.config_dictionary['barcode_selection'] = [b for b in barcode_selections[0] if b != 'unclassified']
+
+        return True, ""
+
+    def init(self):
+        """
+        Read and merge the aggregates of all the partial result files
+        """
+        self.aggregator = None
+
+        for f in self.partial_files:
+            aggregator = read_partial(f)
+            if self.aggregator is None:
+                self.aggregator = aggregator
+            else:
+                self.aggregator.merge(aggregator)
+
+        if self.aggregator.read_count == 0:
+            raise ValueError("The partial result files have no read")
+
+        if self.is_barcode:
+            self.barcode_selection = list(self.aggregator.barcode_selection)
+
+        self.dataframe_dict = {}
+
+    def _memory_usage_dict(self, result_dict):
+        """
+        Set no memory usage in the result_dict: the shards have been read by chunks, so the memory used by the reads
+        of the whole run is unknown
+        """
+        pass
@@ -0,0 +1,942 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Parsing of the sequencing summary and barcoding summary files.
+# Two parsers are available: the C parser of Pandas (default) and the multithreaded CSV reader of
+# Apache Arrow (optional pyarrow dependency) that is much faster on large files.
+# The parsed columns can be saved in a persistent cache of Feather files to avoid parsing the same files
+# again in the next runs.
+# Files compressed with gzip (including bgzip), bzip2 or zstd are detected from their magic bytes and
+# decompressed on the fly, in a separate multithreaded process when a suitable tool is installed. A truncated or
+# corrupted compressed file raises an IOError, whatever the decompressor.
+# The read ids (UUIDs) used to merge barcoding files can be loaded as two 64-bit integer keys instead of
+# Python strings, which reduces the memory used by the merge about five times.
+# Columns with the 'category' type (e.g. barcode_arrangement) are decoded as Pandas categoricals with sorted
+# categories, whatever the parser, and keep this type when dataframes are concatenated.
+# A large uncompressed file read with the Pandas parser is split in byte ranges aligned on the lines, parsed by a
+# pool of processes. The workers put the parsed columns in shared memory blocks instead of sending them through
+# pipes, and the columns of the ranges are concatenated in the order of the file.
+# A random sample of the reads of a file can be read without parsing the whole file: the lines that follow random
+# byte offsets are read, or a bottom-k sample is kept while a compressed file is read by chunks.
+# The lines appended to an uncompressed file that is still being written (e.g. by MinKNOW) can be read from the
+# end of the last complete line read, the incomplete last line is left for the next read.
+
+import bz2
+import concurrent.futures
+import gzip
+import hashlib
+import io
+import json
+import os
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+import shutil
+import subprocess
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Errors raised by the decompressors of the Python modules on truncated or corrupted files
+decompression_errors = (EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+parsers = ('pandas', 'arrow')
+
+default_parser = 'pandas'
+
+# Default maximal size of the cache directory in bytes
+default_cache_max_size = 10 * 1024 ** 3
+
+# Default maximal age of the files of the cache in days
+default_cache_max_age = 30
+
+# Magic bytes of the supported compression formats
+compression_magic_bytes = {
+    'gzip': b'\x1f\x8b',
+    'bzip2': b'BZh',
+    'zstd': b'\x28\xb5\x2f\xfd'}
+
+# Type of the read id columns to load as two 64-bit integer keys (see read_id_key_columns())
+read_id_datatype = 'read_id'
+
+# Type of the columns to load as Pandas categoricals
+categorical_datatype = 'category'
+
+# Number of rows parsed at once by the Pandas parser when read ids are converted to keys
+read_id_chunk_size = 1000000
+
+# Minimal size of an uncompressed file to parse it by byte ranges in parallel with the Pandas parser
+byte_range_min_size = 64 * 1024 * 1024
+
+# Size of the blocks read backwards from the end of a file to find the end of its last complete line
+line_end_block_size = 64 * 1024
+
+# Length of the text representation of an UUID and positions of its dashes
+uuid_length = 36
+uuid_dash_positions = [8, 13, 18, 23]
+
+# External tools used to decompress files in a separate process, by order of preference.
+# The {threads} field is replaced by the number of threads to use
+decompression_commands = {
+    'gzip': [['bgzip', '-d', '-c', '-@', '{threads}'], ['pigz', '-d', '-c', '-p', '{threads}']],
+    'bzip2': [['lbzip2', '-d', '-c', '-n', '{threads}'], ['pbzip2', '-d', '-c', '-p{threads}']],
+    'zstd': [['zstd', '-d', '-c', '-q', '-T{threads}']]}
+
+
+def is_parser_available(parser):
+    """
+    Check if a parser can be used
+    :param parser: name of the parser
+    :return: True if the parser is known and its dependencies are installed
+    """
+    if parser == 'arrow':
+        return pa_csv is not None
+    return parser in parsers
+
+
+def get_parser(config_dictionary):
+    """
+    Get the parser to use from the configuration
+    :param config_dictionary: configuration dictionary
+    :return: the name of the parser
+    """
+    if 'parser' in config_dictionary and config_dictionary['parser']:
+        return config_dictionary['parser']
+    return default_parser
+
+
+def get_threads(config_dictionary):
+    """
+    Get the number of threads or processes to use from the configuration
+    :param config_dictionary: configuration dictionary
+    :return: the number of threads, by default the number of CPUs
+    """
+    if 'threads' in config_dictionary and config_dictionary['threads']:
+        return max(1, int(config_dictionary['threads']))
+    return os.cpu_count() or 1
+
+
+def get_cache(config_dictionary):
+    """
+    Get the cache of parsed files defined in the configuration
+    :param config_dictionary: configuration dictionary
+    :return: a SummaryFileCache object or None if no cache directory is defined
+    """
+    if 'cache_directory' not in config_dictionary or not config_dictionary['cache_directory']:
+        return None
+
+    max_size = default_cache_max_size
+    if 'cache_max_size' in config_dictionary and config_dictionary['cache_max_size']:
+        max_size = int(config_dictionary['cache_max_size']) * 1024 ** 2
+
+    max_age = default_cache_max_age
+    if 'cache_max_age' in config_dictionary and config_dictionary['cache_max_age']:
+        max_age = float(config_dictionary['cache_max_age'])
+
+    return SummaryFileCache(config_dictionary['cache_directory'], max_size, max_age)
+
+
+def read_summary_file(filename, columns, datatypes, parser=default_parser, cache=None, threads=1):
+    """
+    Read some columns of a tab separated summary file
+    :param filename: path of the file
+    :param columns: list of the columns to load
+    :param datatypes: dictionary with the types of the columns
+    :param parser: name of the parser to use
+    :param cache: SummaryFileCache object or None to always parse the file
+    :param threads: maximal number of processes used to parse a large uncompressed file by byte ranges
+    :return: a Pandas Dataframe object with the columns in the same order as in the file
+    """
+    if cache is not None:
+        dataframe = cache.load(filename, columns, datatypes)
+        if dataframe is not None:
+            return dataframe
+
+    ranges = byte_ranges(filename, threads) if parser == 'pandas' and threads > 1 and \
+        os.path.getsize(filename) >= byte_range_min_size and get_compression(filename) is None else []
+
+    if len(ranges) > 1:
+        dataframe = _read_summary_file_ranges(filename, ranges, columns, datatypes)
+    else:
+        with open_summary_file(filename, parallel=True) as f:
+            if parser == 'arrow':
+                dataframe = _read_summary_file_arrow(f, read_header(filename), columns, datatypes)
+            else:
+                dataframe = _read_summary_file_pandas(f, columns, datatypes)
+
+    if cache is not None:
+        cache.save(filename, columns, datatypes, dataframe)
+
+    return dataframe
+
+
+def read_summary_files(file_projections, parser=default_parser, cache=None, threads=1):
+    """
+    Read several summary files in parallel in a pool of processes
+    :param file_projections: list of tuples with the path of a file, the list of its columns and the dictionary
+    of their types to load
+    :param parser: name of the parser to use
+    :param cache: SummaryFileCache object or None to always parse the files
+    :param threads: maximal number of processes to use
+    :return: a list of Pandas Dataframe objects in the same order as the files
+    """
+    if len(file_projections) == 1:
+        # A single file may be parsed by byte ranges
+        f, columns, datatypes = file_projections[0]
+        return [read_summary_file(f, columns, datatypes, parser, cache, threads)]
+
+    if len(file_projections) == 0 or threads <= 1:
+        return [read_summary_file(f, columns, datatypes, parser, cache) for f, columns, datatypes in file_projections]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(threads, len(file_projections))) as executor:
+        futures = [executor.submit(read_summary_file, f, columns, datatypes, parser, cache)
+                   for f, columns, datatypes in file_projections]
+        return [future.result() for future in futures]
+
+
+def read_summary_file_chunks(filename, columns, datatypes, chunk_size):
+    """
+    Read some columns of a tab separated summary file by chunks with the Pandas parser
+    :param filename: path of the file
+    :param columns: list of the columns to load
+    :param datatypes: dictionary with the types of the columns
+    :param chunk_size: number of rows of the chunks
+    :return: a generator of Pandas Dataframe objects
+    """
+    with open_summary_file(filename, parallel=True) as f:
+        yield from _read_summary_file_chunks(f, columns, datatypes, chunk_size)
+
+
+def appended_lines_range(filename, offset):
+    """
+    Get the byte range of the complete lines appended to an uncompressed summary file that is still being written
+    :param filename: path of the file
+    :param offset: offset of the end of the lines already read, 0 if no line has been read
+    :return: a (start, end) tuple of offsets in the file: when offset is 0, start is the end of the header line
+    or 0 if the header line is not complete yet. end is the end of the last complete line, start and end are equal if
+    there is no new complete line
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        if offset == 0:
+            if not f.readline().endswith(b'\n'):
+                return 0, 0
+            offset = f.tell()
+
+        end = size
+        while end > offset:
+            block_start = max(offset, end - line_end_block_size)
+            f.seek(block_start)
+            i = f.read(end - block_start).rfind(b'\n')
+            if i >= 0:
+                return offset, block_start + i + 1
+            end = block_start
+
+    return offset, offset
+
+
+def read_summary_file_range_chunks(filename, start, end, names, columns, datatypes, chunk_size):
+    """
+    Read by chunks some columns of the lines of a byte range of an uncompressed summary file
+    :param filename: path of the file
+    :param start: offset of the beginning of a line
+    :param end: offset of the end of a line
+    :param names: list of the columns of the file
+    :param columns: list of the columns to load
+    :param datatypes: dictionary with the types of the columns
+    :param chunk_size: number of rows of the chunks
+    :return: a generator of Pandas Dataframe objects
+    """
+    if start >= end:
+        return
+
+    with io.BufferedReader(_FileRange(filename, start, end)) as f:
+        yield from _read_summary_file_chunks(f, columns, datatypes, chunk_size, names)
+
+
+def _read_summary_file_pandas(f, columns, datatypes, names=None):
+    """
+    Read some columns of an opened summary file with the Pandas parser
+    :param names: list of the columns of the file when f does not start with the header line
+    """
+    if read_id_datatype in datatypes.values():
+        # Parse by chunks to never keep all the read ids as Python strings in memory
+        return concat_dataframes(list(_read_summary_file_chunks(f, columns, datatypes, read_id_chunk_size, names)))
+
+    return pd.read_csv(f, sep="\t", usecols=columns, dtype=datatypes, header=None if names else 'infer', names=names)
+
+
+def _read_summary_file_chunks(f, columns, datatypes, chunk_size, names=None):
+    """
+    Read some columns of an opened summary file by chunks and convert its read id columns to keys
+    """
+    read_id_columns = [c for c in columns if _is_read_id_datatype(datatypes.get(c))]
+    datatypes = {c: object if c in read_id_columns else t for c, t in datatypes.items()}
+
+    for chunk in pd.read_csv(f, sep="\t", usecols=columns, dtype=datatypes, chunksize=chunk_size,
+                             header=None if names else 'infer', names=names):
+        for c in read_id_columns:
+            keys = read_id_keys(chunk[c].values)
+            position = chunk.columns.get_loc(c)
+            # Unlike del, drop() does not keep a reference to the strings of the column
+            chunk = chunk.drop(columns=[c])
+            _insert_read_id_keys(chunk, position, c, *keys)
+        yield chunk
+
+
+def sample_summary_file(filename, columns, datatypes, count, random_state=None):
+    """
+    Read some columns of about count reads of a summary file taken at random, in the order of the file.
+    In uncompressed files, the reads are the lines that follow random byte offsets, which gives a uniform
+    sample as the lengths of the lines vary little. The sampling probability of a line depends on the length of the
+    previous line but not on its own length, so the sampled reads are not biased towards the longest reads.
+    The reads sampled twice are kept once. Compressed files are read entirely by chunks
+    :param filename: path of the file
+    :param columns: list of the columns to load
+    :param datatypes: dictionary with the types of the columns
+    :param count: number of reads to sample
+    :param random_state: seed or numpy Generator object, by default a random seed is used
+    :return: a Pandas Dataframe object with the columns in the same order as in the file
+    """
+    random_state = np.random.default_rng(random_state)
+
+    if get_compression(filename) is not None:
+        return _sample_summary_file_chunks(filename, columns, datatypes, count, random_state)
+
+    size = os.path.getsize(filename)
+
+    # Small buffers: only a line is read after each seek
+    with open(filename, 'rb', buffering=1024) as f:
+        lines = [f.readline()]
+        start = f.tell()
+        if start < size:
+            last_line_start = -1
+            for offset in np.unique(random_state.integers(start, size, count)):
+                # Go to the beginning of the line after offset - 1
+                f.seek(offset - 1)
+                f.readline()
+                line_start = f.tell()
+                if line_start == last_line_start or line_start >= size:
+                    continue
+
+                last_line_start = line_start
+                line = f.readline()
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+
+    return _read_summary_file_pandas(io.BytesIO(b''.join(lines)), columns, datatypes)
+
+
+def _sample_summary_file_chunks(filename, columns, datatypes, count, random_state):
+    """
+    Sample the reads of a compressed summary file read by chunks: a random key is drawn for each read and the reads
+    with the count smallest keys are kept
+    """
+    sample = None
+    sample_keys = None
+    with open_summary_file(filename, parallel=True) as f:
+        for chunk in _read_summary_file_chunks(f, columns, datatypes, read_id_chunk_size):
+            keys = random_state.random(len(chunk))
+            if sample is not None:
+                chunk = concat_dataframes([sample, chunk])
+                keys = np.concatenate([sample_keys, keys])
+
+            if len(chunk) > count:
+                # Sorted indexes to keep the order of the file
+                selected = np.sort(np.argpartition(keys, count)[:count])
+                chunk = chunk.iloc[selected].reset_index(drop=True)
+                keys = keys[selected]
+
+            sample = chunk
+            sample_keys = keys
+
+    if sample is None:
+        # No read in the file
+        return _read_summary_file_pandas(io.BytesIO(read_header(filename).encode('utf-8')), columns, datatypes)
+
+    return sample
+
+
+def byte_ranges(filename, count):
+    """
+    Split the lines of an uncompressed summary file, without its header line, in byte ranges of about the same size
+    :param filename: path of the file
+    :param count: maximal number of ranges
+    :return: a list of (start, end) tuples of offsets in the file, each range starts at the beginning of a line
+    and ends after the end of a line
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        f.readline()
+        boundaries = [f.tell()]
+        for i in range(1, count):
+            position = size * i // count
+            if position <= boundaries[-1]:
+                continue
+
+            # Go to the beginning of the next line, or stay at position if it is a beginning of line
+            f.seek(position - 1)
+            f.readline()
+            boundaries.append(f.tell())
+
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+
+
+def _read_summary_file_ranges(filename, ranges, columns, datatypes):
+    """
+    Read some columns of an uncompressed summary file by parsing its byte ranges in a pool of processes
+    :return: a Pandas Dataframe object with the same rows in the same order as a sequential parsing
+    """
+    names = read_header(filename).rstrip('\r\n').split('\t')
+
+    # The workers register their shared memory blocks to the resource tracker of this process that unlinks them
+    resource_tracker.ensure_running()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        futures = [executor.submit(_read_summary_file_range, filename, start, end, names, columns, datatypes)
+                   for start, end in ranges]
+        concurrent.futures.wait(futures)
+
+    parts = [future.result() for future in futures if future.exception() is None]
+    try:
+        if len(parts) < len(futures):
+            raise next(future.exception() for future in futures if future.exception() is not None)
+
+        # The columns of each range are copied from shared memory as soon as possible to limit the memory used
+        dataframes = []
+        for part in parts:
+            dataframes.append(_shared_memory_dataframe(part))
+            _unlink_shared_memory(part)
+    finally:
+        for part in parts:
+            _unlink_shared_memory(part)
+
+    return concat_dataframes(dataframes)
+
+
+def _read_summary_file_range(filename, start, end, names, columns, datatypes):
+    """
+    Parse a byte range of a summary file and put its columns in shared memory blocks
+    :return: a list of (column, values) tuples where values is a (shared memory block name, type, length) tuple
+    or the values of the column when they are not numbers (e.g. categoricals)
+    """
+    with io.BufferedReader(_FileRange(filename, start, end)) as f:
+        dataframe = _read_summary_file_pandas(f, columns, datatypes, names)
+
+    result = []
+    for column in dataframe.columns:
+        values = dataframe[column].values
+        if not isinstance(values, np.ndarray) or values.dtype.hasobject:
+            result.append((column, values))
+            continue
+
+        memory = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+        shared_values = np.ndarray(values.shape, dtype=values.dtype, buffer=memory.buf)
+        shared_values[:] = values
+        # The view must be released before closing the block
+        del shared_values
+        memory.close()
+        result.append((column, (memory.name, values.dtype.str, len(values))))
+
+    return result
+
+
+def _shared_memory_dataframe(part):
+    """
+    Create a dataframe from the columns of a byte range, the values in shared memory are copied
+    """
+    data = {}
+    memories = []
+    try:
+        for column, values in part:
+            if isinstance(values, tuple):
+                name, dtype, length = values
+                memories.append(shared_memory.SharedMemory(name=name))
+                values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=memories[-1].buf)
+            data[column] = values
+        return pd.DataFrame(data, copy=True)
+    finally:
+        data.clear()
+        values = None
+        for memory in memories:
+            memory.close()
+
+
+def _unlink_shared_memory(part):
+    """
+    Remove the shared memory blocks of the columns of a byte range
+    """
+    for i, (column, values) in enumerate(part):
+        if isinstance(values, tuple):
+            try:
+                memory = shared_memory.SharedMemory(name=values[0])
+                memory.close()
+                memory.unlink()
+            except FileNotFoundError:
+                pass
+            part[i] = (column, None)
+
+
+def read_id_key_columns(column='read_id'):
+    """
+    Get the names of the two columns of the keys of a read id column
+    :param column: name of the read id column
+    :return: a list with the names of the high and low 64 bits of the keys
+    """
+    return [column + '_high', column + '_low']
+
+
+def read_id_keys(read_ids):
+    """
+    Convert read ids to 128-bit keys. UUIDs are decoded, the other read ids are hashed
+    :param read_ids: Numpy array of strings
+    :return: a tuple of two Numpy arrays of uint64 with the high and the low 64 bits of the keys
+    """
+    try:
+        # The read ids longer than an UUID have a non null 37th byte
+        raw = np.asarray(read_ids).astype('S' + str(uuid_length + 1))
+    except UnicodeEncodeError:
+        raw = None
+
+    if raw is not None and len(raw) > 0:
+        raw = raw.view(np.uint8).reshape(len(raw), uuid_length + 1)
+        if not raw[:, uuid_length].any():
+            keys = _uuid_keys(raw[:, :uuid_length])
+            if keys is not None:
+                return keys
+
+    values = np.asarray(read_ids, dtype=object)
+    return (pd.util.hash_array(values, hash_key='toulligqc.high..'),
+            pd.util.hash_array(values, hash_key='toulligqc.low...'))
+
+
+# Values of the hexadecimal digits indexed by their ASCII code, 255 for the other characters
+_hex_digit_values = np.full(256, 255, dtype=np.uint8)
+for _i, _c in enumerate(b'0123456789abcdef'):
+    _hex_digit_values[_c] = _i
+    _hex_digit_values[ord(chr(_c).upper())] = _i
+
+
+def _uuid_keys(raw):
+    """
+    Decode UUIDs to 128-bit keys
+    :param raw: Numpy array of uint8 with a row of 36 ASCII characters per UUID
+    :return: a tuple of two Numpy arrays of uint64 or None if the values are not all UUIDs
+    """
+    if not (raw[:, uuid_dash_positions] == ord('-')).all():
+        return None
+
+    digits = _hex_digit_values[np.delete(raw, uuid_dash_positions, axis=1)]
+    if (digits == 255).any():
+        return None
+
+    # Pack the 32 hexadecimal digits in 16 bytes, read as two big endian 64-bit integers
+    keys = np.ascontiguousarray((digits[:, 0::2] << 4) | digits[:, 1::2]).view('>u8').astype(np.uint64)
+    return keys[:, 0].copy(), keys[:, 1].copy()
+
+
+def _insert_read_id_keys(dataframe, position, column, high, low):
+    """
+    Insert the columns of the keys of a read id column in a dataframe
+    """
+    high_column, low_column = read_id_key_columns(column)
+    dataframe.insert(position, high_column, high)
+    dataframe.insert(position + 1, low_column, low)
+
+
+def datatype_name(datatype):
+    """
+    Get a name of a column type that does not change between runs, e.g. for the keys of caches
+    :param datatype: Numpy type or name of a special type (e.g. 'category')
+    :return: a string
+    """
+    return datatype if isinstance(datatype, str) else np.dtype(datatype).str
+
+
+def _is_read_id_datatype(datatype):
+    return isinstance(datatype, str) and datatype == read_id_datatype
+
+
+def _is_categorical_datatype(datatype):
+    return isinstance(datatype, str) and datatype == categorical_datatype
+
+
+def concat_dataframes(dataframes):
+    """
+    Concatenate the rows of dataframes with a single copy
+    :param dataframes: list of Pandas Dataframe objects with the same columns
+    :return: a Pandas Dataframe object or None if the list is empty
+    """
+    if len(dataframes) == 0:
+        return None
+    if len(dataframes) == 1:
+        return dataframes[0]
+
+    # Categoricals with different categories would be concatenated as objects
+    for column in dataframes[0].columns:
+        if isinstance(dataframes[0][column].dtype, pd.CategoricalDtype):
+            categories = sorted(set().union(*(df[column].cat.categories for df in dataframes)))
+            for df in dataframes:
+                df[column] = df[column].cat.set_categories(categories)
+
+    return pd.concat(dataframes, ignore_index=True)
+
+
+def _sort_categories(dataframe):
+    """
+    Sort the categories of the categorical columns of a dataframe, in place
+    """
+    for column in dataframe.columns:
+        if isinstance(dataframe[column].dtype, pd.CategoricalDtype):
+            dataframe[column] = dataframe[column].cat.reorder_categories(sorted(dataframe[column].cat.categories))
+
+
+def _read_summary_file_arrow(f, header, columns, datatypes):
+    """
+    Read some columns of a tab separated summary file with the multithreaded Arrow CSV reader
+    """
+    if pa_csv is None:
+        raise ImportError("The arrow parser requires the pyarrow package")
+
+    header = header.rstrip('\r\n').split('\t')
+
+    missing_columns = [c for c in columns if c not in header]
+    if missing_columns:
+        raise ValueError("Usecols do not match columns, columns expected but not found: " + str(missing_columns))
+
+    column_types = {c: _arrow_type(datatypes[c]) for c in columns if c in datatypes}
+
+    table = pa_csv.read_csv(f,
+                            read_options=pa_csv.ReadOptions(use_threads=True),
+                            parse_options=pa_csv.ParseOptions(delimiter='\t'),
+                            convert_options=pa_csv.ConvertOptions(include_columns=[c for c in header if c in columns],
+                                                                  column_types=column_types))
+
+    read_id_columns = [c for c in table.column_names if _is_read_id_datatype(datatypes.get(c))]
+    keys = {c: _arrow_read_id_keys(table.column(c)) for c in read_id_columns}
+
+    dataframe = table.drop(read_id_columns).to_pandas()
+    for i, c in enumerate(read_id_columns):
+        # Each previous read id column has been replaced by two columns
+        _insert_read_id_keys(dataframe, table.column_names.index(c) + i, c, *keys[c])
+
+    # Unlike Pandas, Arrow keeps the categories in the order of their first occurrence
+    _sort_categories(dataframe)
+
+    return dataframe
+
+
+def _arrow_type(datatype):
+    """
+    Get the Arrow type of a column from its Pandas type
+    """
+    if datatype == object or _is_read_id_datatype(datatype):
+        return pa.string()
+    if _is_categorical_datatype(datatype):
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(datatype))
+
+
+def _arrow_read_id_keys(column):
+    """
+    Convert an Arrow column of read ids to keys. The UUIDs are decoded from the buffers of the column
+    without creating Python strings
+    """
+    result = []
+    for chunk in column.chunks:
+        offsets = np.frombuffer(chunk.buffers()[1], dtype=np.int32)[chunk.offset:chunk.offset + len(chunk) + 1]
+        keys = None
+        if chunk.null_count == 0 and len(chunk) > 0 and (np.diff(offsets) == uuid_length).all():
+            data = np.frombuffer(chunk.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]]
+            keys = _uuid_keys(data.reshape(len(chunk), uuid_length))
+        if keys is None:
+            keys = read_id_keys(chunk.to_numpy(zero_copy_only=False))
+        result.append(keys)
+
+    if len(result) == 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.uint64)
+    return np.concatenate([k[0] for k in result]), np.concatenate([k[1] for k in result])
+
+
+def get_compression(filename):
+    """
+    Get the compression format of a file from its magic bytes
+    :param filename: path of the file
+    :return: the name of the compression format or None if the file is not compressed
+    """
+    with open(filename, 'rb') as f:
+        magic = f.read(4)
+
+    for compression, magic_bytes in compression_magic_bytes.items():
+        if magic.startswith(magic_bytes):
+            return compression
+    return None
+
+
+def open_summary_file(filename, parallel=False):
+    """
+    Open a summary file, compressed or not, in binary mode
+    :param filename: path of the file
+    :param parallel: decompress the file in a separate process, with several threads if the format and the
+    installed tools allow it. This is useful to read whole files but not only the first lines
+    :return: a file object
+    """
+    compression = get_compression(filename)
+
+    if compression is None:
+        return open(filename, 'rb')
+
+    command = _decompression_command(compression) if parallel else None
+    if command is not None:
+        return io.BufferedReader(_DecompressionProcess(command + [filename]))
+
+    if compression == 'gzip':
+        return io.BufferedReader(_DecompressionFile(gzip.open(filename, 'rb'), filename))
+    if compression == 'bzip2':
+        return io.BufferedReader(_DecompressionFile(bz2.open(filename, 'rb'), filename))
+    if zstandard is not None:
+        return io.BufferedReader(_DecompressionFile(zstandard.open(filename, 'rb'), filename))
+
+    # Without the zstandard package, the zstd tool is required
+    command = _decompression_command(compression)
+    if command is None:
+        raise IOError("Reading zstd compressed files requires the zstandard package or the zstd tool: " + filename)
+    return io.BufferedReader(_DecompressionProcess(command + [filename]))
+
+
+def read_header(filename):
+    """
+    Read the first line of a summary file, compressed or not
+    :param filename: path of the file
+    :return: a string with the first line
+    """
+    with open_summary_file(filename) as f:
+        return io.TextIOWrapper(f).readline()
+
+
+def _decompression_command(compression):
+    """
+    Get the command to decompress a file in a separate process
+    :return: the command as a list or None if no tool is available for the compression format
+    """
+    threads = str(os.cpu_count() or 1)
+    for command in decompression_commands[compression]:
+        if shutil.which(command[0]) is not None:
+            return [arg.format(threads=threads) for arg in command]
+    return None
+
+
+class _DecompressionProcess(io.RawIOBase):
+    """
+    Binary file object reading the standard output of a decompression process
+    """
+
+    def __init__(self, command):
+        super().__init__()
+        self.command = command
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self.process.stdout.readinto(b)
+
+        # At the end of the output, check that the whole file has been decompressed
+        if n == 0 and self.process.wait() != 0:
+            raise IOError("Error while decompressing file: " + ' '.join(self.command))
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+
+        # The process is stopped if the file has not been read until the end
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+
+
+class _DecompressionFile(io.RawIOBase):
+    """
+    Binary file object reading a file object of a Python decompression module, that raises an IOError like
+    _DecompressionProcess when the compressed file is truncated or corrupted
+    """
+
+    def __init__(self, f, filename):
+        super().__init__()
+        self.f = f
+        self.filename = filename
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        try:
+            return self.f.readinto(b)
+        except decompression_errors as e:
+            raise IOError("Error while decompressing file: " + self.filename + " (" + str(e) + ")")
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self.f.close()
+
+
+class _FileRange(io.RawIOBase):
+    """
+    Binary file object reading a byte range of a file
+    """
+
+    def __init__(self, filename, start, end):
+        super().__init__()
+        self.file = open(filename, 'rb')
+        self.file.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        view = memoryview(b)[:self.remaining]
+        n = self.file.readinto(view)
+        self.remaining -= n
+        return n
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self.file.close()
+
+
+class SummaryFileCache:
+    """
+    Persistent cache of the parsed columns of summary files, saved in Feather format (requires pyarrow).
+    The entries are identified by the path, the size and the modification time of the file and by the loaded
+    columns and their types. The oldest entries are removed when the cache exceeds its maximal size or age.
+    """
+
+    def __init__(self, directory, max_size=default_cache_max_size, max_age=default_cache_max_age):
+        """
+        Constructor
+        :param directory: path of the cache directory
+        :param max_size: maximal size of the cache in bytes
+        :param max_age: maximal age of the entries of the cache in days
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+
+    @staticmethod
+    def is_available():
+        return pa is not None
+
+    def _entry_path(self, filename, columns, datatypes):
+        """
+        Get the path of the cache entry of a file
+        """
+        stat = os.stat(filename)
+        key = json.dumps([os.path.abspath(filename), stat.st_size, stat.st_mtime_ns, sorted(set(columns)),
+                          sorted((c, datatype_name(t)) for c, t in datatypes.items() if c in columns)])
+
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.feather')
+
+    def load(self, filename, columns, datatypes):
+        """
+        Load a file from the cache
+        :return: a Pandas Dataframe object or None if the file is not in the cache
+        """
+        path = self._entry_path(filename, columns, datatypes)
+        if not os.path.isfile(path):
+            return None
+
+        try:
+            dataframe = pd.read_feather(path)
+        except Exception:
+            # Corrupted entry, the file will be parsed again
+            return None
+
+        # Update the modification time used by the eviction policy
+        os.utime(path)
+
+        return dataframe
+
+    def save(self, filename, columns, datatypes, dataframe):
+        """
+        Save a parsed file in the cache and remove the old entries
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._entry_path(filename, columns, datatypes)
+
+        # Write a temporary file first to never leave an incomplete entry in the cache
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        try:
+            dataframe.reset_index(drop=True).to_feather(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the entries older than the maximal age, then the least recently used entries
+        until the size of the cache is lower than the maximal size
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith('.feather'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        min_time = time.time() - self.max_age * 24 * 3600
+        total_size = sum(size for mtime, size, path in entries)
+
+        # Least recently used first
+        for mtime, size, path in sorted(entries):
+            if mtime >= min_time and total_size <= self.max_size:
+                break
+            os.remove(path)
+            total_size -= size
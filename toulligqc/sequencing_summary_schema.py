@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Types of the columns of the sequencing summary and barcoding summary files loaded by the extractors.
+# The types are chosen to keep the dataframes as small as possible in memory: durations and PHRED scores are
+# stored on 32 bits, channels on 16 bits and barcodes as categoricals. The start times keep 64 bits as the run
+# times in seconds with the decimals of the files need more than the 7 significant digits of 32 bit floats.
+# The statistics of the 32 bit columns are computed on the decimal values of the files (see decimal_values()).
+# The missing values are replaced column by column, without copying the whole dataframe.
+
+import numpy as np
+
+from toulligqc.sequencing_summary_reader import categorical_datatype
+from toulligqc.sequencing_summary_reader import read_id_datatype
+
+column_datatypes = {
+    # Sequencing summary files (1D)
+    'read_id': read_id_datatype,
+    'channel': np.uint16,
+    'start_time': np.float64,
+    'duration': np.float32,
+    'passes_filtering': np.bool_,
+    'sequence_length_template': np.uint32,
+    'mean_qscore_template': np.float32,
+
+    # Sequencing summary files (1D²)
+    'read_id1': read_id_datatype,
+    'start_time1': np.float64,
+    'trimmed_duration1': np.float32,
+    'trimmed_duration2': np.float32,
+    'sequence_length': np.uint32,
+    'mean_qscore': np.float32,
+
+    # Barcoding summary files
+    'barcode_arrangement': categorical_datatype}
+
+# Powers of ten that are exact in 64 bit floats
+_powers_of_ten = 10.0 ** np.arange(23)
+
+# Value of the missing values of the columns that can have missing values
+missing_values = {
+    'start_time': 0,
+    'duration': 0,
+    'mean_qscore_template': 0,
+    'start_time1': 0,
+    'trimmed_duration1': 0,
+    'trimmed_duration2': 0,
+    'mean_qscore': 0,
+    'barcode_arrangement': 'unclassified'}
+
+
+def get_datatypes(columns):
+    """
+    Get the types of columns
+    :param columns: list of column names
+    :return: a dictionary with the type of each column
+    """
+    return {c: column_datatypes[c] for c in columns}
+
+
+def fill_missing_values(dataframe):
+    """
+    Replace the missing values of a dataframe, in place. Only the columns with missing values are copied
+    :param dataframe: Pandas Dataframe object with the original or renamed columns of the summary files
+    """
+    for column in dataframe.columns:
+        if column in missing_values and dataframe[column].hasnans:
+            values = dataframe[column]
+            value = missing_values[column]
+            if values.dtype.name == 'category' and value not in values.cat.categories:
+                values = values.cat.set_categories(sorted(list(values.cat.categories) + [value]))
+            dataframe[column] = values.fillna(value)
+
+
+def memory_usage(dataframe):
+    """
+    Get the memory used by each column of a dataframe, including the strings of the categoricals
+    :param dataframe: Pandas Dataframe object
+    :return: a dictionary with the number of bytes used by each column
+    """
+    return {column: int(size) for column, size in dataframe.memory_usage(index=False, deep=True).items()}
+
+
+def decimal_values(values):
+    """
+    Get the values of a 32 bit column as 64 bit floats with the decimals of the summary files. Each value is the
+    shortest decimal number that is read as the same 32 bit float, like its repr(), so the statistics are the same
+    as the ones of the values parsed as 64 bit floats. The shortest numbers are searched for all the values at once,
+    by increasing number of significant digits
+    :param values: numpy array of values
+    :return: a numpy array of 64 bit floats, the values unchanged if they are not 32 bit floats
+    """
+    values = np.asarray(values)
+    if values.dtype != np.float32:
+        return values
+
+    result = values.astype(np.float64)
+    todo = np.flatnonzero(np.isfinite(values) & (values != 0))
+    exponents = np.floor(np.log10(np.abs(result[todo]))).astype(np.int64)
+
+    # 9 significant digits are always enough to read back a 32 bit float
+    for digits in range(1, 10):
+        if len(todo) == 0:
+            break
+
+        decimals = digits - 1 - exponents
+        x = result[todo]
+        scale = _powers_of_ten[np.minimum(np.abs(decimals), len(_powers_of_ten) - 1)]
+
+        # Division by an exact power of ten to get the 64 bit float nearest to the decimal number
+        candidates = np.rint(x * scale) / scale
+        negative = decimals < 0
+        if negative.any():
+            candidates[negative] = np.rint(x[negative] / scale[negative]) * scale[negative]
+
+        found = candidates.astype(np.float32) == values[todo]
+        result[todo[found]] = candidates[found]
+        todo = todo[~found]
+        exponents = exponents[~found]
+
+    return result
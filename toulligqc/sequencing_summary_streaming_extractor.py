@@ -0,0 +1,488 @@
+# -*- coding: utf-8 -*-
+
+#                  ToulligQC development code
+#
+# This code may be freely distributed and modified under the
+# terms of the GNU General Public License version 3 or later
+# and CeCILL. This should be distributed with the code. If you
+# do not have a copy, see:
+#
+#      http://www.gnu.org/licenses/gpl-3.0-standalone.html
+#      http://www.cecill.info/licences/Licence_CeCILL_V2-en.html
+#
+# Copyright for this code is held jointly by the Genomic platform
+# of the Institut de Biologie de l'École Normale Supérieure and
+# the individual authors.
+#
+# For more information on the ToulligQC project and its aims,
+# visit the home page at:
+#
+#      https://github.com/GenomicParisCentre/toulligQC
+#
+# First author: Laurent Jourdren
+# Maintainer: Laurent Jourdren
+# Since version 2.1
+
+# Extraction of statistics from sequencing_summary.txt file (1D chemistry) read by chunks (streaming mode).
+# The reads are never loaded all together in memory: each chunk updates running aggregates that are used
+# to compute the statistics and the graphs.
+
+import time
+
+import pandas as pd
+
+from toulligqc import plotly_graph_aggregate_generator as pgga
+from toulligqc import plotly_graph_generator as pgg
+from toulligqc.sequencing_summary_aggregator import SequencingSummaryAggregator
+from toulligqc.sequencing_summary_common import check_result_values
+from toulligqc.sequencing_summary_common import get_result_value
+from toulligqc.sequencing_summary_common import nxx_dict
+from toulligqc.sequencing_summary_common import set_result_value
+from toulligqc.sequencing_summary_common import sort_barcode_index
+from toulligqc.sequencing_summary_extractor import SequencingSummaryExtractor
+from toulligqc.sequencing_summary_extractor import barcoding_summary_columns
+from toulligqc.sequencing_summary_extractor import barcoding_summary_datatypes
+from toulligqc.sequencing_summary_extractor import output_columns
+from toulligqc.sequencing_summary_extractor import summary_columns
+from toulligqc.sequencing_summary_extractor import summary_datatypes
+from toulligqc.sequencing_summary_reader import appended_lines_range
+from toulligqc.sequencing_summary_reader import concat_dataframes
+from toulligqc.sequencing_summary_reader import read_id_key_columns
+from toulligqc.sequencing_summary_reader import read_summary_file_chunks
+from toulligqc.sequencing_summary_reader import read_summary_file_range_chunks
+from toulligqc.sequencing_summary_schema import column_datatypes
+from toulligqc.sequencing_summary_schema import fill_missing_values
+from toulligqc.sequencing_summary_schema import memory_usage
+
+# Number of lines of the chunks when no chunk size is defined
+default_chunk_size = 100000
+
+# In follow mode, duration in seconds without new read after which the sequencing summary files are no more followed
+follow_idle_timeout = 3600
+
+
+def get_follow_interval(config_dictionary):
+    """
+    Get the interval between the updates of the reports in follow mode from the configuration
+    :param config_dictionary: configuration dictionary
+    :return: the interval in seconds or None if the follow mode is not enabled
+    """
+    if 'follow' in config_dictionary and config_dictionary['follow']:
+        return float(config_dictionary['follow']) * 60
+    return None
+
+
+class StreamingSequencingSummaryExtractor(SequencingSummaryExtractor):
+    """
+    Extraction of data from sequencing_summary.txt and optional barcoding files read by chunks.
+    The statistics put in the result_dict have the same keys as the ones of SequencingSummaryExtractor.
+    """
+
+    def __init__(self, config_dictionary, catalog=None):
+        """
+        Constructor
+        :param config_dictionary: dictionary containing all files or directories paths for sequencing_summary.txt
+        and barcoding files, the size of the chunks in the chunk_size key and the optional path of the partial result
+        file in the partial_output key
+        :param catalog: InputCatalog object shared by the extractors of the run, a new one is created if None
+        """
+        # The aggregates are updated with all the columns of the chunks, all the outputs are computed
+        super().__init__(config_dictionary, catalog, list(output_columns))
+
+        self.chunk_size = default_chunk_size
+        if 'chunk_size' in config_dictionary and config_dictionary['chunk_size']:
+            self.chunk_size = int(config_dictionary['chunk_size'])
+
+        self.partial_output = None
+        if 'partial_output' in config_dictionary and config_dictionary['partial_output']:
+            self.partial_output = config_dictionary['partial_output']
+
+    def check_conf(self):
+        """
+        Check the configuration like SequencingSummaryExtractor, the outputs and the preview mode cannot be chosen
+        because all the outputs are computed from all the reads
+        :return: boolean and a string for error message
+        """
+        if 'outputs' in self.config_dictionary and self.config_dictionary['outputs']:
+            return False, "The outputs cannot be chosen when the reads are read by chunks"
+        if self.preview is not None:
+            return False, "The preview mode is not available when the reads are read by chunks"
+
+        return super().check_conf()
+
+    def init(self):
+        """
+        Read all the chunks of the sequencing summary files and update the aggregates
+        """
+        self._create_aggregator()
+
+        for chunk in self._load_sequencing_summary_chunks():
+            self._update_aggregator(chunk)
+
+        if self.aggregator.read_count == 0:
+            raise pd.errors.EmptyDataError("Dataframe is empty")
+
+        self.dataframe_dict = {}
+
+    def _create_aggregator(self):
+        """
+        Create the empty aggregates of the reads
+        """
+        if self.is_barcode:
+            self.barcode_selection = self.config_dictionary['barcode_selection']
+
+            # Add values unclassified to barcode list
+            if "unclassified" not in self.barcode_selection:
+                self.barcode_selection.append("unclassified")
+
+        # The random samples of the partial results of the shards of a run must be independent to be merged
+        random_seed = None if self.partial_output is not None else 1
+        self.aggregator = SequencingSummaryAggregator(self.barcode_selection if self.is_barcode else None,
+                                                      random_seed)
+
+        # Memory used by the columns of the largest chunk
+        self.memory_usage = {}
+
+    def _update_aggregator(self, chunk):
+        """
+        Add a chunk of reads to the aggregates
+        """
+        self.aggregator.update(chunk)
+        for column, size in memory_usage(chunk).items():
+            self.memory_usage[column] = max(size, self.memory_usage.get(column, 0))
+
+    def extract(self, result_dict):
+        """
+        Get Phred score (Qscore) and Length details (frequencies, ratios, yield and statistics) per type read
+        (pass or fail) from the aggregates
+        :param result_dict:
+        """
+        # Basecaller analysis
+        if 'sequencing.telemetry.extractor.software.analysis' not in result_dict:
+            result_dict['sequencing.telemetry.extractor.software.analysis'] = '1d_basecalling'
+
+        aggregator = self.aggregator
+        all_length = aggregator.all_length()
+        all_qscore = aggregator.all_qscore()
+
+        # Read count
+        total_reads = aggregator.read_count
+        set_result_value(self, result_dict, "read.count", total_reads)
+        set_result_value(self, result_dict, "read.pass.count", aggregator.length['pass'].count)
+        set_result_value(self, result_dict, "read.fail.count", aggregator.length['fail'].count)
+
+        # Ratios
+        set_result_value(self, result_dict, "read.pass.ratio", aggregator.length['pass'].count / total_reads)
+        set_result_value(self, result_dict, "read.fail.ratio", aggregator.length['fail'].count / total_reads)
+
+        # Frequencies
+        set_result_value(self, result_dict, "read.count.frequency", 100)
+        set_result_value(self, result_dict, "read.pass.frequency", aggregator.length['pass'].count / total_reads * 100)
+        set_result_value(self, result_dict, "read.fail.frequency", aggregator.length['fail'].count / total_reads * 100)
+
+        # Yield, n50, run time
+        set_result_value(self, result_dict, "yield", int(all_length.sum))
+
+        nxx = all_length.nxx_values()
+        set_result_value(self, result_dict, "n50", nxx[50][0])
+        set_result_value(self, result_dict, "l50", nxx[50][1])
+
+        # Other NXX and LXX values
+        nxx_dict(self, result_dict, nxx, '')
+
+        set_result_value(self, result_dict, "run.time", aggregator.run_time)
+
+        # Get channel occupancy statistics and store each value into result_dict
+        for index, value in aggregator.channel_occupancy().describe().items():
+            set_result_value(self, result_dict, "channel.occupancy.statistics." + index, value)
+
+        # Get statistics about all reads length and store each value into result_dict
+        for index, value in all_length.describe().items():
+            set_result_value(self, result_dict, "all.read.length." + index, value)
+
+        # Add statistics (without count) about read pass/fail length in the result_dict
+        self._describe_dict(result_dict, aggregator.length['pass'], "pass.reads.sequence.length")
+        self._describe_dict(result_dict, aggregator.length['fail'], "fail.reads.sequence.length")
+
+        # NXX and LXX values of the pass/fail reads
+        nxx_dict(self, result_dict, aggregator.length['pass'].nxx_values(), "pass.reads.sequence.length.")
+        nxx_dict(self, result_dict, aggregator.length['fail'].nxx_values(), "fail.reads.sequence.length.")
+
+        # Get Qscore statistics without count value and store them into result_dict
+        for index, value in all_qscore.describe().drop("count").items():
+            set_result_value(self, result_dict, "all.read.qscore." + index, value)
+
+        # Add statistics (without count) about read pass/fail qscore in the result_dict
+        self._describe_dict(result_dict, aggregator.qscore['pass'], "pass.reads.mean.qscore")
+        self._describe_dict(result_dict, aggregator.qscore['fail'], "fail.reads.mean.qscore")
+
+        # Memory used by the columns of the chunks
+        self._memory_usage_dict(result_dict)
+
+        if self.is_barcode:
+            self._extract_barcode_info(result_dict)
+
+    def _describe_dict(self, result_dict, histogram, entry):
+        """
+        Set statistics (without the count value) of an histogram in the result_dict like describe_dict()
+        """
+        for key, value in histogram.describe().drop("count").items():
+            set_result_value(self, result_dict, entry + '.' + key, value)
+
+    def _extract_barcode_info(self, result_dict):
+        """
+        Gather all barcode info from the aggregates : reads pass/fail and frequency per barcodes.
+        The keys are the same as the ones set by the extract_barcode_info() function.
+        """
+        aggregator = self.aggregator
+
+        for read_type in ('pass', 'fail'):
+            entry = "read." + read_type + ".barcoded"
+            count_sorted = sort_barcode_index(aggregator.barcode_counts(read_type))
+
+            set_result_value(self, result_dict, entry + '.count',
+                             int(count_sorted.drop(['unclassified', 'other barcodes']).sum()))
+            set_result_value(self, result_dict, "read." + read_type + ".non.used.barcodes.count",
+                             int(count_sorted['other barcodes']))
+
+            total_count = count_sorted.sum()
+            for barcode, count in count_sorted.items():
+                set_result_value(self, result_dict, "read." + read_type + "." + barcode + ".frequency",
+                                 count * 100 / total_count)
+
+        total_reads = get_result_value(self, result_dict, "read.count")
+        for read_type in ('pass', 'fail'):
+            set_result_value(self, result_dict, "read." + read_type + ".barcoded.frequency",
+                             get_result_value(self, result_dict, "read." + read_type + ".barcoded.count")
+                             / total_reads * 100)
+
+        if 'other barcodes' not in self.barcode_selection:
+            self.barcode_selection.append('other barcodes')
+
+        for barcode in self.barcode_selection:
+            for prefix, read_type in (('all.read.', None), ('read.pass.', 'pass'), ('read.fail.', 'fail')):
+                length, qscore = aggregator.barcode_histograms(barcode, read_type)
+
+                for index, value in length.describe().items():
+                    set_result_value(self, result_dict,
+                                     prefix + barcode.replace(' ', '.') + '.length.' + index, value)
+
+                for index, value in qscore.describe().drop('count').items():
+                    set_result_value(self, result_dict, prefix + barcode + '.qscore.' + index, value)
+
+                nxx_dict(self, result_dict, length.nxx_values(), prefix + barcode.replace(' ', '.') + '.length.')
+
+    def graph_generation(self, result_dict):
+        """
+        Generation of the different graphs from the aggregates
+        :return: images array containing the title and the path toward the images
+        """
+        images_directory = self.result_directory + '/images'
+        sample_dict = pgga.sample_dataframe_dict(self.aggregator)
+
+        images = list()
+        images.append(pgg.read_count_histogram(result_dict, images_directory))
+        images.append(pgga.read_length_scatterplot(self.aggregator, images_directory))
+        images.append(pgga.yield_plot(self.aggregator, images_directory))
+        images.append(pgga.read_quality_multiboxplot(self.aggregator, images_directory))
+        images.append(pgga.allphred_score_frequency(self.aggregator, images_directory))
+        images.append(pgga.plot_performance(self.aggregator, images_directory))
+
+        images.append(pgg.all_scatterplot(sample_dict, images_directory))
+        images.append(pgga.sequence_length_over_time(self.aggregator, images_directory))
+        images.append(pgga.phred_score_over_time(self.aggregator, result_dict, images_directory))
+        images.append(pgga.speed_over_time(self.aggregator, images_directory))
+
+        if self.is_barcode:
+            images.append(pgga.barcode_percentage_pie_chart(self.aggregator, 'pass', images_directory))
+            images.append(pgga.barcode_percentage_pie_chart(self.aggregator, 'fail', images_directory))
+            images.append(pgga.barcode_length_boxplot(self.aggregator, images_directory))
+            images.append(pgga.barcoded_phred_score_frequency(self.aggregator, images_directory))
+        return images
+
+    def clean(self, result_dict):
+        """
+        Removing dictionary entries that will not be kept in the report.data file
+        :return:
+        """
+
+        # Check values in result_dict (avoid Series and Dataframes)
+        check_result_values(self, result_dict)
+
+        self.aggregator = None
+
+    def _load_sequencing_summary_chunks(self):
+        """
+        Load the sequencing summary files by chunks of chunk_size reads. When separate barcoding files are provided,
+        only the keys of their read ids and their barcode arrangements are kept in memory to assign barcodes to the
+        reads.
+        :return: a generator of Pandas Dataframe objects with the same columns as the dataframe_1d of
+        SequencingSummaryExtractor
+        """
+        files = self.sequencing_summary_files
+
+        try:
+            barcodes = self._load_barcodes([f for f in files if self.catalog.is_barcode_file(f)])
+
+            for f in files:
+                projection = self._summary_file_projection(f, barcodes)
+                if projection is None:
+                    continue
+
+                columns, datatypes = projection
+                for chunk in read_summary_file_chunks(f, columns, datatypes, self.chunk_size):
+                    yield self._prepare_chunk(chunk, columns, barcodes)
+
+        except FileNotFoundError:
+            raise FileNotFoundError("Sequencing summary file not found")
+
+    def _summary_file_projection(self, f, barcodes):
+        """
+        Get the columns to load from a sequencing summary file
+        :param f: path of the file
+        :param barcodes: Pandas Series of the barcode arrangements indexed by the keys of the read ids or None
+        :return: a tuple with the list of the columns and the dictionary of their types, None if the file is not
+        a sequencing summary file
+        """
+        columns = list(summary_columns)
+        datatypes = dict(summary_datatypes)
+
+        if self.catalog.is_sequencing_summary_with_barcodes(f):
+            columns.append('barcode_arrangement')
+            datatypes['barcode_arrangement'] = column_datatypes['barcode_arrangement']
+        elif not self.catalog.is_sequencing_summary_file(f):
+            return None
+        elif barcodes is not None:
+            columns.append('read_id')
+            datatypes['read_id'] = column_datatypes['read_id']
+
+        return columns, datatypes
+
+    @staticmethod
+    def _prepare_chunk(chunk, columns, barcodes):
+        """
+        Assign the barcodes to the reads of a chunk, rename and fill its columns like
+        SequencingSummaryExtractor.init()
+        :return: the chunk
+        """
+        if 'read_id' in columns:
+            keys = pd.MultiIndex.from_arrays([chunk.pop(c) for c in read_id_key_columns()])
+            chunk['barcode_arrangement'] = barcodes.reindex(keys).values
+
+        chunk.rename(columns={'sequence_length_template': 'sequence_length',
+                              'mean_qscore_template': 'mean_qscore'}, inplace=True)
+
+        # Replace all NaN values like in SequencingSummaryExtractor.init()
+        fill_missing_values(chunk)
+        return chunk
+
+    def _load_barcodes(self, files):
+        """
+        Load the barcode of each read from barcoding summary files
+        :param files: list of barcoding summary files
+        :return: a Pandas Series of the barcode arrangements indexed by the keys of the read ids or None if there
+        is no file
+        """
+        if len(files) == 0:
+            return None
+
+        dataframe = concat_dataframes([chunk for f in files
+                                       for chunk in read_summary_file_chunks(f, barcoding_summary_columns,
+                                                                             barcoding_summary_datatypes,
+                                                                             self.chunk_size)])
+
+        keys = pd.MultiIndex.from_arrays([dataframe[c] for c in read_id_key_columns()])
+        return pd.Series(dataframe['barcode_arrangement'].values, index=keys)
+
+
+class FollowingSequencingSummaryExtractor(StreamingSequencingSummaryExtractor):
+    """
+    Extraction of data from sequencing summary files that are still being written (e.g. by MinKNOW). The offset of
+    the end of the last complete line read is kept for each file: an update only reads the lines appended since the
+    previous update and adds them to the aggregates, so its cost only depends on the number of new reads.
+    The files created in the directory sources since the previous update are read too.
+    """
+
+    def __init__(self, config_dictionary, catalog=None):
+        """
+        Constructor
+        :param config_dictionary: dictionary containing all files or directories paths for sequencing_summary.txt
+        files and the size of the chunks in the chunk_size key
+        :param catalog: InputCatalog object shared by the extractors of the run, a new one is created if None
+        """
+        super().__init__(config_dictionary, catalog)
+        self.sources = self.sequencing_summary_source.split('\t')
+        self.follow_interval = get_follow_interval(config_dictionary)
+        self.offsets = {}
+
+    def check_conf(self):
+        """
+        Check that the sources contain sequencing summary files that can be followed: separate barcoding files
+        cannot be joined to the reads before the end of the run and compressed files cannot be read from an offset
+        :return: boolean and a string for error message
+        """
+        check_result, error_message = super().check_conf()
+        if not check_result:
+            return check_result, error_message
+
+        for f in self.sequencing_summary_files:
+            if self.catalog.is_barcode_file(f):
+                return False, "Barcoding summary files cannot be followed, use sequencing summary files with " \
+                              "barcodes: " + f
+            if self.catalog.get(f).compression is not None:
+                return False, "Compressed files cannot be followed: " + f
+
+        return True, ""
+
+    def _is_summary_file(self, f):
+        """
+        Check if a file is a sequencing summary file or a file whose header is not complete yet, that is followed
+        until its header and its reads are written
+        :param f: path of the file
+        :return: True if the file can be followed
+        """
+        return super()._is_summary_file(f) or appended_lines_range(f, 0) == (0, 0)
+
+    def init(self):
+        """
+        Read the complete lines already written in the sequencing summary files. When the run has not written its
+        first read yet, the files are read again at each interval until a read is written or follow_idle_timeout
+        seconds have elapsed
+        """
+        self._create_aggregator()
+        wait_start = time.time()
+
+        while self.update() == 0:
+            if time.time() - wait_start >= follow_idle_timeout:
+                raise pd.errors.EmptyDataError("No read has been written in the sequencing summary files")
+            time.sleep(self.follow_interval)
+
+        self.dataframe_dict = {}
+
+    def update(self):
+        """
+        Read the complete lines appended to the sequencing summary files since the previous update and add them to
+        the aggregates
+        :return: the number of new reads
+        """
+        read_count = self.aggregator.read_count
+        self.sequencing_summary_files = self.catalog.expand_sources_again(self.sources)
+
+        for f in self.sequencing_summary_files:
+
+            # The header of the file was not complete yet when it was described
+            if self.offsets.get(f) == 0 or (f not in self.offsets and self.catalog.get_type(f) is None):
+                self.catalog.describe_again(f)
+
+            projection = self._summary_file_projection(f, None)
+            if projection is None:
+                continue
+
+            columns, datatypes = projection
+            start, end = appended_lines_range(f, self.offsets.get(f, 0))
+            for chunk in read_summary_file_range_chunks(f, start, end, self.catalog.get(f).columns, columns,
+                                                        datatypes, self.chunk_size):
+                self._update_aggregator(self._prepare_chunk(chunk, columns, None))
+            self.offsets[f] = end
+
+        return self.aggregator.read_count - read_count
@@ -37,23 +37,43 @@ import matplotlib
 matplotlib.use('Agg')
 import shutil
 import sys
-import re
 import argparse
 import os
 import time
 import datetime
 
 import warnings
+import pandas as pd
 from toulligqc import toulligqc_info_extractor
 from toulligqc import report_data_file_generator
 from toulligqc import html_report_generator
 from toulligqc import version
 from toulligqc import configuration
 from toulligqc import fast5_extractor
+from toulligqc import input_catalog
+from toulligqc import sequencing_summary_common
 from toulligqc import sequencing_summary_extractor
 from toulligqc import sequencing_summary_onedsquare_extractor
+from toulligqc import sequencing_summary_partial
+from toulligqc import sequencing_summary_reader
+from toulligqc import sequencing_summary_streaming_extractor
 from toulligqc import sequencing_telemetry_extractor
 
+# Options that are ignored when they are used with other options and their command line names: the streaming, follow
+# and partial modes compute all the outputs from all the reads, and the 1D² extractor needs all the 1D reads
+incompatible_options = {
+    'outputs': ('chunk_size', 'follow', 'partial_output'),
+    'preview': ('chunk_size', 'follow', 'partial_output', 'sequencing_summary_1dsqr_source'),
+    'follow': ('partial_output',)}
+
+option_names = {
+    'outputs': '--outputs',
+    'preview': '--preview',
+    'chunk_size': '--chunk-size',
+    'follow': '--follow',
+    'partial_output': '--partial-output',
+    'sequencing_summary_1dsqr_source': '--sequencing-summary-1dsqr-source'}
+
 
 def _parse_args(config_dictionary):
     """
@@ -84,7 +104,38 @@ def _parse_args(config_dictionary):
     optional.add_argument("-b", "--barcoding", action='store_true', dest='is_barcode', help="Option for barcode usage",
                           default=False)
     optional.add_argument('-l', '--barcodes', action='store', default='', dest='barcodes',
-                          help='Coma separated barcode list')
+                          help='Coma separated barcode list, with barcodes of kits (BC01, NB12, RB96...), ranges of '
+                               'barcodes (NB01-NB96) or barcode arrangement names')
+    optional.add_argument('--parser', action='store', dest='parser', choices=sequencing_summary_reader.parsers,
+                          help='Parser of the sequencing summary files (default: pandas, arrow requires pyarrow)')
+    optional.add_argument('--threads', action='store', dest='threads', type=int,
+                          help='Number of threads used to read the input files (default: number of CPUs)')
+    optional.add_argument('--cache-dir', action='store', dest='cache_directory',
+                          help='Directory of the cache of parsed sequencing summary files (requires pyarrow)')
+    optional.add_argument('--cache-max-size', action='store', dest='cache_max_size', type=int,
+                          help='Maximal size of the cache directory in MB (default: 10240)')
+    optional.add_argument('--cache-max-age', action='store', dest='cache_max_age', type=int,
+                          help='Maximal age of the files of the cache in days (default: 30)')
+    optional.add_argument('--column-store', action='store', dest='column_store_directory',
+                          help='Directory where the columns of the reads are stored to be memory-mapped in the next '
+                               'runs on the same files')
+    optional.add_argument('--outputs', action='store', dest='outputs',
+                          help='Coma separated list of the outputs to compute, only the columns they need are read: '
+                               + ', '.join(sequencing_summary_extractor.output_columns) + ' (default: all), not available with '
+                               '--chunk-size, --follow and --partial-output')
+    optional.add_argument('--preview', action='store', dest='preview', type=int,
+                          help='Compute estimations of the statistics and the graphs from a random sample of about '
+                               'PREVIEW reads of the sequencing summary files, not available with --chunk-size, --follow, '
+                               '--partial-output and 1D² sequencing summary files')
+    optional.add_argument('--chunk-size', action='store', dest='chunk_size', type=int,
+                          help='Read sequencing summary files by chunks of CHUNK_SIZE lines to limit memory usage')
+    optional.add_argument('--follow', action='store', dest='follow', type=float, metavar='MINUTES',
+                          help='Follow the sequencing summary files while they are written and update the reports '
+                               'every MINUTES minutes with the new reads, until no read has been added for one hour '
+                               'or the command is interrupted')
+    optional.add_argument('--partial-output', action='store', dest='partial_output',
+                          help='Write the aggregates of the reads in the PARTIAL_OUTPUT file instead of the reports, '
+                               'the partial result files of the shards of a run are merged with "toulligqc merge"')
     optional.add_argument("--quiet", action='store_true', dest='is_quiet', help="Quiet mode",
                           default=False)
     optional.add_argument("--report-only", action='store_true', dest='report_only',
@@ -97,7 +148,6 @@ def _parse_args(config_dictionary):
 
     # Parsing lone arguments and assign each argument value to a variable
     args = parser.parse_args()
-    report_name = args.report_name
     is_barcode = args.is_barcode
     barcodes = args.barcodes
 
@@ -105,12 +155,7 @@ def _parse_args(config_dictionary):
     if len(barcodes) > 0:
         is_barcode = True
 
-    # If no report_name specified, create default one : ToulligQC-report-YYYYMMDD_HHMMSS
-    if not report_name:
-        timestamp = datetime.datetime.now()
-        config_dictionary['report_name'] = "Toulligqc-report-" + str((timestamp.strftime("%Y-%m-%d-%H%M%S")))
-    else:
-        config_dictionary['report_name'] = report_name
+    _set_report_name(config_dictionary, args.report_name)
 
     # Rewrite the configuration file value if argument option is present
     source_file = {
@@ -121,11 +166,98 @@ def _parse_args(config_dictionary):
         ('result_directory', args.output),
         ('barcoding', is_barcode),
         ('barcodes', barcodes),
+        ('parser', args.parser),
+        ('threads', args.threads),
+        ('cache_directory', args.cache_directory),
+        ('cache_max_size', args.cache_max_size),
+        ('cache_max_age', args.cache_max_age),
+        ('column_store_directory', args.column_store_directory),
+        ('outputs', args.outputs),
+        ('preview', args.preview),
+        ('chunk_size', args.chunk_size),
+        ('follow', args.follow),
+        ('partial_output', args.partial_output),
+        ('quiet', args.is_quiet),
+        ('report_only', args.report_only),
+        ('debug', args.debug)
+    }
+
+    return _set_config_values(config_dictionary, source_file)
+
+
+def _parse_merge_args(config_dictionary):
+    """
+    Parsing the command line of the merge command
+    :return: config_dictionary containing the paths specified by line arguments
+    """
+
+    parser = argparse.ArgumentParser(prog="ToulligQC V{0} merge".format(version.__version__), add_help=False,
+                                     description='Merge the partial result files of the shards of a run. The statistics are '
+                                                 'the ones of the whole run, except the PHRED score quantiles that '
+                                                 'are rounded to 0.001, without the memory usage values')
+    required = parser.add_argument_group('required arguments')
+    optional = parser.add_argument_group('optional arguments')
+
+    required.add_argument('-p', '--partial-source', action='append', dest='partial_source',
+                          help='Partial result file written with --partial-output', metavar='PARTIAL_SOURCE',
+                          required=True)
+    required.add_argument('-t', '--telemetry-source', action='store', dest='telemetry_source',
+                          help='Basecaller telemetry file source', default=False)
+    required.add_argument('-f', '--fast5-source', action='store', dest='fast5_source',
+                          help='Fast5 file source (necessary if no telemetry file)')
+
+    optional.add_argument("-n", "--report-name", action='store', dest="report_name", help="Report name", type=str)
+    optional.add_argument('-o', '--output', action='store', dest='output', help='Output directory')
+    optional.add_argument("--quiet", action='store_true', dest='is_quiet', help="Quiet mode",
+                          default=False)
+    optional.add_argument("--report-only", action='store_true', dest='report_only',
+                          help="No report.data file, only HTML report",
+                          default=False)
+    optional.add_argument("--debug", action='store_true', dest='debug', help=argparse.SUPPRESS,
+                          default=False)
+    optional.add_argument("-h", "--help", action="help", help="Show this help message and exit")
+    optional.add_argument('--version', action='version', version=version.__version__)
+
+    args = parser.parse_args(sys.argv[2:])
+
+    _set_report_name(config_dictionary, args.report_name)
+
+    source_file = {
+        ('fast5_source', args.fast5_source),
+        ('partial_source', _join_parameter_arguments(args.partial_source)),
+        ('sequencing_telemetry_source', args.telemetry_source),
+        ('result_directory', args.output),
         ('quiet', args.is_quiet),
         ('report_only', args.report_only),
         ('debug', args.debug)
     }
 
+    return _set_config_values(config_dictionary, source_file)
+
+
+def _set_report_name(config_dictionary, report_name):
+    """
+    Set the report name in the configuration
+    :param config_dictionary: configuration dictionary
+    :param report_name: report name argument
+    """
+
+    # If no report_name specified, create default one : ToulligQC-report-YYYYMMDD_HHMMSS
+    if not report_name:
+        timestamp = datetime.datetime.now()
+        config_dictionary['report_name'] = "Toulligqc-report-" + str((timestamp.strftime("%Y-%m-%d-%H%M%S")))
+    else:
+        config_dictionary['report_name'] = report_name
+
+
+def _set_config_values(config_dictionary, source_file):
+    """
+    Put the values of the arguments in the configuration
+    :param config_dictionary: configuration dictionary
+    :param source_file: set of tuples with the configuration keys and the argument values
+    :return: config_dictionary
+    """
+
     # Put arguments values in configuration object
     for key, value in source_file:
         if value:
@@ -154,9 +286,24 @@ def _check_conf(config_dictionary):
                 'sequencing_telemetry_source']):
         argparse.ArgumentParser.print_help
 
-    if 'sequencing_summary_source' not in config_dictionary or not config_dictionary['sequencing_summary_source']:
+    # The merge command has no sequencing summary source
+    is_merge = 'partial_source' in config_dictionary and config_dictionary['partial_source']
+    if not is_merge and ('sequencing_summary_source' not in config_dictionary or
+                         not config_dictionary['sequencing_summary_source']):
         sys.exit('ERROR: The sequencing summary file argument is empty')
 
+    options = [key for key in option_names if key in config_dictionary and config_dictionary[key]]
+    for option, other_options in incompatible_options.items():
+        for other_option in other_options:
+            if option in options and other_option in options:
+                sys.exit('ERROR: The {} option cannot be used with the {} option'.format(option_names[option],
+                                                                                     option_names[other_option]))
+
+    # In partial mode, only the partial result file is written, in the result directory
+    if 'partial_output' in config_dictionary and config_dictionary['partial_output']:
+        config_dictionary['result_directory'] = os.path.dirname(os.path.abspath(config_dictionary['partial_output']))
+        return
+
     # If no --output argument provided, create output folder in current directory
     if 'result_directory' not in config_dictionary or not config_dictionary['result_directory']:
         current_directory = os.getcwd()
@@ -238,26 +385,68 @@ def _create_extractor_list(config_dictionary):
     if 'fast5_source' in config_dictionary and config_dictionary['fast5_source']:
         result.append(fast5_extractor.Fast5Extractor(config_dictionary))
 
-    if 'sequencing_summary_1dsqr_source' in config_dictionary and \
+    # The input files are described once for all the extractors
+    catalog = input_catalog.InputCatalog()
+
+    if 'partial_source' in config_dictionary and config_dictionary['partial_source']:
+        result.append(sequencing_summary_partial.MergedSequencingSummaryExtractor(config_dictionary))
+    elif 'sequencing_summary_1dsqr_source' in config_dictionary and \
             config_dictionary['sequencing_summary_1dsqr_source']:
         result.append(sequencing_summary_onedsquare_extractor.
-                      OneDSquareSequencingSummaryExtractor(config_dictionary))
+                      OneDSquareSequencingSummaryExtractor(config_dictionary, catalog))
+    elif sequencing_summary_streaming_extractor.get_follow_interval(config_dictionary) is not None:
+        result.append(sequencing_summary_streaming_extractor.
+                      FollowingSequencingSummaryExtractor(config_dictionary, catalog))
+    elif 'chunk_size' in config_dictionary and config_dictionary['chunk_size']:
+        result.append(sequencing_summary_streaming_extractor.
+                      StreamingSequencingSummaryExtractor(config_dictionary, catalog))
     else:
-        result.append(sequencing_summary_extractor.SequencingSummaryExtractor(config_dictionary))
+        result.append(sequencing_summary_extractor.SequencingSummaryExtractor(config_dictionary, catalog))
 
     result.insert(0, toulligqc_info_extractor.ToulligqcInfoExtractor(config_dictionary, result))
 
     return result
 
 
+def _write_partial_output(config_dictionary):
+    """
+    Aggregate the reads of the sequencing summary files and write the partial result file
+    :param config_dictionary: configuration dictionary
+    """
+    extractor = sequencing_summary_streaming_extractor.StreamingSequencingSummaryExtractor(config_dictionary)
+
+    (check_result, error_message) = extractor.check_conf()
+    if not check_result:
+        sys.exit("ERROR: Error while checking " + extractor.get_name() + " configuration: " + error_message)
+
+    _show(config_dictionary, "* Aggregate the reads")
+    start = time.time()
+    try:
+        extractor.init()
+    except IOError as e:
+        sys.exit("ERROR: Error while running " + extractor.get_name() + " extractor: " + str(e))
+
+    _show(config_dictionary, "* Write partial result file")
+    sequencing_summary_partial.write_partial(config_dictionary['partial_output'], extractor.aggregator)
+    _show(config_dictionary, "* End of the partial results (done in {})".format(_format_time(time.time() - start)))
+
+
 def main():
     """
     Main function creating graphs and statistics
     """
     config_dictionary = configuration.ToulligqcConf()
-    _parse_args(config_dictionary)
+
+    # The merge command creates the reports from partial result files
+    if len(sys.argv) > 1 and sys.argv[1] == 'merge':
+        _parse_merge_args(config_dictionary)
+    else:
+        _parse_args(config_dictionary)
+
     _check_conf(config_dictionary)
-    _create_output_directories(config_dictionary)
+    is_partial = 'partial_output' in config_dictionary and config_dictionary['partial_output']
+    if not is_partial:
+        _create_output_directories(config_dictionary)
 
     warnings.simplefilter('ignore')
 
@@ -269,16 +458,10 @@ def main():
         config_dictionary['barcode_selection'] = []
 
         if 'barcodes' in config_dictionary:
-            barcode_set = set()
-            for b in config_dictionary['barcodes'].strip().split(','):
-                pattern = re.search(r'BC(\d{2})', b.strip().upper())
-                if pattern:
-                    barcode = 'barcode{}'.format(pattern.group(1))
-                    barcode_set.add(barcode)
-            barcode_selection = sorted(barcode_set)
+            barcode_selection = sequencing_summary_common.parse_barcode_selection(config_dictionary['barcodes'])
 
             if len(barcode_selection) == 0:
-                sys.exit("ERROR: No known barcode found in provided list of barcodes")
+                sys.exit("ERROR: No barcode found in provided list of barcodes")
             config_dictionary['barcode_selection'] = barcode_selection
     else:
         config_dictionary['barcode_selection'] = ''
@@ -286,11 +469,18 @@ def main():
     # Print welcome message
     _welcome(config_dictionary)
 
+    if is_partial:
+        _write_partial_output(config_dictionary)
+        return
+
     # Configuration checking and initialisation of the extractors
     _show(config_dictionary, "* Initialize extractors")
 
-    # Create the list of extractors to execute
-    extractors_list = _create_extractor_list(config_dictionary)
+    # Create the list of extractors to execute, the input files are described when the extractors are created
+    try:
+        extractors_list = _create_extractor_list(config_dictionary)
+    except IOError as e:
+        sys.exit("ERROR: " + str(e))
 
     # Check extractor configuration
     for extractor in extractors_list:
@@ -301,17 +491,24 @@ def main():
     result_dict = {}
     graphs = []
     qc_start = time.time()
+    follow_interval = sequencing_summary_streaming_extractor.get_follow_interval(config_dictionary)
 
     # Information extraction about statistics and generation of the graphs
     for extractor in extractors_list:
         _show(config_dictionary, "* Start {0} extractor".format(extractor.get_name()))
         extractor_start = time.time()
 
-        # Execute extractor
-        extractor.init()
-        extractor.extract(result_dict)
+        # Execute extractor, a file that cannot be read (e.g. a truncated compressed file) stops the QC
+        try:
+            extractor.init()
+            extractor.extract(result_dict)
+        except (IOError, pd.errors.EmptyDataError) as e:
+            sys.exit("ERROR: Error while running " + extractor.get_name() + " extractor: " + str(e))
         graphs.extend(extractor.graph_generation(result_dict))
-        extractor.clean(result_dict)
+
+        # In follow mode, the extractors are cleaned after the last update of the reports
+        if follow_interval is None:
+            extractor.clean(result_dict)
 
         extractor_end = time.time()
         extract_time = extractor_end - extractor_start
@@ -320,7 +517,20 @@ def main():
         _show(config_dictionary, "* End of {0} extractor (done in {1})".format(extractor.get_name(),
                                                                                _format_time(extract_time)))
 
-    # HTML report and report.data file generation
+    _write_reports(config_dictionary, result_dict, graphs, qc_start)
+
+    if follow_interval is not None:
+        _follow(config_dictionary, extractors_list, follow_interval)
+
+
+def _write_reports(config_dictionary, result_dict, graphs, qc_start):
+    """
+    Write the HTML report and the report.data file
+    :param config_dictionary: configuration dictionary
+    :param result_dict: dictionary of the results of the extractors
+    :param graphs: list of the graphs of the extractors
+    :param qc_start: start time of the QC
+    """
     _show(config_dictionary, "* Write HTML report")
     html_report_generator.html_report(config_dictionary, result_dict, graphs)
 
@@ -333,5 +543,53 @@ def main():
     _show(config_dictionary, "* End of the QC extractor (done in {})".format(_format_time(qc_end - qc_start)))
 
 
+def _follow(config_dictionary, extractors_list, interval):
+    """
+    Add the reads appended to the sequencing summary files to the statistics and write the reports again at each
+    interval, until no read has been added for follow_idle_timeout seconds or the command is interrupted
+    :param config_dictionary: configuration dictionary
+    :param extractors_list: list of the initialized extractors, with a FollowingSequencingSummaryExtractor
+    :param interval: interval between the updates in seconds
+    """
+    follow_extractor = next(e for e in extractors_list
+                            if isinstance(e, sequencing_summary_streaming_extractor.FollowingSequencingSummaryExtractor))
+    follow_idle_timeout = sequencing_summary_streaming_extractor.follow_idle_timeout
+    last_read_time = time.time()
+    result_dict = {}
+
+    try:
+        while time.time() - last_read_time < follow_idle_timeout:
+            time.sleep(interval)
+
+            update_start = time.time()
+            new_read_count = follow_extractor.update()
+            if new_read_count == 0:
+                _show(config_dictionary, "* No new read")
+                continue
+
+            _show(config_dictionary, "* Update the reports with {} new reads".format(new_read_count))
+            last_read_time = update_start
+
+            # The statistics and the graphs are computed from the aggregates, whatever the number of reads
+            result_dict = {}
+            graphs = []
+            for extractor in extractors_list:
+                extractor_start = time.time()
+                extractor.extract(result_dict)
+                graphs.extend(extractor.graph_generation(result_dict))
+                result_dict['{}.duration'.format(extractor.get_report_data_file_id())] = \
+                    round(time.time() - extractor_start, 2)
+
+            _write_reports(config_dictionary, result_dict, graphs, update_start)
+
+        _show(config_dictionary, "* No read added for {}, end of the follow mode".format(
+            _format_time(follow_idle_timeout)))
+    except KeyboardInterrupt:
+        _show(config_dictionary, "* End of the follow mode")
+
+    for extractor in extractors_list:
+        extractor.clean(result_dict)
+
+
 if __name__ == "__main__":
     main()